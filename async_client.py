@@ -0,0 +1,156 @@
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from client import MAX_LINE_LENGTH, CONTROL_BANNER, WELCOME_BANNER
+
+
+class AsyncClientServer:
+    def __init__(self, node, client_handler, sock, workers=32, max_write_batch=4096):
+        self.node = node
+        self.client_handler = client_handler
+        self.sock = sock
+        self.max_write_batch = max_write_batch
+        # Zapisy trafiają do rdzenia Raft przez kolejkę obsługiwaną przez jeden wątek,
+        # pozostałe komendy przez małą pulę wątków; pętla zdarzeń nigdy nie czeka na commit
+        self.write_queue = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{node.node_id}-client")
+        self.loop = None
+        self.server = None
+        self.stopped = threading.Event()
+        self.connections = 0
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        threading.Thread(target=self.process_writes, daemon=True).start()
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle_connection, sock=self.sock, limit=MAX_LINE_LENGTH, backlog=1024)
+            )
+            self.loop.run_forever()
+        except Exception as e:
+            logging.error(f"Node {self.node.node_id}: Async client server stopped: {e}")
+        finally:
+            self.loop.close()
+            self.stopped.set()
+
+    async def handle_connection(self, reader, writer):
+        self.connections += 1
+        self.node.metrics.inc("raft_client_connections_total")
+        try:
+            if self.node.state == "leader":
+                writer.write(CONTROL_BANNER)
+            writer.write(WELCOME_BANNER)
+            session = {}
+            buffer = b""
+            while self.node.running:
+                data = await reader.read(65536)
+                if not data:
+                    break
+
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                if len(buffer) > MAX_LINE_LENGTH:
+                    writer.write(b"ERROR: Command too long.\n")
+                    break
+                if not lines:
+                    continue
+
+                responses = await self.execute_pipeline([line.decode().strip() for line in lines], session)
+                if all(isinstance(response, str) for response in responses):
+                    writer.write("".join(responses).encode())
+                else:
+                    # Odpowiedzi strumieniowe są generowane w puli wątków, porcja po porcji
+                    chunks = self.client_handler.iter_chunks(responses)
+                    while True:
+                        chunk = await self.loop.run_in_executor(self.executor, next, chunks, None)
+                        if chunk is None:
+                            break
+                        writer.write(chunk)
+                        await writer.drain()
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            logging.error(f"Node {self.node.node_id}: Error handling client connection: {e}")
+            writer.write(f"ERROR: {str(e)}\n".encode())
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def execute_pipeline(self, lines, session):
+        # Podział na kroki robi ClientHandler; tutaj tylko I/O: zapisy przez kolejkę, reszta w puli wątków
+        handler = self.client_handler
+        steps = handler.pipeline_steps(lines, session)
+        result = None
+        while True:
+            try:
+                kind, args = steps.send(result)
+            except StopIteration as done:
+                return done.value
+            if kind == "write":
+                future = self.loop.create_future()
+                self.write_queue.put((args[0], future))
+                result = await future
+            else:
+                result = await self.loop.run_in_executor(self.executor, handler.execute_command, *args)
+
+    def process_writes(self):
+        while not self.stopped.is_set():
+            try:
+                jobs = [self.write_queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            # Zapisy ze wszystkich połączeń zebrane w kolejce idą do logu jednym wywołaniem
+            count = len(jobs[0][0])
+            while count < self.max_write_batch:
+                try:
+                    job = self.write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                count += len(job[0])
+
+            try:
+                results = self.node.commit_entries([entry for entries, _ in jobs for entry in entries])
+            except Exception as e:
+                logging.error(f"Node {self.node.node_id}: Error committing client writes: {e}")
+                results = [f"ERROR: {str(e)}"] * count
+
+            offset = 0
+            for entries, future in jobs:
+                job_results = results[offset:offset + len(entries)]
+                offset += len(entries)
+                try:
+                    self.loop.call_soon_threadsafe(self.resolve, future, job_results)
+                except RuntimeError:
+                    return
+
+    @staticmethod
+    def resolve(future, results):
+        if not future.done():
+            future.set_result(results)
+
+    def stop(self):
+        if self.loop is None or self.loop.is_closed():
+            self.sock.close()
+            return
+
+        async def shutdown():
+            if self.server is not None:
+                self.server.close()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.loop.stop()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop)
+        except RuntimeError:
+            pass
+        self.stopped.wait(timeout=1)
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,55 @@
+import time
+import argparse
+from codec import CODEC_VERSION, encode_message, decode_message
+from logentry import LogEntry
+
+
+def make_append_entries(count, value_size):
+    return {
+        "type": "append_entries",
+        "term": 7,
+        "leader_id": "Node_1",
+        "prev_log_index": 123456,
+        "prev_log_term": 7,
+        "entries": [
+            LogEntry(7, "SET", f"user:{i:08d}", "v" * value_size)
+            for i in range(count)
+        ],
+        "leader_commit": 123400,
+        "sender": ("127.0.0.1", 9000),
+    }
+
+
+def make_heartbeat():
+    return {"type": "heartbeat", "leader_id": "Node_1", "term": 7, "sender": ("127.0.0.1", 9000)}
+
+
+def measure(message, version, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        data = encode_message(message, version)
+    encode_time = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        decode_message(data)
+    decode_time = (time.perf_counter() - start) / iterations
+    return len(data), encode_time, decode_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark of the Raft message codecs.")
+    parser.add_argument("--entries", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--value-size", type=int, default=16)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'message':<22}{'codec':<8}{'bytes':>10}{'B/entry':>10}{'enc us':>10}{'dec us':>10}{'enc us/entry':>14}")
+    cases = [("heartbeat", make_heartbeat(), 0)]
+    cases += [(f"append_entries x{n}", make_append_entries(n, args.value_size), n) for n in args.entries]
+    for name, message, count in cases:
+        for codec, version in (("json", None), ("binary", CODEC_VERSION)):
+            size, enc, dec = measure(message, version, args.iterations)
+            per_entry = f"{size / count:>10.1f}" if count else f"{'-':>10}"
+            per_entry_time = f"{enc * 1e6 / count:>14.2f}" if count else f"{'-':>14}"
+            print(f"{name:<22}{codec:<8}{size:>10}{per_entry}{enc * 1e6:>10.1f}{dec * 1e6:>10.1f}{per_entry_time}")
@@ -0,0 +1,70 @@
+import time
+import socket
+import logging
+import argparse
+import threading
+from main import create_network, start_network, stop_network
+
+
+def wait_for_leader(nodes, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        leader = next((node for node in nodes if node.state == "leader"), None)
+        if leader:
+            return leader
+        time.sleep(0.05)
+    raise TimeoutError("Leader election did not complete in time")
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def run_client(leader, client_id, count, latencies):
+    with socket.create_connection((leader.host, leader.port + 100)) as sock:
+        reader = sock.makefile("rb")
+        reader.readline()
+        reader.readline()
+        for i in range(count):
+            start = time.perf_counter()
+            sock.sendall(f"PUT bench_{client_id}_{i} value_{i}\n".encode())
+            response = reader.readline()
+            latencies.append(time.perf_counter() - start)
+            if not response.startswith(b"SUCCESS"):
+                raise RuntimeError(f"Write failed: {response!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure client write latency of quorum commit.")
+    parser.add_argument("--ports", type=int, nargs="+", default=[7600, 7601, 7602])
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--data-dir", default=None)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    nodes = create_network(args.ports, args.data_dir)
+    start_network(nodes)
+    try:
+        leader = wait_for_leader(nodes)
+        print(f"{'clients':>8}{'writes':>8}{'writes/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for clients in args.clients:
+            latencies = []
+            threads = [
+                threading.Thread(target=run_client, args=(leader, f"{clients}_{n}", args.writes // clients, latencies))
+                for n in range(clients)
+            ]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            print(
+                f"{clients:>8}{len(latencies):>8}{len(latencies) / elapsed:>10.0f}"
+                f"{percentile(latencies, 50) * 1000:>9.2f}{percentile(latencies, 99) * 1000:>9.2f}"
+                f"{max(latencies) * 1000:>9.2f}"
+            )
+    finally:
+        stop_network(nodes)
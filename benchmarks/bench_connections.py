@@ -0,0 +1,84 @@
+import time
+import asyncio
+import logging
+import argparse
+import resource
+import threading
+from main import create_network, start_network, stop_network
+from benchmarks.bench_commit import wait_for_leader, percentile
+
+
+def raise_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+async def open_idle(port, count):
+    connections = []
+    for _ in range(count):
+        connections.append(await asyncio.open_connection("127.0.0.1", port))
+    return connections
+
+
+async def active_client(port, client_id, ops, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1024 * 1024)
+    await reader.readline()
+    await reader.readline()
+    for i in range(ops):
+        command = f"PUT conn_{client_id}_{i} value\n" if i % 2 == 0 else f"GET conn_{client_id}_{i - 1}\n"
+        start = time.perf_counter()
+        writer.write(command.encode())
+        await writer.drain()
+        response = await reader.readline()
+        latencies.append(time.perf_counter() - start)
+        if response.startswith(b"ERROR"):
+            raise RuntimeError(f"Unexpected response: {response!r}")
+    writer.close()
+
+
+async def run_benchmark(port, idle, active, ops):
+    start = time.perf_counter()
+    idle_connections = await open_idle(port, idle)
+    connect_time = time.perf_counter() - start
+    await asyncio.sleep(1)
+    threads = threading.active_count()
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(active_client(port, n, ops, latencies) for n in range(active)))
+    elapsed = time.perf_counter() - start
+
+    for _, writer in idle_connections:
+        writer.close()
+    return connect_time, threads, len(latencies) / elapsed, latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Client connection scaling: idle connections plus active clients.")
+    parser.add_argument("--idle", type=int, default=10000)
+    parser.add_argument("--active", type=int, default=1000)
+    parser.add_argument("--ops", type=int, default=20, help="Operations per active connection (half PUT, half GET)")
+    parser.add_argument("--modes", nargs="+", choices=["threaded", "asyncio"], default=["threaded", "asyncio"])
+    parser.add_argument("--base-port", type=int, default=7620)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    limit = raise_file_limit()
+    print(f"File descriptor limit: {limit}")
+    print(f"{'mode':<10}{'idle':>7}{'active':>8}{'connect s':>11}{'threads':>9}{'ops/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for n, mode in enumerate(args.modes):
+        ports = [args.base_port + 10 * n + i for i in range(3)]
+        nodes = create_network(ports, client_server=mode)
+        start_network(nodes)
+        try:
+            leader = wait_for_leader(nodes)
+            connect_time, threads, rate, latencies = asyncio.run(
+                run_benchmark(leader.port + 100, args.idle, args.active, args.ops)
+            )
+            print(
+                f"{mode:<10}{args.idle:>7}{args.active:>8}{connect_time:>11.2f}{threads:>9}{rate:>9.0f}"
+                f"{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 99) * 1000:>9.1f}"
+            )
+        finally:
+            stop_network(nodes)
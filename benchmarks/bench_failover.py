@@ -0,0 +1,80 @@
+import time
+import logging
+import argparse
+import statistics
+from main import create_network, start_network
+
+CONFIGS = {
+    # nazwa: (heartbeat_interval, zakres limitu elekcji, adaptive_timeout)
+    "default": (1.0, (3, 6), False),
+    "fast": (0.05, (0.15, 0.3), False),
+    "adaptive": (0.05, (0.1, 1.0), True),
+}
+
+
+def wait_for(condition, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.002)
+    return None
+
+
+def run_failover(ports, config, warmup):
+    # Czas od zatrzymania lidera do wyboru nowego i do pierwszego zatwierdzonego zapisu
+    heartbeat_interval, election_timeout, adaptive = CONFIGS[config]
+    nodes = create_network(ports, client_server=None, heartbeat_interval=heartbeat_interval,
+                           election_timeout=election_timeout, adaptive_timeout=adaptive)
+    start_network(nodes)
+    try:
+        leader = wait_for(lambda: next((node for node in nodes if node.state == "leader"), None), 30)
+        if leader is None:
+            return None
+        # Adaptacyjny limit potrzebuje kilku odstępów między heartbeatami
+        time.sleep(warmup)
+        stopped_at = time.perf_counter()
+        leader.stop()
+        others = [node for node in nodes if node is not leader]
+        new_leader = wait_for(lambda: next((node for node in others if node.state == "leader"), None), 30)
+        if new_leader is None:
+            return None
+        elected = time.perf_counter() - stopped_at
+        result = new_leader.handle_client_operation("SET", "failover", "value")
+        if result is not None and str(result).startswith("ERROR"):
+            return None
+        return elected, time.perf_counter() - stopped_at
+    finally:
+        for node in nodes:
+            if node.running:
+                node.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Failover time after stopping the leader of a local TCP cluster.")
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=7400)
+    parser.add_argument("--warmup", type=float, default=1.0, help="Seconds between the election and stopping the leader")
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    print(f"{'config':>10}{'hb s':>7}{'timeout s':>12}{'runs':>6}{'failed':>8}"
+          f"{'elect ms p50':>14}{'elect ms max':>14}{'write ms p50':>14}{'write ms max':>14}")
+    port = args.base_port
+    for config in args.configs:
+        results = []
+        for _ in range(args.runs):
+            ports = list(range(port, port + args.nodes))
+            port += args.nodes
+            results.append(run_failover(ports, config, args.warmup))
+        done = [result for result in results if result is not None]
+        heartbeat_interval, (low, high), _ = CONFIGS[config]
+        line = f"{config:>10}{heartbeat_interval:>7.2f}{f'{low}-{high}':>12}{args.runs:>6}{args.runs - len(done):>8}"
+        if done:
+            elected, written = zip(*done)
+            line += (f"{statistics.median(elected) * 1000:>14.0f}{max(elected) * 1000:>14.0f}"
+                     f"{statistics.median(written) * 1000:>14.0f}{max(written) * 1000:>14.0f}")
+        print(line)
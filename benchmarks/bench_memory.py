@@ -0,0 +1,39 @@
+import gc
+import argparse
+import tracemalloc
+from database import Database
+from logentry import LogEntry
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory used by the in-memory Raft log per entry.")
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--term", type=int, default=1000)
+    args = parser.parse_args()
+
+    keys, strings = measure(lambda: [f"user:{i:08d}" for i in range(args.entries)])
+    value = "value"
+
+    def build_dicts():
+        return [{"term": args.term, "operation": "SET", "key": key, "value": value} for key in keys]
+
+    def build_database():
+        database = Database()
+        database.append_entries([LogEntry(args.term, "SET", key, value) for key in keys])
+        return database
+
+    print(f"{'representation':>16}{'entries':>10}{'MiB':>9}{'bytes/entry':>13}")
+    print(f"{'keys only':>16}{args.entries:>10}{strings / 2 ** 20:>9.1f}{strings / args.entries:>13.1f}")
+    for name, build in [("dict", build_dicts), ("LogEntry", build_database)]:
+        log, size = measure(build)
+        print(f"{name:>16}{args.entries:>10}{size / 2 ** 20:>9.1f}{size / args.entries:>13.1f}")
+        del log
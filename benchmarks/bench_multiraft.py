@@ -0,0 +1,132 @@
+import time
+import socket
+import logging
+import argparse
+import threading
+from main import create_network, start_network
+from multiraft import group_of
+from supervisor import Supervisor
+
+
+def read_banner(address):
+    with socket.create_connection(address, timeout=5) as sock:
+        reader = sock.makefile("rb")
+        first = reader.readline()
+        if first.startswith(b"Control"):
+            reader.readline()
+        return sock, reader, first.startswith(b"Control")
+
+
+def wait_for_group_leaders(ports, groups, timeout=30):
+    # Adresy klienta liderów grup odczytane tak jak robi to klient: z banera lub komendy GROUPS.
+    # Przy groups > 1 czeka też, aż lider grupy g będzie na g-tym węźle.
+    addresses = [("127.0.0.1", port + 100) for port in ports]
+    member_ids = sorted(f"Node_{i + 1}" for i in range(len(ports)))
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if groups == 1:
+                leader = next((address for address in addresses if read_banner(address)[2]), None)
+                if leader:
+                    return [leader]
+            else:
+                sock, reader, _ = read_banner(addresses[0])
+                with sock:
+                    sock.sendall(b"GROUPS\n")
+                    lines = [reader.readline().decode().split() for _ in range(groups + 1)][1:]
+                # Group g: leader Node_i/gg host:port, ...
+                if all(line[3].split("/")[0] == member_ids[group % len(member_ids)]
+                       for group, line in enumerate(lines)):
+                    return [(line[4].rsplit(":", 1)[0], int(line[4].rsplit(":", 1)[1].rstrip(","))) for line in lines]
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError("Group leaders were not elected in time")
+
+
+def group_keys(group, groups, count):
+    keys = []
+    i = 0
+    while len(keys) < count:
+        key = f"user{i:010d}"
+        if group_of(key, groups) == group:
+            keys.append(key)
+        i += 1
+    return keys
+
+
+def run_client(address, keys, depth, errors):
+    # Sprytny klient: zna lidera grupy z komendy GROUPS i wysyła mu tylko klucze tej grupy
+    try:
+        with socket.create_connection(address) as sock:
+            reader = sock.makefile("rb")
+            reader.readline()
+            reader.readline()
+            for start in range(0, len(keys), depth):
+                batch = keys[start:start + depth]
+                sock.sendall("".join(f"#{start + i} PUT {key} value\n" for i, key in enumerate(batch)).encode())
+                for i in range(len(batch)):
+                    response = reader.readline().decode()
+                    if not response.startswith(f"#{start + i} SUCCESS"):
+                        raise RuntimeError(f"Unexpected response: {response!r}")
+    except Exception as e:
+        errors.append(e)
+
+
+def run_groups(ports, groups, ops, depth, clients, processes, log_dir):
+    if processes:
+        # Każdy węzeł w osobnym procesie, więc grupy prowadzone przez różne węzły nie dzielą GIL
+        cluster = Supervisor(ports, ["--groups", str(groups), "--log-dir", log_dir], log_dir)
+        cluster.start()
+        stop = cluster.stop
+    else:
+        nodes = create_network(ports, groups=groups)
+        start_network(nodes)
+        stop = lambda: [node.stop() for node in nodes]
+    try:
+        if processes:
+            cluster.wait_ready()
+        leaders = wait_for_group_leaders(ports, groups)
+        per_client = ops // (groups * clients)
+        threads = []
+        errors = []
+        for group, address in enumerate(leaders):
+            keys = group_keys(group, groups, per_client * clients)
+            for client in range(clients):
+                chunk = keys[client * per_client:(client + 1) * per_client]
+                threads.append(threading.Thread(target=run_client, args=(address, chunk, depth, errors)))
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise errors[0]
+        return per_client * clients * groups / elapsed, len({address for address in leaders})
+    finally:
+        stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write throughput with keys sharded across several Raft groups.")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--groups", type=int, nargs="+", default=[1, 2, 3, 6])
+    parser.add_argument("--ops", type=int, default=12000)
+    parser.add_argument("--depth", type=int, default=64, help="Pipelined requests per round trip")
+    parser.add_argument("--clients", type=int, default=2, help="Connections per group")
+    parser.add_argument("--base-port", type=int, default=7700)
+    parser.add_argument("--processes", action="store_true", help="Run every node in its own process")
+    parser.add_argument("--log-dir", default="logs", help="Log files of node processes (with --processes)")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    # Bez --processes wszystkie węzły działają w jednym procesie, więc wynik ogranicza GIL
+    print(f"{'groups':>7}{'leader nodes':>14}{'ops/s':>10}")
+    port = args.base_port
+    for groups in args.groups:
+        ports = list(range(port, port + args.nodes))
+        port += args.nodes
+        rate, leader_nodes = run_groups(ports, groups, args.ops, args.depth, args.clients, args.processes,
+                                        args.log_dir)
+        print(f"{groups:>7}{leader_nodes:>14}{rate:>10.0f}")
@@ -0,0 +1,48 @@
+import time
+import socket
+import logging
+import argparse
+from main import create_network, start_network, stop_network
+from benchmarks.bench_commit import wait_for_leader
+
+
+def run_pipeline(leader, depth, total, prefix):
+    with socket.create_connection((leader.host, leader.port + 100)) as sock:
+        reader = sock.makefile("rb")
+        reader.readline()
+        reader.readline()
+        start = time.perf_counter()
+        sent = 0
+        while sent < total:
+            batch = min(depth, total - sent)
+            requests = "".join(
+                f"#{sent + i} PUT {prefix}_{sent + i} value\n" for i in range(batch)
+            )
+            sock.sendall(requests.encode())
+            for i in range(batch):
+                response = reader.readline().decode()
+                if not response.startswith(f"#{sent + i} SUCCESS"):
+                    raise RuntimeError(f"Unexpected response: {response!r}")
+            sent += batch
+        return total / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure pipelined ops/sec on a single client connection.")
+    parser.add_argument("--ports", type=int, nargs="+", default=[7610, 7611, 7612])
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 4, 16, 64, 256])
+    parser.add_argument("--data-dir", default=None)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    nodes = create_network(args.ports, args.data_dir)
+    start_network(nodes)
+    try:
+        leader = wait_for_leader(nodes)
+        print(f"{'depth':>6}{'ops/s':>10}")
+        for depth in args.depths:
+            rate = run_pipeline(leader, depth, args.ops, f"depth{depth}")
+            print(f"{depth:>6}{rate:>10.0f}")
+    finally:
+        stop_network(nodes)
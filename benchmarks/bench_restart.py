@@ -0,0 +1,41 @@
+import time
+import logging
+import argparse
+import tempfile
+from database import Database
+from logentry import LogEntry
+
+
+def prepare(data_dir, size, tail, snapshot_every):
+    # Snapshoty co snapshot_every wpisów jak w działającym węźle, ostatnie tail wpisów zatwierdzone po snapshocie
+    database = Database(data_dir, snapshot_threshold=size + 1)
+    for start in range(0, size, snapshot_every):
+        end = min(start + snapshot_every, size)
+        database.append_entries([LogEntry(1, "SET", f"user:{i:08d}", "value") for i in range(start, end)])
+        if end <= size - tail:
+            database.commit_log_entries(end - 1)
+            database.take_snapshot()
+    database.commit_log_entries(size - 1)
+    database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Restart time of a node: snapshot load plus WAL tail replay.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--tail", type=int, default=10000, help="Entries after the last snapshot")
+    parser.add_argument("--snapshot-every", type=int, default=10000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{'keys':>9}{'tail':>8}{'snapshot s':>12}{'wal s':>8}{'apply s':>9}{'total s':>9}")
+    for size in args.sizes:
+        tail = min(args.tail, size - 1)
+        with tempfile.TemporaryDirectory() as data_dir:
+            prepare(data_dir, size, tail, args.snapshot_every)
+            start = time.perf_counter()
+            database = Database(data_dir)
+            total = time.perf_counter() - start
+            timings = database.recovery_timings
+            assert len(database.store) == size
+            database.close()
+        print(f"{size:>9}{tail:>8}{timings['snapshot']:>12.3f}{timings['wal']:>8.3f}{timings['apply']:>9.3f}{total:>9.3f}")
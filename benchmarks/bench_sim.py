@@ -0,0 +1,58 @@
+import time
+import logging
+import argparse
+from logentry import LogEntry
+from simulation import create_cluster
+
+
+def run_scenario(size, seed, entries, latency, loss):
+    # Wybór lidera, replikacja wpisów, awaria lidera i ponowny wybór – wszystko w czasie wirtualnym
+    network = create_cluster(size, seed=seed, latency=latency, loss=loss)
+    try:
+        if not network.run_until(lambda: bool(network.leaders()), 60):
+            return None
+        elected_at = network.clock.now
+        leader = network.leaders()[0]
+        leader.submit_entries([LogEntry(0, "SET", f"key{i}", "value") for i in range(entries)])
+        last_index = leader.database.last_index()
+        started = network.clock.now
+        if not network.run_until(
+                lambda: all(node.database.commit_index == last_index for node in network.nodes.values()), 60):
+            return None
+        replicated = network.clock.now - started
+
+        network.crash(leader.address)
+        crashed_at = network.clock.now
+        if not network.run_until(lambda: bool(network.leaders()), 60):
+            return None
+        return elected_at, replicated, network.clock.now - crashed_at, network.delivered
+    finally:
+        network.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Election and replication scenarios on the simulated network.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 5, 11, 51, 101])
+    parser.add_argument("--seeds", type=int, default=20, help="Scenarios per cluster size")
+    parser.add_argument("--entries", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, nargs=2, default=[1, 5])
+    parser.add_argument("--loss", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    latency = (args.latency_ms[0] / 1000, args.latency_ms[1] / 1000)
+    print(f"{'nodes':>6}{'runs':>6}{'stalled':>8}{'elect s':>9}{'repl ms':>9}{'failover s':>12}"
+          f"{'msgs/run':>10}{'wall s/run':>12}{'runs/s':>8}")
+    for size in args.sizes:
+        results = []
+        start = time.perf_counter()
+        for seed in range(args.seeds):
+            results.append(run_scenario(size, seed, args.entries, latency, args.loss))
+        wall = time.perf_counter() - start
+        done = [result for result in results if result is not None]
+        if not done:
+            print(f"{size:>6}{args.seeds:>6}{args.seeds:>8}")
+            continue
+        elect, replicated, failover, messages = (sum(values) / len(done) for values in zip(*done))
+        print(f"{size:>6}{args.seeds:>6}{args.seeds - len(done):>8}{elect:>9.2f}{replicated * 1000:>9.1f}"
+              f"{failover:>12.2f}{messages:>10.0f}{wall / args.seeds:>12.3f}{args.seeds / wall:>8.1f}")
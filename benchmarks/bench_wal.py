@@ -0,0 +1,47 @@
+import time
+import shutil
+import tempfile
+import threading
+import argparse
+from database import Database
+
+
+def run_benchmark(group_commit, threads, duration):
+    directory = tempfile.mkdtemp(prefix="raftkvdb-wal-")
+    database = Database(directory, group_commit=group_commit)
+    counts = [0] * threads
+    deadline = time.time() + duration
+
+    def writer(n):
+        i = 0
+        while time.time() < deadline:
+            database.append_log({"term": 1, "operation": "SET", "key": f"key_{n}_{i}", "value": "value"})
+            i += 1
+        counts[n] = i
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    start = time.time()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.time() - start
+
+    fsyncs = database.wal.fsync_count
+    database.close()
+    shutil.rmtree(directory, ignore_errors=True)
+    return sum(counts) / elapsed, sum(counts), fsyncs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark WAL writes/sec: fsync per entry vs group commit.")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<16}{'threads':>8}{'writes/s':>12}{'writes':>10}{'fsyncs':>10}")
+    for threads in args.threads:
+        for group_commit in (False, True):
+            mode = "group-commit" if group_commit else "fsync-per-entry"
+            rate, writes, fsyncs = run_benchmark(group_commit, threads, args.duration)
+            print(f"{mode:<16}{threads:>8}{rate:>12.0f}{writes:>10}{fsyncs:>10}")
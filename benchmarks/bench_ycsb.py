@@ -0,0 +1,235 @@
+import sys
+import json
+import time
+import random
+import socket
+import logging
+import argparse
+import threading
+import subprocess
+from main import create_network, start_network, stop_network
+from benchmarks.bench_commit import wait_for_leader, percentile
+
+# Udział odczytów w mieszankach zbliżonych do YCSB: A (50/50), B (95/5), C (same odczyty), W (dominują zapisy)
+WORKLOADS = {"a": 0.5, "b": 0.95, "c": 1.0, "w": 0.05}
+PERCENTILES = (50, 95, 99, 99.9)
+LOAD_BATCH = 500
+
+
+class ZipfianGenerator:
+    # Generator Graya i in. (jak w YCSB); numery są permutowane, żeby gorące klucze nie leżały obok siebie
+    def __init__(self, items, theta, rng):
+        self.items = items
+        self.theta = theta
+        self.rng = rng
+        self.zetan = sum(1 / i ** theta for i in range(1, items + 1))
+        self.alpha = 1 / (1 - theta)
+        self.eta = (1 - (2 / items) ** (1 - theta)) / (1 - (1 + 0.5 ** theta) / self.zetan)
+        self.permutation = list(range(items))
+        rng.shuffle(self.permutation)
+
+    def next(self):
+        u = self.rng.random()
+        uz = u * self.zetan
+        if uz < 1:
+            rank = 0
+        elif uz < 1 + 0.5 ** self.theta:
+            rank = 1
+        else:
+            rank = min(int(self.items * (self.eta * u - self.eta + 1) ** self.alpha), self.items - 1)
+        return self.permutation[rank]
+
+
+class UniformGenerator:
+    def __init__(self, items, rng):
+        self.items = items
+        self.rng = rng
+
+    def next(self):
+        return self.rng.randrange(self.items)
+
+
+def key_name(n):
+    return f"user{n:010d}"
+
+
+def connect(leader):
+    sock = socket.create_connection((leader.host, leader.port + 100))
+    reader = sock.makefile("rb")
+    reader.readline()
+    reader.readline()
+    return sock, reader
+
+
+def load(leader, records, value):
+    sock, reader = connect(leader)
+    with sock:
+        for start in range(0, records, LOAD_BATCH):
+            pairs = " ".join(f"{key_name(n)} {value}" for n in range(start, min(start + LOAD_BATCH, records)))
+            sock.sendall(f"MPUT {pairs}\n".encode())
+            for _ in range(min(LOAD_BATCH, records - start)):
+                response = reader.readline()
+                if not response.startswith(b"SUCCESS"):
+                    raise RuntimeError(f"Load failed: {response!r}")
+
+
+def run_client(leader, args, keys, rng, deadline, result):
+    sock, reader = connect(leader)
+    value = "v" * args.value_size
+    read_ratio = args.read_ratio if args.read_ratio is not None else WORKLOADS[args.workload]
+    latencies = {"read": [], "update": []}
+    errors = 0
+    with sock:
+        if args.read_mode != "linearizable":
+            sock.sendall(f"READ-MODE {args.read_mode}\n".encode())
+            reader.readline()
+        sent = 0
+        while sent < args.ops_per_client and time.perf_counter() < deadline:
+            batch = min(args.depth, args.ops_per_client - sent)
+            kinds = []
+            requests = []
+            for i in range(batch):
+                key = key_name(keys.next())
+                if rng.random() < read_ratio:
+                    kinds.append("read")
+                    requests.append(f"#{sent + i} GET {key}\n")
+                else:
+                    kinds.append("update")
+                    requests.append(f"#{sent + i} UPDATE {key} {value}\n")
+            start = time.perf_counter()
+            sock.sendall("".join(requests).encode())
+            for kind in kinds:
+                response = reader.readline()
+                latencies[kind].append(time.perf_counter() - start)
+                if b"ERROR" in response:
+                    errors += 1
+            sent += batch
+    result.append((latencies, errors))
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    return {f"p{p:g}": round(percentile(samples, p) * 1000, 3) for p in PERCENTILES}
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    nodes = create_network(args.ports, args.data_dir, codec=args.codec, client_server=args.client_server,
+                           lease_duration=args.lease)
+    start_network(nodes)
+    try:
+        leader = wait_for_leader(nodes)
+        load(leader, args.records, "v" * args.value_size)
+
+        rng = random.Random(args.seed)
+        generators = []
+        for _ in range(args.clients):
+            client_rng = random.Random(rng.random())
+            if args.distribution == "zipfian":
+                generators.append((ZipfianGenerator(args.records, args.theta, client_rng), client_rng))
+            else:
+                generators.append((UniformGenerator(args.records, client_rng), client_rng))
+
+        results = []
+        start = time.perf_counter()
+        deadline = start + args.duration if args.duration else float("inf")
+        workers = [
+            threading.Thread(target=run_client, args=(leader, args, keys, client_rng, deadline, results))
+            for keys, client_rng in generators
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        stop_network(nodes)
+
+    latencies = {"read": [], "update": []}
+    errors = 0
+    for client_latencies, client_errors in results:
+        for kind in latencies:
+            latencies[kind] += client_latencies[kind]
+        errors += client_errors
+    operations = sum(len(samples) for samples in latencies.values())
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "version": git_version(),
+        "config": vars(args),
+        "results": {
+            "operations": operations,
+            "errors": errors,
+            "duration_s": round(elapsed, 3),
+            "throughput": round(operations / elapsed, 1),
+            "latency_ms": {
+                "all": summarize(latencies["read"] + latencies["update"]),
+                "read": summarize(latencies["read"]),
+                "update": summarize(latencies["update"]),
+            },
+        },
+    }
+
+
+def compare(report, baseline, tolerance):
+    # Regresja: przepustowość niższa albo p99 wyższe o więcej niż tolerance
+    current, previous = report["results"], baseline["results"]
+    throughput_change = current["throughput"] / previous["throughput"] - 1
+    p99_change = current["latency_ms"]["all"]["p99"] / previous["latency_ms"]["all"]["p99"] - 1
+    print(f"vs baseline {baseline.get('version')}: throughput {throughput_change:+.1%}, p99 {p99_change:+.1%}")
+    return throughput_change < -tolerance or p99_change > tolerance
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="YCSB-style load generator for the client protocol.")
+    parser.add_argument("--ports", type=int, nargs="+", default=[7640, 7641, 7642])
+    parser.add_argument("--data-dir", default=None)
+    parser.add_argument("--codec", choices=["binary", "json"], default="binary")
+    parser.add_argument("--client-server", choices=["threaded", "asyncio"], default="threaded")
+    parser.add_argument("--lease", type=float, default=None)
+    parser.add_argument("--workload", choices=sorted(WORKLOADS), default="a",
+                        help="a: 50%% reads, b: 95%% reads, c: reads only, w: 95%% updates")
+    parser.add_argument("--read-ratio", type=float, default=None, help="Overrides the read share of --workload")
+    parser.add_argument("--read-mode", default="linearizable", help="linearizable, or e.g. 'stale 100' / 'stale 50ms'")
+    parser.add_argument("--distribution", choices=["uniform", "zipfian"], default="zipfian")
+    parser.add_argument("--theta", type=float, default=0.99, help="Zipfian skew")
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--value-size", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--depth", type=int, default=1, help="Pipelined requests per round trip")
+    parser.add_argument("--ops-per-client", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", default=None, help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    report = run(args)
+    results = report["results"]
+    print(f"workload {args.workload} ({args.distribution}), {args.clients} clients, depth {args.depth}: "
+          f"{results['operations']} ops in {results['duration_s']} s, {results['errors']} errors")
+    print(f"{'op':<8}{'ops/s':>10}" + "".join(f"{f'p{p:g} ms':>11}" for p in PERCENTILES))
+    for kind, summary in results["latency_ms"].items():
+        if summary is None:
+            continue
+        rate = f"{results['throughput']:>10.0f}" if kind == "all" else f"{'':>10}"
+        print(f"{kind:<8}{rate}" + "".join(f"{value:>11.2f}" for value in summary.values()))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressed = compare(report, json.load(f), args.tolerance)
+        if regressed:
+            print("Regression beyond tolerance")
+            sys.exit(1)
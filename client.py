@@ -1,51 +1,270 @@
+import threading
+
+MAX_LINE_LENGTH = 1024 * 1024
+# Długie odpowiedzi (LOGS, STATUS) są wysyłane porcjami tej wielkości
+RESPONSE_CHUNK_SIZE = 64 * 1024
+WRITE_COMMANDS = {"PUT", "UPDATE", "DELETE", "MPUT", "MDELETE"}
+READ_COMMANDS = {"GET", "MGET", "SCAN", "PREFIX"}
+DEFAULT_SCAN_LIMIT = 100
+MAX_SCAN_LIMIT = 10000
+CONTROL_BANNER = (b"Control cluster commands: ADD-NODE [new node ip], REMOVE-NODE [node ip], "
+                  b"TRANSFER-LEADER [node ip], CLUSTER-STATUS\n")
+WELCOME_BANNER = (b"Welcome to the Node database. Commands: PUT key value, GET key, UPDATE key value, DELETE key, STATUS, "
+                  b"MPUT key value [key value ...], MGET key [key ...], MDELETE key [key ...], "
+                  b"SCAN start|- end|- [LIMIT n] [CURSOR key], PREFIX prefix [LIMIT n] [CURSOR key], "
+                  b"STATUS [LIMIT n] [CURSOR key], LOGS [from] [limit], METRICS, "
+                  b"READ-MODE LINEARIZABLE|STALE lag, STALE lag GET key\n")
+READ_MODE_ERROR = "ERROR: Invalid read mode. Use LINEARIZABLE, STALE [entries] or STALE [milliseconds]ms."
+
+
 class ClientHandler:
+    welcome_banner = WELCOME_BANNER
+
     def __init__(self, database, node):
         self.database = database
         self.node = node
+        self.connections = 0
+        self.connections_lock = threading.Lock()
 
     def handle_client(self, conn, addr):
         if not self.node.running:
             conn.close()
             return
+        with self.connections_lock:
+            self.connections += 1
+        self.node.metrics.inc("raft_client_connections_total")
+        try:
+            self.serve_client(conn, addr)
+        finally:
+            with self.connections_lock:
+                self.connections -= 1
+
+    def serve_client(self, conn, addr):
         with conn:
             print(f"Client connected: {addr}")
             if self.node.state == "leader":
-                conn.sendall(b"Control cluster commands: ADD-NODE [new node ip], REMOVE-NODE [node ip], CLUSTER-STATUS\n")
-            conn.sendall(b"Welcome to the Node database. Commands: PUT key value, GET key, UPDATE key value, DELETE key, STATUS\n")
+                conn.sendall(CONTROL_BANNER)
+            conn.sendall(self.welcome_banner)
+            session = {}
+            buffer = b""
             while self.node.running:
                 try:
-                    data = conn.recv(1024).decode().strip()
+                    data = conn.recv(65536)
                     if not data:
                         break
 
-                    command = data.split()
-                    response = "ERROR: Invalid command format."
-
-                    if command[0].upper() == "ADD-NODE" \
-                        and len(command) == 2 and self.node.state == "leader":
-                        response = self.node.add_node(command[1])
-                    elif command[0].upper() == "REMOVE-NODE" \
-                        and len(command) == 2 and self.node.state == "leader":
-                        response = self.node.remove_node(command[1])
-                    elif command[0].upper() == "CLUSTER-STATUS" \
-                        and len(command) == 1 and self.node.state == "leader":
-                        response = self.node.get_cluster_status()
-                    elif command[0].upper() == "PUT" and len(command) == 3:
-                        response = self.node.handle_client_operation("SET", command[1], command[2])
-                    elif command[0].upper() == "GET" and len(command) == 2:
-                        response = self.database.get(command[1])
-                    elif command[0].upper() == "UPDATE" and len(command) == 3:
-                        response = self.node.handle_client_operation("UPDATE", command[1], command[2])
-                    elif command[0].upper() == "DELETE" and len(command) == 2:
-                        response = self.node.handle_client_operation("DELETE", command[1])
-                    elif command[0].upper() == "STATUS" and len(command) == 1:
-                        response = self.database.status()
-                    elif command[0].upper() == "LOGS" and len(command) == 1:
-                        response = self.database.show_logs()
-
-
-                    conn.sendall(response.encode() + b"\n")
+                    # Komendy są rozdzielane znakiem nowej linii, kilka komend może przyjść w jednym pakiecie
+                    buffer += data
+                    *lines, buffer = buffer.split(b"\n")
+                    if len(buffer) > MAX_LINE_LENGTH:
+                        conn.sendall(b"ERROR: Command too long.\n")
+                        break
+                    if not lines:
+                        continue
+
+                    responses = self.execute_pipeline([line.decode().strip() for line in lines], session)
+                    for chunk in self.iter_chunks(responses):
+                        conn.sendall(chunk)
                 except Exception as e:
                     print(f'ERROR - Error handling client connection:{e}')
                     conn.sendall(f"ERROR: {str(e)}\n".encode())
                     break
+
+    def execute_pipeline(self, lines, session=None):
+        steps = self.pipeline_steps(lines, {} if session is None else session)
+        result = None
+        while True:
+            try:
+                kind, args = steps.send(result)
+            except StopIteration as done:
+                return done.value
+            result = self.node.commit_entries(*args) if kind == "write" else self.execute_command(*args)
+
+    def pipeline_steps(self, lines, session):
+        # Logika porcji komend wspólna dla frontów wątkowego i asyncio. Generator zwraca kroki
+        # ("write", (wpisy,)) i ("command", (komenda, sesja, read_checks)), front wykonuje je
+        # po swojemu i odsyła wynik przez send(); na końcu zwraca sformatowane odpowiedzi
+        slots = []
+        pending = []
+        read_checks = {}
+        for line in lines:
+            if not line:
+                continue
+            tag, command = self.parse_request(line)
+            slot = [tag, None]
+            slots.append(slot)
+
+            # Kolejne zapisy trafiają do logu razem; odczyt czeka na wcześniejsze zapisy z tego połączenia
+            entry = self.build_write_entry(command)
+            if entry is not None:
+                pending.append((slot, entry))
+            else:
+                yield from self.flush_writes(pending)
+                slot[1] = yield "command", (command, session, read_checks)
+        yield from self.flush_writes(pending)
+
+        return [self.format_response(tag, response) for tag, response in slots]
+
+    def flush_writes(self, pending):
+        if pending:
+            results = yield "write", ([entry for _, entry in pending],)
+            for (slot, _), result in zip(pending, results):
+                slot[1] = result
+            pending.clear()
+
+    def parse_request(self, line):
+        command = line.split()
+        if command[0].startswith("#") and len(command[0]) > 1:
+            return command[0][1:], command[1:]
+        return None, command
+
+    def format_response(self, tag, response):
+        if not isinstance(response, str):
+            return self.format_stream(tag, response)
+        if tag is None:
+            return response + "\n"
+        # Odpowiedź wieloliniowa: "#id-" w liniach pośrednich, "#id " w ostatniej
+        lines = response.split("\n")
+        return "".join(f"#{tag}-{line}\n" for line in lines[:-1]) + f"#{tag} {lines[-1]}\n"
+
+    def execute_command(self, command, session, read_checks):
+        if command and command[0].upper() == "READ-MODE":
+            try:
+                session["read_mode"] = self.parse_read_mode(command[1:])
+            except ValueError:
+                return READ_MODE_ERROR
+            return f"SUCCESS: Read mode set to {' '.join(command[1:]).upper()}."
+
+        read_mode = session.get("read_mode")
+        if command and command[0].upper() == "STALE" and len(command) >= 3:
+            try:
+                read_mode = self.parse_read_mode(command[:2])
+            except ValueError:
+                return READ_MODE_ERROR
+            command = command[2:]
+
+        if self.is_read(command):
+            # Jedno sprawdzenie na tryb odczytu wystarcza dla wszystkich odczytów z tej porcji komend
+            check = read_checks.get(read_mode)
+            if check is None:
+                check = read_checks[read_mode] = self.check_read(read_mode)
+            if isinstance(check, str):
+                return check
+        return self.execute(command)
+
+    def parse_read_mode(self, words):
+        if len(words) == 1 and words[0].upper() == "LINEARIZABLE":
+            return None
+        if len(words) != 2 or words[0].upper() != "STALE":
+            raise ValueError(words)
+        lag = words[1].lower()
+        if lag.endswith("ms"):
+            return int(lag[:-2]), "ms"
+        return int(lag), "entries"
+
+    def check_read(self, read_mode):
+        if read_mode is None:
+            return self.node.read_index()
+        return self.node.bounded_read(*read_mode)
+
+    def parse_range_options(self, words):
+        limit, cursor = DEFAULT_SCAN_LIMIT, None
+        if len(words) % 2:
+            return None
+        for name, value in zip(words[::2], words[1::2]):
+            if name.upper() == "LIMIT" and value.isdigit() and 0 < int(value) <= MAX_SCAN_LIMIT:
+                limit = int(value)
+            elif name.upper() == "CURSOR":
+                cursor = value
+            else:
+                return None
+        return limit, cursor
+
+    def is_read(self, command):
+        return bool(command) and command[0].upper() in READ_COMMANDS
+
+    def format_stream(self, tag, lines):
+        # Odpowiedź strumieniowa: linie formatowane na bieżąco, ostatnią rozpoznajemy z opóźnieniem o jedną
+        previous = None
+        for line in lines:
+            if previous is not None:
+                yield f"#{tag}-{previous}\n" if tag is not None else previous + "\n"
+            previous = line
+        yield f"#{tag} {previous}\n" if tag is not None else previous + "\n"
+
+    def iter_chunks(self, responses):
+        parts = []
+        size = 0
+        for response in responses:
+            for part in (response,) if isinstance(response, str) else response:
+                parts.append(part)
+                size += len(part)
+                if size >= RESPONSE_CHUNK_SIZE:
+                    yield "".join(parts).encode()
+                    parts = []
+                    size = 0
+        if parts:
+            yield "".join(parts).encode()
+
+    def build_write_entry(self, command):
+        if not command or command[0].upper() not in WRITE_COMMANDS:
+            return None
+        name = command[0].upper()
+        if name == "PUT" and len(command) == 3:
+            return self.node.new_entry("SET", command[1], command[2])
+        if name == "UPDATE" and len(command) == 3:
+            return self.node.new_entry("UPDATE", command[1], command[2])
+        if name == "DELETE" and len(command) == 2:
+            return self.node.new_entry("DELETE", command[1])
+        if name == "MPUT" and len(command) >= 3 and len(command) % 2 == 1:
+            return self.node.new_batch_entry("SET", list(zip(command[1::2], command[2::2])))
+        if name == "MDELETE" and len(command) >= 2:
+            return self.node.new_batch_entry("DELETE", [(key, None) for key in command[1:]])
+        return None
+
+    def execute(self, command):
+        response = "ERROR: Invalid command format."
+        if not command:
+            return response
+
+        if command[0].upper() == "ADD-NODE" \
+            and len(command) == 2 and self.node.state == "leader":
+            response = self.node.add_node(command[1])
+        elif command[0].upper() == "REMOVE-NODE" \
+            and len(command) == 2 and self.node.state == "leader":
+            response = self.node.remove_node(command[1])
+        elif command[0].upper() == "TRANSFER-LEADER" \
+            and len(command) == 2 and self.node.state == "leader":
+            response = self.node.transfer_leader(command[1])
+        elif command[0].upper() == "CLUSTER-STATUS" \
+            and len(command) == 1 and self.node.state == "leader":
+            response = self.node.get_cluster_status()
+        elif command[0].upper() == "GET" and len(command) == 2:
+            response = self.database.get(command[1])
+        elif command[0].upper() == "MGET" and len(command) >= 2:
+            response = self.database.mget(command[1:])
+        elif command[0].upper() == "SCAN" and len(command) >= 3:
+            options = self.parse_range_options(command[3:])
+            if options is not None:
+                limit, cursor = options
+                start = cursor or (None if command[1] == "-" else command[1])
+                end = None if command[2] == "-" else command[2]
+                response = self.database.scan(start, end, limit)
+        elif command[0].upper() == "PREFIX" and len(command) >= 2:
+            options = self.parse_range_options(command[2:])
+            if options is not None:
+                limit, cursor = options
+                response = self.database.prefix(command[1], limit, cursor)
+        elif command[0].upper() == "STATUS" and len(command) == 1:
+            response = self.database.status_lines()
+        elif command[0].upper() == "STATUS":
+            options = self.parse_range_options(command[1:])
+            if options is not None:
+                response = self.database.status_lines(*options)
+        elif command[0].upper() == "METRICS" and len(command) == 1:
+            response = self.node.metrics_lines()
+        elif command[0].upper() == "LOGS" and len(command) <= 3 \
+            and all(arg.isdigit() for arg in command[1:]):
+            response = self.database.iter_logs(*(int(arg) for arg in command[1:]))
+
+        return response
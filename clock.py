@@ -0,0 +1,24 @@
+import time
+
+
+class SystemClock:
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+
+class ManualClock:
+    # Czas wirtualny przesuwany przez symulator; time() i monotonic() zwracają tę samą wartość
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance_to(self, now):
+        self.now = max(self.now, now)
@@ -0,0 +1,399 @@
+import json
+import struct
+from itertools import accumulate
+from logentry import LogEntry
+
+# Format binarny: bajt 0x00, bajt wersji, zakodowana wiadomość.
+# Wiadomości JSON zaczynają się od "{", więc oba formaty można rozróżnić po pierwszym bajcie.
+BINARY_MARKER = 0
+
+TAG_NONE = 0
+TAG_TRUE = 1
+TAG_FALSE = 2
+TAG_INT = 3
+TAG_FLOAT = 4
+TAG_STR = 5
+TAG_BYTES = 6
+TAG_LIST = 7
+TAG_DICT = 8
+TAG_ENTRY = 9
+TAG_INTERNED = 10
+TAG_ENTRY_LIST = 11
+TAG_ENTRY_COLUMNS = 12
+
+# Nazwy pól, typy wiadomości i operacje kodowane jako jeden bajt. Każde rozszerzenie tabeli to nowa
+# wersja kodeka: nazwy dopisujemy tylko na końcu, a nadawca internuje wyłącznie nazwy znane w wersji
+# uzgodnionej z odbiorcą (minimum obu stron), pozostałe wysyła jako zwykłe napisy
+INTERNED_VERSIONS = [
+    # 1: wiadomości Raft i operacje
+    ["type", "term", "leader_id", "candidate_id", "voter_id", "granted", "sender",
+     "prev_log_index", "prev_log_term", "entries", "leader_commit", "success",
+     "node_id", "node_peer", "match_index", "next_index", "removed_node",
+     "last_included_index", "last_included_term", "store", "codec_version",
+     "operation", "key", "value",
+     "heartbeat", "request_vote", "vote_response", "leader_announcement",
+     "append_entries", "append_entries_response", "install_snapshot",
+     "install_snapshot_response", "remove_node", "stop_node",
+     "SET", "UPDATE", "DELETE"],
+    # 2: potokowa replikacja
+    ["last_log_index"],
+    # 3: wskazówki konfliktu w odrzuconym AppendEntries
+    ["conflict_index", "conflict_term"],
+    # 4: operacje wsadowe
+    ["BATCH", "ops"],
+    # 5: ReadIndex
+    ["read_round", "NOOP"],
+    # 6: rekordy WAL wysyłane bez ponownego kodowania
+    ["raw_entries", "index", "entry"],
+    # 7: PreVote i przekazanie przywództwa
+    ["last_log_term", "transfer", "pre_vote", "pre_vote_response", "pre_vote_term", "timeout_now"],
+    # 8: learnerzy
+    ["add_node", "added_node"],
+    # 9: listy wpisów zapisane kolumnami (TAG_ENTRY_COLUMNS)
+    [],
+]
+INTERNED = [name for names in INTERNED_VERSIONS for name in names]
+CODEC_VERSION = len(INTERNED_VERSIONS)
+SUPPORTED_VERSIONS = tuple(range(1, CODEC_VERSION + 1))
+# Liczba pozycji tabeli znanych w danej wersji
+INTERNED_LIMITS = {version: sum(len(names) for names in INTERNED_VERSIONS[:version]) for version in SUPPORTED_VERSIONS}
+
+# Od tej wersji dłuższe listy wpisów idą kolumnami, wcześniej wpis po wpisie. Przy kilku wpisach
+# stały koszt kolumn przeważa, więc krótkie listy zostają w starym układzie
+ENTRY_COLUMNS_VERSION = 9
+ENTRY_COLUMNS_MIN = 16
+
+INTERNED_IDS = {name: i for i, name in enumerate(INTERNED)}
+
+OPERATIONS = ["SET", "UPDATE", "DELETE"]
+OPERATION_IDS = {name: i for i, name in enumerate(OPERATIONS)}
+# Operacja dla każdej wartości bajtu flag (op << 1 | jest_wartość)
+FLAG_OPERATIONS = [name for name in OPERATIONS for _ in range(2)]
+ENTRY_FIELDS = {"term", "operation", "key", "value"}
+
+DOUBLE = struct.Struct(">d")
+LENGTH_FORMATS = {2: "H", 4: "I"}
+
+
+def write_varint(buf, n):
+    while n > 0x7F:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def read_varint(data, offset):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+def write_str(buf, s):
+    raw = s.encode()
+    write_varint(buf, len(raw))
+    buf += raw
+
+
+def read_str(data, offset):
+    length = data[offset]
+    if length < 0x80:
+        offset += 1
+    else:
+        length, offset = read_varint(data, offset)
+    end = offset + length
+    return data[offset:end].decode(), end
+
+
+def write_key(buf, key, version):
+    field_id = INTERNED_IDS.get(key)
+    if field_id is not None and field_id < INTERNED_LIMITS[version]:
+        write_varint(buf, field_id + 1)
+    else:
+        buf.append(0)
+        write_str(buf, key)
+
+
+def read_key(data, offset):
+    field_id, offset = read_varint(data, offset)
+    if field_id:
+        return INTERNED[field_id - 1], offset
+    return read_str(data, offset)
+
+
+def is_entry(value):
+    return (
+        len(value) == 4
+        and value.keys() == ENTRY_FIELDS
+        and value["operation"] in OPERATION_IDS
+        and type(value["term"]) is int
+        and type(value["key"]) is str
+        and (value["value"] is None or type(value["value"]) is str)
+    )
+
+
+def is_compact_entry(entry):
+    return (
+        entry.ops is None
+        and entry.operation in OPERATION_IDS
+        and type(entry.term) is int
+        and type(entry.key) is str
+        and (entry.value is None or type(entry.value) is str)
+    )
+
+
+def write_entry(buf, term, operation, key, value):
+    write_varint(buf, term)
+    # Najniższy bit bajtu operacji: czy jest wartość
+    buf.append(OPERATION_IDS[operation] << 1 | (value is not None))
+    write_str(buf, key)
+    if value is not None:
+        write_str(buf, value)
+
+
+def read_entry(data, offset):
+    term, offset = read_varint(data, offset)
+    flags = data[offset]
+    key, offset = read_str(data, offset + 1)
+    value = None
+    if flags & 1:
+        value, offset = read_str(data, offset)
+    return LogEntry(term, OPERATIONS[flags >> 1], key, value), offset
+
+
+def write_entry_list(buf, entries):
+    write_varint(buf, len(entries))
+    if type(entries[0]) is LogEntry:
+        for entry in entries:
+            write_entry(buf, entry.term, entry.operation, entry.key, entry.value)
+    else:
+        for entry in entries:
+            write_entry(buf, entry["term"], entry["operation"], entry["key"], entry["value"])
+
+
+def is_entry_list(value):
+    if not value:
+        return False
+    if type(value[0]) is LogEntry:
+        return all(type(item) is LogEntry and is_compact_entry(item) for item in value)
+    return all(type(item) is dict and is_entry(item) for item in value)
+
+
+def read_entry_list(data, offset):
+    count, offset = read_varint(data, offset)
+    entries = []
+    append = entries.append
+    for _ in range(count):
+        entry, offset = read_entry(data, offset)
+        append(entry)
+    return entries, offset
+
+
+# Układ kolumnowy: liczba wpisów, serie terminów (term, długość), bajty flag, długości kluczy i wartości
+# o stałej szerokości, a na końcu sklejone klucze i sklejone wartości. Odbiorca rozpakowuje każdą kolumnę
+# jednym wywołaniem zamiast parsować wpis po wpisie
+def write_lengths(buf, lengths):
+    top = max(lengths, default=0)
+    width = 1 if top < 0x100 else 2 if top < 0x10000 else 4
+    buf.append(width)
+    if width == 1:
+        buf += bytes(lengths)
+    else:
+        buf += struct.pack(f"<{len(lengths)}{LENGTH_FORMATS[width]}", *lengths)
+
+
+def read_lengths(data, offset, count):
+    width = data[offset]
+    offset += 1
+    end = offset + count * width
+    if width == 1:
+        return data[offset:end], end
+    return struct.unpack_from(f"<{count}{LENGTH_FORMATS[width]}", data, offset), end
+
+
+def read_strings(data, offset, lengths):
+    ends = list(accumulate(lengths))
+    starts = [0] + ends[:-1]
+    end = offset + (ends[-1] if ends else 0)
+    blob = data[offset:end]
+    text = blob.decode()
+    if len(text) == len(blob):
+        # Same znaki ASCII: pozycje bajtów są pozycjami znaków, więc tniemy gotowy napis
+        return [text[start:stop] for start, stop in zip(starts, ends)], end
+    return [blob[start:stop].decode() for start, stop in zip(starts, ends)], end
+
+
+def write_entry_columns(buf, entries):
+    if type(entries[0]) is not LogEntry:
+        entries = [LogEntry.from_dict(entry) for entry in entries]
+    write_varint(buf, len(entries))
+    runs = []
+    for entry in entries:
+        if runs and runs[-1][0] == entry.term:
+            runs[-1][1] += 1
+        else:
+            runs.append([entry.term, 1])
+    write_varint(buf, len(runs))
+    for term, length in runs:
+        write_varint(buf, term)
+        write_varint(buf, length)
+    buf += bytes(OPERATION_IDS[entry.operation] << 1 | (entry.value is not None) for entry in entries)
+    keys = [entry.key.encode() for entry in entries]
+    values = [entry.value.encode() for entry in entries if entry.value is not None]
+    write_lengths(buf, [len(key) for key in keys])
+    write_lengths(buf, [len(value) for value in values])
+    buf += b"".join(keys)
+    buf += b"".join(values)
+
+
+def read_entry_columns(data, offset):
+    count, offset = read_varint(data, offset)
+    runs, offset = read_varint(data, offset)
+    terms = []
+    for _ in range(runs):
+        term, offset = read_varint(data, offset)
+        length, offset = read_varint(data, offset)
+        terms += [term] * length
+    end = offset + count
+    flags = data[offset:end]
+    key_lengths, offset = read_lengths(data, end, count)
+    value_count = flags.count(1) + flags.count(3) + flags.count(5)
+    value_lengths, offset = read_lengths(data, offset, value_count)
+    keys, offset = read_strings(data, offset, key_lengths)
+    values, offset = read_strings(data, offset, value_lengths)
+    if value_count != count:
+        present = iter(values)
+        values = [next(present) if flag & 1 else None for flag in flags]
+    operations = [FLAG_OPERATIONS[flag] for flag in flags]
+    return list(map(LogEntry, terms, operations, keys, values)), offset
+
+
+def write_value(buf, value, version):
+    kind = type(value)
+    if value is None:
+        buf.append(TAG_NONE)
+    elif value is True:
+        buf.append(TAG_TRUE)
+    elif value is False:
+        buf.append(TAG_FALSE)
+    elif kind is int:
+        buf.append(TAG_INT)
+        write_varint(buf, value << 1 if value >= 0 else ((-value) << 1) - 1)
+    elif kind is float:
+        buf.append(TAG_FLOAT)
+        buf += DOUBLE.pack(value)
+    elif kind is str:
+        interned = INTERNED_IDS.get(value)
+        if interned is not None and interned < INTERNED_LIMITS[version]:
+            buf.append(TAG_INTERNED)
+            buf.append(interned)
+        else:
+            buf.append(TAG_STR)
+            write_str(buf, value)
+    elif kind is bytes or kind is bytearray or kind is memoryview:
+        buf.append(TAG_BYTES)
+        write_varint(buf, len(value))
+        buf += value
+    elif kind is LogEntry:
+        if is_compact_entry(value):
+            buf.append(TAG_ENTRY)
+            write_entry(buf, value.term, value.operation, value.key, value.value)
+        else:
+            write_value(buf, value.to_dict(), version)
+    elif kind is list and is_entry_list(value):
+        if version >= ENTRY_COLUMNS_VERSION and len(value) >= ENTRY_COLUMNS_MIN:
+            buf.append(TAG_ENTRY_COLUMNS)
+            write_entry_columns(buf, value)
+        else:
+            buf.append(TAG_ENTRY_LIST)
+            write_entry_list(buf, value)
+    elif kind is list or kind is tuple:
+        buf.append(TAG_LIST)
+        write_varint(buf, len(value))
+        for item in value:
+            write_value(buf, item, version)
+    elif kind is dict:
+        if is_entry(value):
+            buf.append(TAG_ENTRY)
+            write_entry(buf, value["term"], value["operation"], value["key"], value["value"])
+        else:
+            buf.append(TAG_DICT)
+            write_varint(buf, len(value))
+            for key, item in value.items():
+                write_key(buf, key, version)
+                write_value(buf, item, version)
+    else:
+        raise TypeError(f"Cannot encode value of type {kind.__name__}")
+
+
+def read_value(data, offset):
+    tag = data[offset]
+    offset += 1
+    if tag == TAG_ENTRY_COLUMNS:
+        return read_entry_columns(data, offset)
+    if tag == TAG_ENTRY_LIST:
+        return read_entry_list(data, offset)
+    if tag == TAG_ENTRY:
+        return read_entry(data, offset)
+    if tag == TAG_INTERNED:
+        return INTERNED[data[offset]], offset + 1
+    if tag == TAG_INT:
+        n, offset = read_varint(data, offset)
+        return (n >> 1) ^ -(n & 1), offset
+    if tag == TAG_STR:
+        return read_str(data, offset)
+    if tag == TAG_NONE:
+        return None, offset
+    if tag == TAG_TRUE:
+        return True, offset
+    if tag == TAG_FALSE:
+        return False, offset
+    if tag == TAG_LIST:
+        count, offset = read_varint(data, offset)
+        items = []
+        for _ in range(count):
+            item, offset = read_value(data, offset)
+            items.append(item)
+        return items, offset
+    if tag == TAG_DICT:
+        count, offset = read_varint(data, offset)
+        result = {}
+        for _ in range(count):
+            key, offset = read_key(data, offset)
+            result[key], offset = read_value(data, offset)
+        return result, offset
+    if tag == TAG_FLOAT:
+        return DOUBLE.unpack_from(data, offset)[0], offset + DOUBLE.size
+    if tag == TAG_BYTES:
+        length, offset = read_varint(data, offset)
+        return data[offset:offset + length], offset + length
+    raise ValueError(f"Unknown tag {tag} at offset {offset - 1}")
+
+
+def to_json(value):
+    if type(value) is LogEntry:
+        return value.to_dict()
+    raise TypeError(f"Cannot encode value of type {type(value).__name__}")
+
+
+def encode_message(message, version=None):
+    if version is None:
+        return json.dumps(message, default=to_json).encode()
+    buf = bytearray((BINARY_MARKER, version))
+    write_value(buf, message, version)
+    return bytes(buf)
+
+
+def decode_message(data):
+    if data[0] != BINARY_MARKER:
+        return json.loads(data.decode()), None
+    version = data[1]
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported codec version {version}")
+    message, _ = read_value(bytes(data), 2)
+    return message, version
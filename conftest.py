@@ -0,0 +1,108 @@
+import socket
+import threading
+import time
+from collections import deque
+import pytest
+from codec import decode_message
+from node import Node
+
+
+class LoopbackTransport:
+    def __init__(self, network, address):
+        self.network = network
+        self.address = address
+        network[address] = deque()
+
+    def send(self, data, destination):
+        self.network[tuple(destination)].append(data)
+
+    def receive(self, timeout=None):
+        inbox = self.network[self.address]
+        return inbox.popleft() if inbox else None
+
+    def close(self):
+        pass
+
+
+def free_port():
+    # Port +100 też musi być wolny: serwer klientów słucha na porcie węzła + 100
+    while True:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        try:
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", port + 100))
+            return port
+        except OSError:
+            continue
+
+
+def make_entries(term, start, count):
+    return [
+        {"term": term, "operation": "SET", "key": f"key_{term}_{i}", "value": f"value{i}"}
+        for i in range(start, start + count)
+    ]
+
+
+def pump(network, nodes):
+    rejections = 0
+    delivered = True
+    while delivered:
+        delivered = False
+        for node in nodes:
+            data = node.transport.receive()
+            if data is None:
+                continue
+            delivered = True
+            message, _ = decode_message(data)
+            if message["type"] == "append_entries_response" and not message["success"]:
+                rejections += 1
+            node.handle_message(data)
+    return rejections
+
+
+def call_pumping(network, nodes, func, *args):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func(*args)))
+    thread.start()
+    while thread.is_alive():
+        pump(network, nodes)
+        time.sleep(0.001)
+    return result[0]
+
+
+def elect(leader, term):
+    leader.current_term = term
+    leader.state = "candidate"
+    leader.become_leader()
+
+
+@pytest.fixture
+def cluster():
+    network = {}
+    leader_port, follower_port = free_port(), free_port()
+    leader_address = ("127.0.0.1", leader_port)
+    follower_address = ("127.0.0.1", follower_port)
+    leader = Node("Leader", "127.0.0.1", leader_port, [follower_address],
+                  transport=LoopbackTransport(network, leader_address))
+    follower = Node("Follower", "127.0.0.1", follower_port, [leader_address],
+                    transport=LoopbackTransport(network, follower_address))
+    yield network, leader, follower
+    leader.stop()
+    follower.stop()
+
+
+@pytest.fixture
+def three_nodes():
+    network = {}
+    ports = [free_port() for _ in range(3)]
+    addresses = [("127.0.0.1", port) for port in ports]
+    nodes = [
+        Node(f"Node_{i + 1}", "127.0.0.1", port, addresses[:i] + addresses[i + 1:],
+             transport=LoopbackTransport(network, addresses[i]))
+        for i, port in enumerate(ports)
+    ]
+    yield network, nodes
+    for node in nodes:
+        node.stop()
@@ -1,22 +1,265 @@
+import os
+import bisect
+import itertools
+import json
+import logging
+import threading
+import time
+from wal import WriteAheadLog
+from logentry import LogEntry
+from keyindex import KeyIndex
+
+SNAPSHOT_FILE = "snapshot.json"
+STATE_FILE = "state.json"
+
+
 class Database:
-    def __init__(self):
+    def __init__(self, data_dir=None, group_commit=True, snapshot_threshold=1000):
         self.store = {}
+        # Posortowane klucze store dla zapytań zakresowych
+        self.index = KeyIndex()
         self.log = []
         self.commit_index = -1
+        self.lock = threading.RLock()
+
+        # Log zawiera tylko wpisy po snapshot_index
+        self.snapshot_index = -1
+        self.snapshot_term = 0
+        self.snapshot_threshold = snapshot_threshold
+        self.snapshot_lock = threading.Lock()
+        self.snapshot_thread = None
+
+        # Trwały stan węzła: kadencja, głos i ostatni zapisany commit_index
+        self.state = {"term": 0, "voted_for": None, "commit_index": -1}
+        self.state_lock = threading.Lock()
+        self.recovery_timings = {}
+
+        self.data_dir = data_dir
+        self.wal = None
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+            self.recover(group_commit)
+
+    def recover(self, group_commit):
+        # Snapshot, potem tylko ogon WAL; wpisy do zapisanego commit_index trafiają od razu do store
+        started = time.perf_counter()
+        self.load_snapshot()
+        snapshot_loaded = time.perf_counter()
+
+        self.wal = WriteAheadLog(os.path.join(self.data_dir, "wal"), group_commit=group_commit)
+        for index, entry in self.wal.read_entries(self.snapshot_index):
+            if index <= self.snapshot_index:
+                continue
+            del self.log[index - self.snapshot_index - 1:]
+            self.log.append(LogEntry.from_dict(entry))
+        wal_replayed = time.perf_counter()
+
+        self.load_state()
+        self.commit_log_entries(min(self.state["commit_index"], self.last_index()))
+        applied = time.perf_counter()
+
+        self.recovery_timings = {
+            "snapshot": snapshot_loaded - started,
+            "wal": wal_replayed - snapshot_loaded,
+            "apply": applied - wal_replayed,
+        }
+        logging.info(
+            f"Recovered {self.data_dir}: snapshot at {self.snapshot_index} in {self.recovery_timings['snapshot']:.3f}s, "
+            f"{len(self.log)} WAL entries in {self.recovery_timings['wal']:.3f}s, "
+            f"applied up to {self.commit_index} in {self.recovery_timings['apply']:.3f}s"
+        )
+
+    def last_index(self):
+        return self.snapshot_index + len(self.log)
+
+    def term_at(self, index):
+        if index < 0:
+            return 0
+        if index == self.snapshot_index:
+            return self.snapshot_term
+        if index < self.snapshot_index or index > self.last_index():
+            return None
+        return self.log[index - self.snapshot_index - 1].term
+
+    def first_index_of_term(self, term):
+        # Kadencje w logu są niemalejące, więc wystarczy wyszukiwanie binarne
+        position = bisect.bisect_left(self.log, term, key=lambda entry: entry.term)
+        return self.snapshot_index + 1 + position
+
+    def last_index_of_term(self, term):
+        position = bisect.bisect_right(self.log, term, key=lambda entry: entry.term)
+        if position > 0 and self.log[position - 1].term == term:
+            return self.snapshot_index + position
+        if position == 0 and self.snapshot_index >= 0 and self.snapshot_term == term:
+            return self.snapshot_index
+        return None
+
+    def entry_at(self, index):
+        if index <= self.snapshot_index:
+            raise IndexError(f"Entry {index} is compacted into the snapshot at {self.snapshot_index}")
+        return self.log[index - self.snapshot_index - 1]
+
+    def entries_from(self, index, limit=None):
+        # Wpisy sprzed snapshotu już nie istnieją; przycięcie początku przesunęłoby indeksy wyniku
+        if index <= self.snapshot_index:
+            raise IndexError(f"Entry {index} is compacted into the snapshot at {self.snapshot_index}")
+        start = index - self.snapshot_index - 1
+        end = start + limit if limit is not None else len(self.log)
+        return self.log[start:end]
 
     def append_log(self, operation):
-        self.log.append(operation)
-        return len(self.log) - 1 
+        entry = LogEntry.from_dict(operation)
+        with self.lock:
+            self.log.append(entry)
+            index = self.last_index()
+            if self.wal:
+                self.wal.append(index, entry)
+        if self.wal:
+            self.wal.sync()
+        return index
+
+    def append_entries(self, entries, on_index=None):
+        with self.lock:
+            first_index = self.last_index() + 1
+            if on_index is not None:
+                # Wywołujący poznaje indeksy, zanim wpisy trafią do logu i mogą zostać zatwierdzone
+                on_index(first_index)
+            for entry in entries:
+                entry = LogEntry.from_dict(entry)
+                self.log.append(entry)
+                if self.wal:
+                    self.wal.append(self.last_index(), entry)
+        if self.wal:
+            self.wal.sync()
+        return first_index
+
+    def truncate_log(self, index):
+        with self.lock:
+            del self.log[index - self.snapshot_index - 1:]
+            if self.wal:
+                self.wal.truncate(index)
+
+    def load_snapshot(self):
+        path = os.path.join(self.data_dir, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            snapshot = json.load(f)
+        self.snapshot_index = snapshot["index"]
+        self.snapshot_term = snapshot["term"]
+        self.store = snapshot["store"]
+        self.index = KeyIndex(self.store)
+        self.commit_index = self.snapshot_index
+
+    def save_snapshot(self, index, term, store):
+        path = os.path.join(self.data_dir, SNAPSHOT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"index": index, "term": term, "store": store}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def load_state(self):
+        path = os.path.join(self.data_dir, STATE_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            self.state.update(json.load(f))
+
+    def save_state(self, term, voted_for):
+        path = os.path.join(self.data_dir, STATE_FILE)
+        tmp_path = path + ".tmp"
+        with self.state_lock:
+            state = {"term": term, "voted_for": voted_for, "commit_index": self.commit_index}
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            self.state = state
+
+    def maybe_snapshot(self):
+        # Koszt snapshotu rośnie z rozmiarem store, więc robimy go nie częściej niż co len(store) wpisów.
+        # Z katalogiem danych zapis i fsync idą w osobnym wątku, żeby nie zatrzymywać taktów węzła
+        if self.commit_index - self.snapshot_index < max(self.snapshot_threshold, len(self.store)):
+            return None
+        if not self.data_dir:
+            self.take_snapshot()
+            return None
+        if self.snapshot_thread is not None and self.snapshot_thread.is_alive():
+            return None
+        self.snapshot_thread = threading.Thread(target=self.take_snapshot, daemon=True)
+        self.snapshot_thread.start()
+        return self.snapshot_thread
+
+    def take_snapshot(self):
+        with self.snapshot_lock:
+            # Pod blokadą tylko kopia store; serializacja i fsync bez niej, żeby nie wstrzymywać
+            # dopisywania, commitów i odczytów
+            with self.lock:
+                index = self.commit_index
+                if index <= self.snapshot_index:
+                    return
+                term = self.term_at(index)
+                store = dict(self.store) if self.data_dir else None
+            if self.data_dir:
+                self.save_snapshot(index, term, store)
+            with self.lock:
+                del self.log[:index - self.snapshot_index]
+                self.snapshot_index = index
+                self.snapshot_term = term
+            if self.wal:
+                self.wal.compact(index)
+        logging.info(f"Snapshot taken at index {index} (term {term}), {len(self.log)} entries left in log")
+
+    def install_snapshot(self, index, term, store):
+        # snapshot_lock: plik snapshotu z take_snapshot nie może nadpisać nowszego
+        with self.snapshot_lock, self.lock:
+            if index <= self.commit_index:
+                return
+            if self.term_at(index) == term:
+                del self.log[:index - self.snapshot_index]
+            else:
+                self.log = []
+            self.store = dict(store)
+            self.index = KeyIndex(self.store)
+            self.commit_index = index
+            self.snapshot_index = index
+            self.snapshot_term = term
+            if self.data_dir:
+                self.save_snapshot(index, term, self.store)
+            if self.wal:
+                if self.log:
+                    self.wal.compact(index)
+                else:
+                    self.wal.reset(index + 1)
+        logging.info(f"Installed snapshot at index {index} (term {term})")
+
+    def close(self):
+        if self.snapshot_thread is not None:
+            self.snapshot_thread.join()
+        if self.wal:
+            self.wal.close()
+            self.save_state(self.state["term"], self.state["voted_for"])
 
     def apply_log_entry(self, entry):
-        operation = entry["operation"]
-        key = entry["key"]
-        value = entry.get("value")
+        if entry.operation == "BATCH":
+            # Cały wpis jest stosowany pod jedną blokadą, wynik dla każdego klucza w osobnej linii
+            with self.lock:
+                return "\n".join(self.apply_operation(op, key, value) for op, key, value in entry.ops)
+        return self.apply_operation(entry.operation, entry.key, entry.value)
+
+    def apply_operation(self, operation, key, value):
+        if operation == "NOOP":
+            # Pusty wpis lidera, zatwierdzany przed pierwszym odczytem w nowej kadencji
+            return None
 
         if operation == "SET":
             if key in self.store.keys():
                 return "ERROR: Key already exists."
             self.store[key] = value
+            self.index.add(key)
             return f"SUCCESS: {key} -> {value} added."
         elif operation == "UPDATE":
             if key in self.store:
@@ -26,16 +269,18 @@ class Database:
         elif operation == "DELETE":
             if key in self.store:
                 del self.store[key]
+                self.index.remove(key)
                 return f"SUCCESS: {key} removed."
             return "ERROR: Key not found."
 
 
     def commit_log_entries(self, commit_index):
         result = None
-        while self.commit_index < commit_index:
-            self.commit_index += 1
-            if self.commit_index < len(self.log):
-                result = self.apply_log_entry(self.log[self.commit_index])
+        with self.lock:
+            while self.commit_index < commit_index:
+                self.commit_index += 1
+                if self.commit_index <= self.last_index():
+                    result = self.apply_log_entry(self.entry_at(self.commit_index))
         return result
 
     def get(self, key):
@@ -43,22 +288,94 @@ class Database:
             return f"{key} -> {self.store[key]}"
         return "ERROR: Key not found."
 
+    def mget(self, keys):
+        with self.lock:
+            values = [self.store.get(key) for key in keys]
+        return "\n".join(
+            f"{key} -> {value}" if value is not None else "ERROR: Key not found."
+            for key, value in zip(keys, values)
+        )
+
+    def scan(self, start, end, limit):
+        with self.lock:
+            return self.range_page(self.index.irange(start, end), limit)
+
+    def prefix(self, prefix, limit, cursor=None):
+        with self.lock:
+            keys = self.index.irange(max(prefix, cursor) if cursor else prefix)
+            return self.range_page(itertools.takewhile(lambda key: key.startswith(prefix), keys), limit)
+
+    def range_page(self, keys, limit):
+        # Ostatnia linia: "CURSOR klucz" do pobrania kolejnej strony albo "END"
+        lines = []
+        for key in keys:
+            if len(lines) == limit:
+                lines.append(f"CURSOR {key}")
+                return "\n".join(lines)
+            lines.append(f"{key} -> {self.store[key]}")
+        lines.append("END")
+        return "\n".join(lines)
+
     def status(self):
-        keys = ", ".join(self.store.keys())
-        return f"Database keys: {keys}" if keys else "Database is empty."
-    
+        return "\n".join(self.status_lines())
+
+    def status_lines(self, limit=None, cursor=None, keys_per_line=100):
+        with self.lock:
+            count = len(self.store)
+        if not count:
+            return iter(["Database is empty."])
+        return self.stream_keys(count, limit, cursor, keys_per_line)
+
+    def stream_keys(self, count, limit, cursor, keys_per_line):
+        # Klucze pobierane porcjami pod krótko trzymaną blokadą, bez budowania całej listy
+        yield f"Database keys: {count}"
+        start, remaining = cursor, limit
+        while remaining is None or remaining > 0:
+            take = keys_per_line if remaining is None else min(keys_per_line, remaining)
+            with self.lock:
+                keys = list(itertools.islice(self.index.irange(start), take + 1))
+            start = keys[take] if len(keys) > take else None
+            if keys:
+                yield ", ".join(keys[:take])
+            if remaining is not None:
+                remaining -= len(keys[:take])
+            if start is None:
+                break
+        if limit is not None:
+            yield f"CURSOR {start}" if start is not None else "END"
+
     def show_logs(self):
-        if not self.log:
-            return "Logs are empty."
+        return "\n".join(self.iter_logs())
 
-        lines = []
-        for index, entry in enumerate(self.log):
-            term = entry.get("term", "-")
-            operation = entry.get("operation", "-")
-            key = entry.get("key", "-")
-            value = entry.get("value", "-")
-            lines.append(
-                f"Index: {index}, Term: {term}, Operation: {operation}, Key: {key}, Value: {value}"
-            )
-
-        return "Database logs:\n" + "\n".join(lines)
+    def iter_logs(self, start=None, limit=None, chunk_size=256):
+        with self.lock:
+            first = self.snapshot_index + 1
+            end = self.last_index() + 1
+        if first == end:
+            if self.snapshot_index >= 0:
+                return iter([f"Logs are empty. Snapshot covers entries up to index {self.snapshot_index}."])
+            return iter(["Logs are empty."])
+        # Zakres ustalany w chwili wykonania komendy, późniejsze wpisy nie trafiają do wyniku
+        start = first if start is None else max(start, first)
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.stream_logs(start, end, chunk_size)
+
+    def stream_logs(self, index, end, chunk_size):
+        yield "Database logs:"
+        while index < end:
+            with self.lock:
+                index = max(index, self.snapshot_index + 1)
+                entries = self.entries_from(index, min(chunk_size, end - index))
+            if not entries:
+                return
+            for entry in entries:
+                yield self.format_log_entry(index, entry)
+                index += 1
+
+    def format_log_entry(self, index, entry):
+        key, value = entry.key, entry.value
+        if entry.operation == "BATCH":
+            key = ",".join(op_key for _, op_key, _ in entry.ops)
+            value = ",".join(str(op_value) for _, _, op_value in entry.ops)
+        return f"Index: {index}, Term: {entry.term}, Operation: {entry.operation}, Key: {key}, Value: {value}"
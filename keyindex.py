@@ -0,0 +1,87 @@
+import bisect
+
+
+class KeyIndex:
+    # Posortowane klucze w blokach po najwyżej 2 * load elementów: wstawienie i usunięcie
+    # kosztuje O(log n + load), przejście zakresu O(log n + k)
+    def __init__(self, keys=(), load=512):
+        self.load = load
+        self.chunks = []
+        self.maxes = []
+        ordered = sorted(keys)
+        for start in range(0, len(ordered), load):
+            chunk = ordered[start:start + load]
+            self.chunks.append(chunk)
+            self.maxes.append(chunk[-1])
+        self.size = len(ordered)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        position = bisect.bisect_left(self.maxes, key)
+        if position == len(self.maxes):
+            return False
+        chunk = self.chunks[position]
+        offset = bisect.bisect_left(chunk, key)
+        return chunk[offset] == key
+
+    def add(self, key):
+        if not self.chunks:
+            self.chunks.append([key])
+            self.maxes.append(key)
+            self.size = 1
+            return
+
+        position = bisect.bisect_left(self.maxes, key)
+        if position == len(self.maxes):
+            position -= 1
+        chunk = self.chunks[position]
+        offset = bisect.bisect_left(chunk, key)
+        if offset < len(chunk) and chunk[offset] == key:
+            return
+        chunk.insert(offset, key)
+        self.maxes[position] = chunk[-1]
+        self.size += 1
+
+        if len(chunk) > 2 * self.load:
+            self.chunks.insert(position + 1, chunk[self.load:])
+            del chunk[self.load:]
+            self.maxes.insert(position, chunk[-1])
+
+    def remove(self, key):
+        position = bisect.bisect_left(self.maxes, key)
+        if position == len(self.maxes):
+            return
+        chunk = self.chunks[position]
+        offset = bisect.bisect_left(chunk, key)
+        if chunk[offset] != key:
+            return
+        del chunk[offset]
+        self.size -= 1
+
+        if not chunk:
+            del self.chunks[position]
+            del self.maxes[position]
+        else:
+            self.maxes[position] = chunk[-1]
+
+    def irange(self, start=None, end=None):
+        # Klucze z przedziału [start, end); None oznacza brak ograniczenia
+        if start is None:
+            position, offset = 0, 0
+        else:
+            position = bisect.bisect_left(self.maxes, start)
+            if position == len(self.maxes):
+                return
+            offset = bisect.bisect_left(self.chunks[position], start)
+
+        while position < len(self.chunks):
+            chunk = self.chunks[position]
+            for offset in range(offset, len(chunk)):
+                key = chunk[offset]
+                if end is not None and key >= end:
+                    return
+                yield key
+            position += 1
+            offset = 0
@@ -0,0 +1,43 @@
+# Nazwy operacji współdzielone przez wszystkie wpisy zamiast osobnego napisu w każdym wpisie
+OPERATION_NAMES = {name: name for name in ("SET", "UPDATE", "DELETE", "BATCH", "NOOP")}
+
+
+class LogEntry:
+    # Bez __dict__: wpis zajmuje kilkadziesiąt bajtów zamiast kilkuset dla słownika z czterema kluczami
+    __slots__ = ("term", "operation", "key", "value", "ops")
+
+    def __init__(self, term, operation, key, value=None, ops=None):
+        self.term = term
+        self.operation = operation
+        self.key = key
+        self.value = value
+        self.ops = ops
+
+    @classmethod
+    def from_dict(cls, entry):
+        if type(entry) is cls:
+            return entry
+        ops = entry.get("ops")
+        if ops is not None:
+            ops = tuple(tuple(op) for op in ops)
+        operation = OPERATION_NAMES.get(entry["operation"], entry["operation"])
+        return cls(entry["term"], operation, entry.get("key"), entry.get("value"), ops)
+
+    def to_dict(self):
+        entry = {"term": self.term, "operation": self.operation, "key": self.key, "value": self.value}
+        if self.ops is not None:
+            entry["ops"] = [list(op) for op in self.ops]
+        return entry
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            other = LogEntry.from_dict(other)
+        if not isinstance(other, LogEntry):
+            return NotImplemented
+        return (self.term, self.operation, self.key, self.value, self.ops) == \
+            (other.term, other.operation, other.key, other.value, other.ops)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"LogEntry({self.term!r}, {self.operation!r}, {self.key!r}, {self.value!r}, {self.ops!r})"
@@ -1,17 +1,46 @@
+import os
 import time
 import signal
 import threading
 import argparse
-from node import Node
+from node import Node, HEARTBEAT_INTERVAL, MIN_ELECTION_TIMEOUT, MAX_ELECTION_TIMEOUT
+from transport import make_transport
+from multiraft import MultiRaftNode
+import supervisor
 
-def create_network(ports):
-    nodes = []
-    for i, port in enumerate(ports):
-        peer_ports = ports[:i] + ports[i + 1:]
-        peers = [("127.0.0.1", p) for p in peer_ports]
-        node = Node(f"Node_{i+1}", "localhost", port, peers)
-        nodes.append(node)
-    return nodes
+def create_node(ports, index, data_dir=None, transport="tcp", codec="binary", client_server="threaded",
+                lease_duration=None, metrics_port=None, heartbeat_interval=HEARTBEAT_INTERVAL,
+                election_timeout=(MIN_ELECTION_TIMEOUT, MAX_ELECTION_TIMEOUT), adaptive_timeout=False, groups=1,
+                node_id=None, learner=False, host="localhost", peers=None):
+    # Węzeł o numerze index z listy portów; pozostałe porty to jego peery, chyba że podano peers (host, port)
+    port = ports[index]
+    node_id = node_id or f"Node_{index+1}"
+    node_dir = os.path.join(data_dir, node_id) if data_dir else None
+    if groups > 1:
+        # Multi-Raft: węzeł obsługuje kilka grup z własnymi logami; metryki przez komendę GROUP n METRICS
+        members = {f"Node_{i+1}": ("127.0.0.1", p) for i, p in enumerate(ports)}
+        return MultiRaftNode(
+            node_id, "localhost", port, members, groups, node_dir, transport, codec=codec,
+            lease_duration=lease_duration, heartbeat_interval=heartbeat_interval,
+            election_timeout=election_timeout, adaptive_timeout=adaptive_timeout
+        )
+    if peers is None:
+        peers = [("127.0.0.1", p) for p in ports[:index] + ports[index + 1:]]
+    return Node(
+        node_id, host, port, peers, node_dir, make_transport(transport, host, port), codec, client_server,
+        lease_duration, metrics_port, heartbeat_interval=heartbeat_interval,
+        election_timeout=election_timeout, adaptive_timeout=adaptive_timeout, learner=learner
+    )
+
+def create_network(ports, data_dir=None, transport="tcp", codec="binary", client_server="threaded",
+                   lease_duration=None, metrics_port=None, heartbeat_interval=HEARTBEAT_INTERVAL,
+                   election_timeout=(MIN_ELECTION_TIMEOUT, MAX_ELECTION_TIMEOUT), adaptive_timeout=False, groups=1):
+    return [
+        create_node(ports, i, data_dir, transport, codec, client_server, lease_duration,
+                    metrics_port + i if metrics_port else None, heartbeat_interval, election_timeout,
+                    adaptive_timeout, groups)
+        for i in range(len(ports))
+    ]
 
 def start_network(nodes):
     for node in nodes:
@@ -23,11 +52,31 @@ def stop_network(nodes):
         node.stop()
     print("All nodes stopped.")
 
-def start_new_node(node_id, host, port, peers):
-    new_node = Node(node_id, host, port, peers)
+def start_new_node(node_id, host, port, peers, data_dir=None, learner=False, options=None):
+    if supervisor.current is not None:
+        # Węzeł uruchomiony jako proces dodaje nowe węzły także jako procesy (z opcjami nadzorcy)
+        return supervisor.current.spawn(node_id, host, port, peers, data_dir, learner)
+    # Opcje węzła, który dodaje nowy: transport, kodek, czasy heartbeatu i wyborów, dzierżawa
+    options = dict(options or {})
+    transport = make_transport(options.pop("transport", "tcp"), host, port)
+    new_node = Node(node_id, host, port, peers, data_dir, transport, learner=learner, **options)
     threading.Thread(target=new_node.run, daemon=True).start()
     return new_node
 
+def node_arguments(args):
+    # Opcje przekazywane procesom węzłów; porty, numer węzła i port metryk dokłada Supervisor
+    arguments = ["--transport", args.transport, "--codec", args.codec, "--client-server", args.client_server,
+                 "--heartbeat-interval", str(args.heartbeat_interval),
+                 "--election-timeout", *[str(value) for value in args.election_timeout],
+                 "--groups", str(args.groups), "--log-dir", args.log_dir]
+    if args.data_dir:
+        arguments += ["--data-dir", args.data_dir]
+    if args.lease:
+        arguments += ["--lease", str(args.lease)]
+    if args.adaptive_timeout:
+        arguments.append("--adaptive-timeout")
+    return arguments
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Start a network of nodes.")
     parser.add_argument(
@@ -37,15 +86,144 @@ if __name__ == "__main__":
         required=True,
         help="List of ports for the nodes (e.g., --ports 9000 9001 9002)",
     )
+    parser.add_argument(
+        "--data-dir",
+        default=None,
+        help="Directory for the write-ahead logs of the nodes (in-memory log if omitted)",
+    )
+    parser.add_argument(
+        "--transport",
+        choices=["tcp", "udp"],
+        default="tcp",
+        help="Transport used for Raft messages between the nodes",
+    )
+    parser.add_argument(
+        "--codec",
+        choices=["binary", "json"],
+        default="binary",
+        help="Wire format for Raft messages (json is a debugging fallback)",
+    )
+    parser.add_argument(
+        "--client-server",
+        choices=["threaded", "asyncio"],
+        default="threaded",
+        help="Client front-end: a thread per connection or one asyncio event loop for all connections",
+    )
+    parser.add_argument(
+        "--lease",
+        type=float,
+        default=None,
+        help="Leader lease in seconds for local linearizable reads (must be shorter than the election timeout)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="First HTTP port for Prometheus metrics (/metrics); node i listens on this port + i",
+    )
+    parser.add_argument(
+        "--heartbeat-interval",
+        type=float,
+        default=HEARTBEAT_INTERVAL,
+        help="Seconds without AppendEntries to a follower after which the leader sends an empty one",
+    )
+    parser.add_argument(
+        "--election-timeout",
+        type=float,
+        nargs=2,
+        metavar=("MIN", "MAX"),
+        default=[MIN_ELECTION_TIMEOUT, MAX_ELECTION_TIMEOUT],
+        help="Range of the randomized election timeout in seconds",
+    )
+    parser.add_argument(
+        "--adaptive-timeout",
+        action="store_true",
+        help="Derive the election timeout from the observed gaps between leader messages (within --election-timeout)",
+    )
+    parser.add_argument(
+        "--groups",
+        type=int,
+        default=1,
+        help="Raft groups per node; keys are split between groups by hash and each group has its own leader",
+    )
+    parser.add_argument(
+        "--processes",
+        action="store_true",
+        help="Run every node in its own OS process with output in --log-dir; ADD-NODE then starts a new process",
+    )
+    parser.add_argument(
+        "--log-dir",
+        default="logs",
+        help="Directory for the log files of node processes (with --processes or --node)",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="With --processes, start again node processes that exit unexpectedly (use with --data-dir)",
+    )
+    parser.add_argument(
+        "--node",
+        type=int,
+        default=None,
+        help="Run only the node with this index in --ports, the other ports are its peers "
+             "(--metrics-port is then the port of this node)",
+    )
+    parser.add_argument("--node-id", default=None, help="Node id used with --node (default Node_<index+1>)")
+    parser.add_argument("--learner", action="store_true", help="With --node, join the cluster as a non-voting learner")
+    parser.add_argument("--host", default="localhost", help="With --node, host the node listens on")
+    parser.add_argument("--peers", nargs="+", default=None, metavar="HOST:PORT",
+                        help="With --node, addresses of the peers (default: the other --ports on 127.0.0.1)")
+    parser.add_argument("--control-fd", type=int, default=None,
+                        help="With --node, pipe to the supervisor that starts nodes added by ADD-NODE (set by it)")
     args = parser.parse_args()
 
     ports = args.ports
-    print("Starting network with ports:", ports)
 
-    nodes = create_network(ports)
-    
+    if args.processes:
+        cluster = supervisor.Supervisor(ports, node_arguments(args), args.log_dir, args.restart)
+
+        def handle_exit(signum, frame):
+            print("Stopping node processes...")
+            cluster.stop()
+            print("All node processes stopped.")
+            exit(0)
+
+        signal.signal(signal.SIGINT, handle_exit)
+        signal.signal(signal.SIGTERM, handle_exit)
+        print("Starting node processes with ports:", ports)
+        cluster.start(args.metrics_port)
+        try:
+            cluster.wait_ready()
+        except Exception:
+            cluster.stop()
+            raise
+        print(f"All nodes are accepting clients, logs in {args.log_dir}")
+        while True:
+            time.sleep(1)
+            cluster.check()
+
+    if args.node is not None:
+        if args.control_fd is not None:
+            supervisor.current = supervisor.ControlPipe(args.control_fd)
+        else:
+            supervisor.current = supervisor.Supervisor([], node_arguments(args), args.log_dir)
+        peers = None
+        if args.peers:
+            peers = [(peer.rsplit(":", 1)[0], int(peer.rsplit(":", 1)[1])) for peer in args.peers]
+        nodes = [create_node(ports, args.node, args.data_dir, args.transport, args.codec, args.client_server,
+                             args.lease, args.metrics_port, args.heartbeat_interval, args.election_timeout,
+                             args.adaptive_timeout, args.groups, args.node_id, args.learner, args.host, peers)]
+    else:
+        print("Starting network with ports:", ports)
+        nodes = create_network(ports, args.data_dir, args.transport, args.codec, args.client_server, args.lease,
+                               args.metrics_port, args.heartbeat_interval, args.election_timeout,
+                               args.adaptive_timeout, args.groups)
+
     def handle_exit(signum, frame):
         stop_network(nodes)
+        if supervisor.current is not None:
+            # Procesy dodane przez ADD-NODE na tym węźle, jeśli nie ma nad nim nadzorcy
+            supervisor.current.stop()
         exit(0)
 
     signal.signal(signal.SIGINT, handle_exit)
@@ -0,0 +1,125 @@
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Granice kubełków histogramu opóźnienia commitu w sekundach
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DESCRIPTIONS = {
+    "raft_messages_received_total": ("counter", "Raft messages received by type."),
+    "raft_messages_sent_total": ("counter", "Raft messages sent by type."),
+    "raft_elections_started_total": ("counter", "Elections started by this node."),
+    "raft_elections_won_total": ("counter", "Elections won by this node."),
+    "raft_client_connections_total": ("counter", "Client connections accepted."),
+    "raft_commit_latency_seconds": ("histogram", "Time from submitting client writes to their commit on the leader."),
+    "raft_term": ("gauge", "Current term."),
+    "raft_is_leader": ("gauge", "1 if this node is the leader."),
+    "raft_last_log_index": ("gauge", "Index of the last log entry."),
+    "raft_commit_index": ("gauge", "Highest index known to be committed."),
+    "raft_applied_index": ("gauge", "Highest index applied to the store."),
+    "raft_snapshot_index": ("gauge", "Last index included in the snapshot."),
+    "raft_peer_next_index_lag": ("gauge", "Entries between the leader's log end and next_index of a peer."),
+    "raft_peer_match_index_lag": ("gauge", "Entries between the leader's log end and match_index of a peer."),
+    "raft_peer_inflight": ("gauge", "Unacknowledged AppendEntries sent to a peer."),
+    "raft_peer_rtt_seconds": ("gauge", "Smoothed round-trip time of AppendEntries to a peer."),
+    "raft_client_connections": ("gauge", "Open client connections."),
+}
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{le="+Inf"}} {self.count}'
+        yield f"{name}_sum {self.sum}"
+        yield f"{name}_count {self.count}"
+
+
+class Metrics:
+    # Liczniki i histogramy zmieniane pod jedną krótką blokadą; wartości chwilowe (indeksy, opóźnienia peerów)
+    # są odczytywane ze stanu węzła dopiero przy pobraniu metryk, więc nic nie kosztują na ścieżce zapisu
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def render(self, gauges):
+        # Format tekstowy Prometheusa; gauges to lista (nazwa, etykiety, wartość)
+        with self.lock:
+            samples = [(name, labels, value) for (name, labels), value in self.counters.items()]
+            histograms = {name: list(histogram.lines(name)) for name, histogram in self.histograms.items()}
+        samples += gauges
+        samples.sort(key=lambda sample: (sample[0], sample[1]))
+
+        families = {}
+        for name, labels, value in samples:
+            families.setdefault(name, []).append(f"{name}{format_labels(labels)} {value}")
+        for name, lines in histograms.items():
+            families[name] = lines
+
+        for name in sorted(families):
+            kind, description = DESCRIPTIONS.get(name, ("untyped", name))
+            yield f"# HELP {name} {description}"
+            yield f"# TYPE {name} {kind}"
+            yield from families[name]
+
+
+class MetricsServer:
+    def __init__(self, host, port, render):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = ("\n".join(render()) + "\n").encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(f"Metrics: {self.address_string()} {format % args}")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    def run(self):
+        self.server.serve_forever(poll_interval=0.5)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,229 @@
+import os
+import zlib
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from node import Node
+from client import ClientHandler, WELCOME_BANNER
+from metrics import Metrics
+from timers import Scheduler
+from transport import MultiplexTransport, make_transport, resolve_address
+
+BALANCE_INTERVAL = 1.0
+MAX_BALANCE_BACKOFF = 30.0
+KEY_COMMANDS = {"PUT", "UPDATE", "DELETE", "GET"}
+MULTI_KEY_COMMANDS = {"MPUT", "MGET", "MDELETE"}
+MEMBERSHIP_COMMANDS = {"ADD-NODE", "REMOVE-NODE"}
+MULTIRAFT_BANNER = b", GROUPS, GROUP n command (for commands without a key, e.g. GROUP 0 SCAN - -)\n"
+
+
+def group_of(key, groups):
+    return zlib.crc32(key.encode()) % groups
+
+
+class MultiRaftNode:
+    # Proces z kilkoma niezależnymi grupami Raft: klucze są dzielone według skrótu, każda grupa
+    # ma własny Database i lidera, a wszystkie dzielą port Raft (kanały) i port klienta
+    def __init__(self, node_id, host, port, members, groups, data_dir=None, transport="tcp", **options):
+        self.node_id = node_id
+        self.host = host
+        self.port = port
+        self.address = resolve_address(host, port)
+        self.members = {member_id: resolve_address(*address) for member_id, address in members.items()}
+        self.running = True
+        self.metrics = Metrics()
+
+        self.transport = MultiplexTransport(make_transport(transport, host, port))
+        peers = [address for member_id, address in self.members.items() if member_id != node_id]
+        self.groups = [
+            Node(f"{node_id}/g{group}", host, port, peers,
+                 os.path.join(data_dir, f"group_{group}") if data_dir else None,
+                 transport=self.transport.channel(group), client_server=None, **options)
+            for group in range(groups)
+        ]
+
+        # Przekazanie wstrzymuje zapisy grupy, więc po nieudanym balanser czeka coraz dłużej
+        self.balance_pending = [False] * groups
+        self.balance_backoff = [BALANCE_INTERVAL] * groups
+        self.balance_retry_at = [0] * groups
+
+        self.client_handler = ShardedClientHandler(self)
+        self.executor = ThreadPoolExecutor(max_workers=groups, thread_name_prefix=f"{node_id}-groups")
+        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.client_socket.bind((host, port + 100))
+        self.client_socket.listen(128)
+        self.scheduler = Scheduler(f"{node_id} balancer")
+        logging.info(f"Node {self.node_id} started at port {self.port} (Raft, {groups} groups) "
+                     f"and {self.port + 100} (Client)")
+
+    @property
+    def state(self):
+        return "leader" if any(group.state == "leader" for group in self.groups) else "follower"
+
+    def preferred_leader(self, group):
+        # Lider grupy g na g-tym węźle (po kolei według identyfikatorów), więc grupy rozkładają się równo
+        member_ids = sorted(self.members)
+        return member_ids[group % len(member_ids)]
+
+    def balance_tick(self):
+        # Grupa prowadzona nie na swoim węźle przekazuje przywództwo, gdy ten węzeł ma pełny log i odpowiada
+        for number, group in enumerate(self.groups):
+            now = group.clock.monotonic()
+            if self.balance_pending[number] and group.transfer_target is None:
+                self.balance_pending[number] = False
+                if group.state == "leader":
+                    self.balance_backoff[number] = min(self.balance_backoff[number] * 2, MAX_BALANCE_BACKOFF)
+                    self.balance_retry_at[number] = now + self.balance_backoff[number]
+                    logging.warning(f"Node {self.node_id}: Leadership transfer of group {number} failed, "
+                                    f"next attempt in {self.balance_backoff[number]:.0f} s")
+                else:
+                    self.balance_backoff[number] = BALANCE_INTERVAL
+            preferred = self.preferred_leader(number)
+            if group.state != "leader" or preferred == self.node_id or group.transfer_target is not None \
+                    or now < self.balance_retry_at[number]:
+                continue
+            target = self.members[preferred]
+            if group.match_index.get(target) == group.database.last_index() \
+                    and group.acked_round.get(target, 0) >= group.read_round - 1:
+                group.transfer_leader(f"{target[0]}:{target[1]}", wait=False)
+                self.balance_pending[number] = group.transfer_target is not None
+        return BALANCE_INTERVAL
+
+    def leader_address(self, group):
+        leader = self.groups[group].leader
+        if leader is None:
+            return None
+        host, port = self.members[leader.split("/")[0]]
+        return f"{host}:{port + 100}"
+
+    def groups_status(self):
+        lines = [f"Groups: {len(self.groups)}"]
+        for number, group in enumerate(self.groups):
+            lines.append(f"Group {number}: leader {group.leader or 'Unknown'} {self.leader_address(number) or '-'}, "
+                         f"term {group.current_term}, commit {group.database.commit_index}")
+        return "\n".join(lines)
+
+    def start_client_handler(self):
+        while self.running:
+            try:
+                conn, addr = self.client_socket.accept()
+                threading.Thread(target=self.client_handler.handle_client, args=(conn, addr), daemon=True).start()
+            except Exception as e:
+                if self.running:
+                    logging.error(f"Error handling client connection: {e}")
+
+    def run(self):
+        for group in self.groups:
+            group.run()
+        threading.Thread(target=self.start_client_handler, daemon=True).start()
+        self.scheduler.call_later(BALANCE_INTERVAL, self.run_balancer)
+        self.scheduler.start()
+
+    def run_balancer(self):
+        delay = BALANCE_INTERVAL
+        try:
+            delay = self.balance_tick()
+        except Exception as e:
+            logging.error(f"Node {self.node_id}: Error balancing leaders: {e}")
+        if self.running:
+            self.scheduler.call_later(delay, self.run_balancer)
+
+    def stop(self):
+        self.running = False
+        self.scheduler.stop()
+        for group in self.groups:
+            group.stop()
+        try:
+            self.transport.close()
+            self.client_socket.close()
+        except Exception as e:
+            logging.error(f"Node {self.node_id}: Error while closing sockets: {e}")
+        self.executor.shutdown(wait=False)
+        logging.info(f"Node {self.node_id} has been stopped.")
+
+
+class ShardedClientHandler(ClientHandler):
+    # Komendy trafiają do ClientHandler grupy, do której należy klucz. Kolejność jest zachowana
+    # w obrębie grupy; grupy z jednej porcji komend wykonują się równolegle
+    # Baner zostaje dwuliniowy, żeby dotychczasowi klienci nie musieli się zmieniać
+    welcome_banner = WELCOME_BANNER.rstrip(b"\n") + MULTIRAFT_BANNER
+
+    def __init__(self, node):
+        super().__init__(None, node)
+
+    def execute_pipeline(self, lines, session=None):
+        session = {} if session is None else session
+        responses = []
+        routed = {}
+        for line in lines:
+            if not line:
+                continue
+            tag, command = self.parse_request(line)
+            if command and command[0].upper() == "READ-MODE":
+                # Tryb odczytu należy do połączenia, nie do grupy, więc zmienia go tylko ten handler
+                responses.append(self.format_response(tag, self.execute_command(command, session, {})))
+                continue
+            group, line, error = self.route(tag, command, line)
+            responses.append(None if error is None else self.format_response(tag, error))
+            if error is None:
+                routed.setdefault(group, []).append((len(responses) - 1, self.with_read_mode(line, session)))
+
+        # Grupy działają równolegle, więc każda dostaje własną kopię sesji; tryb odczytu
+        # obowiązujący w chwili komendy jedzie w niej jako prefiks STALE
+        snapshot = {key: value for key, value in session.items() if key != "read_mode"}
+        groups = self.node.groups
+        if len(routed) == 1:
+            (group, items), = routed.items()
+            results = {group: groups[group].client_handler.execute_pipeline([line for _, line in items],
+                                                                             dict(snapshot))}
+        else:
+            futures = {group: self.node.executor.submit(groups[group].client_handler.execute_pipeline,
+                                                        [line for _, line in items], dict(snapshot))
+                       for group, items in routed.items()}
+            results = {group: future.result() for group, future in futures.items()}
+        for group, items in routed.items():
+            for (position, _), response in zip(items, results[group]):
+                responses[position] = response
+        return responses
+
+    def with_read_mode(self, line, session):
+        read_mode = session.get("read_mode")
+        tag, command = self.parse_request(line)
+        if read_mode is None or not self.is_read(command):
+            return line
+        lag, unit = read_mode
+        rest = f"STALE {lag}{'ms' if unit == 'ms' else ''} {' '.join(command)}"
+        return f"#{tag} {rest}" if tag is not None else rest
+
+    def route(self, tag, command, line):
+        # Zwraca (grupa, komenda dla grupy, błąd)
+        groups = len(self.node.groups)
+        name = command[0].upper() if command else ""
+        if name == "GROUP":
+            if len(command) < 3 or not command[1].isdigit() or int(command[1]) >= groups:
+                return None, line, f"ERROR: Invalid group. Use GROUP [0-{groups - 1}] command."
+            if command[2].upper() in MEMBERSHIP_COMMANDS:
+                # Nowy węzeł musiałby dołączyć do wszystkich grup naraz
+                return None, line, "ERROR: Membership changes are not supported in multi-raft mode."
+            rest = " ".join(command[2:])
+            return int(command[1]), f"#{tag} {rest}" if tag is not None else rest, None
+        if name in MEMBERSHIP_COMMANDS:
+            return None, line, "ERROR: Membership changes are not supported in multi-raft mode."
+        if name == "GROUPS" and len(command) == 1:
+            return None, line, self.node.groups_status()
+        if name == "STALE" and len(command) >= 4:
+            command = command[2:]
+            name = command[0].upper()
+        if name in KEY_COMMANDS and len(command) >= 2:
+            return group_of(command[1], groups), line, None
+        if name in MULTI_KEY_COMMANDS and len(command) >= 2:
+            keys = command[1::2] if name == "MPUT" else command[1:]
+            key_groups = {group_of(key, groups) for key in keys}
+            if len(key_groups) > 1:
+                return None, line, "ERROR: Keys belong to different groups. Send them in separate commands."
+            return key_groups.pop(), line, None
+        if not name:
+            return None, line, "ERROR: Invalid command format."
+        return None, line, f"ERROR: {name} needs a group in multi-raft mode. Use GROUP [0-{groups - 1}] {name} ..."
@@ -1,79 +1,501 @@
+import os
 import logging
 import socket
 import threading
 import time
 import random
-import json
+from collections import deque
 from database import Database
+from wal import iter_records
+from logentry import LogEntry
 from client import ClientHandler
+from async_client import AsyncClientServer
+from transport import TcpTransport, resolve_address
+from codec import CODEC_VERSION, encode_message, decode_message
+from metrics import Metrics, MetricsServer
+from clock import SystemClock
+from timers import Scheduler
 
 # Konfiguracja logowania
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+MIN_ELECTION_TIMEOUT = 3
+MAX_ELECTION_TIMEOUT = 6
+HEARTBEAT_INTERVAL = 1.0
+
 class Node:
-    def __init__(self, node_id, host, port, peers):
+    def __init__(self, node_id, host, port, peers, data_dir=None, transport=None, codec="binary", client_server="threaded",
+                 lease_duration=None, metrics_port=None, clock=None, heartbeat_interval=HEARTBEAT_INTERVAL,
+                 election_timeout=(MIN_ELECTION_TIMEOUT, MAX_ELECTION_TIMEOUT), adaptive_timeout=False, pre_vote=True,
+                 learner=False):
+        started = time.perf_counter()
         self.node_id = node_id
         self.host = host
         self.port = port
-        self.peers = peers
+        self.address = resolve_address(host, port)
+        self.peers = [resolve_address(*peer) for peer in peers]
+        self.data_dir = data_dir
         self.state = "follower"
         self.leader = None
-        self.current_term = 0
-        self.voted_for = None
+        # Zegar dla limitów czasu protokołu; symulator podstawia czas wirtualny
+        self.clock = clock or SystemClock()
         self.votes_received = 0
+        self.heartbeat_interval = heartbeat_interval
+        self.election_timeout_range = tuple(election_timeout)
+        # Adaptacyjny limit elekcji: średnia i odchylenie odstępów między wiadomościami lidera
+        self.adaptive_timeout = adaptive_timeout
+        self.gap_mean = None
+        self.gap_dev = 0.0
+        self.leader_contact_at = None
+        # PreVote: węzeł zwiększa kadencję dopiero, gdy większość potwierdzi, że wygrałby wybory
+        self.pre_vote = pre_vote
+        self.pre_vote_term = None
+        self.pre_votes = set()
+        # Przekazanie przywództwa: docelowy follower i chwila, po której lider wraca do przyjmowania zapisów
+        self.transfer_target = None
+        self.transfer_sent = False
+        # Learner odbiera log, ale nie głosuje i nie rozpoczyna wyborów, dopóki lider go nie awansuje
+        self.learner = learner
+        self.transfer_deadline = 0
+        # Po zleceniu przekazania cel może wygrać wybory bez czekania na wygaśnięcie dzierżawy,
+        # więc rundy wysłane przed tą chwilą nie przedłużają dzierżawy
+        self.lease_blocked_until = 0
         self.election_timeout = self.generate_election_timeout()
-        self.last_heartbeat = time.time()
+        self.last_heartbeat = self.clock.time()
         self.running = True
         
         self.state_lock = threading.Lock()
         
-        self.raft_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.raft_socket.bind((host, port))
-        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.client_socket.bind((host, port + 100))
-        self.client_socket.listen(5)
+        self.transport = transport or TcpTransport(host, port)
+        self.codec = codec
+        self.peer_codecs = {}
+        self.client_socket = None
+        if client_server is not None:
+            self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.client_socket.bind((host, port + 100))
+            self.client_socket.listen(1024)
         
-        self.database = Database()
+        self.metrics = Metrics()
+        self.metrics_server = MetricsServer(host, metrics_port, self.metrics_lines) if metrics_port else None
+
+        self.database = Database(data_dir)
+        # Po restarcie węzeł wraca jako follower z zapisaną kadencją i głosem
+        self.current_term = self.database.state["term"]
+        self.voted_for = self.database.state["voted_for"]
+        self.state_saved_at = self.clock.monotonic()
+        self.state_save_interval = 1.0
         self.client_handler = ClientHandler(self.database, self)
-        logging.info(f"Node {self.node_id} started at port {self.port} (Raft) and {self.port + 100} (Client)")
+        self.client_server = client_server
+        self.async_client_server = None
+        if client_server == "asyncio":
+            self.async_client_server = AsyncClientServer(self, self.client_handler, self.client_socket)
+        logging.info(f"Node {self.node_id} started at port {self.port} (Raft)"
+                     f"{f' and {self.port + 100} (Client)' if client_server else ''}")
 
-        self.next_index = {} 
-        self.commit_index = -1 
-        
-        for peer in peers:
-            self.next_index[peer] = 0
+        self.next_index = {}
+        self.match_index = {}
+        self.inflight = {}
+        # Wiadomości replikacji budowane pod replication_lock i wysyłane już bez niego, po kolei dla peera
+        self.outbox = {}
+        self.send_locks = {}
+        self.last_sent = {}
+        self.commit_sent = {}
+        self.peer_rtt = {}
+        self.scheduler = None
+        self.commit_index = self.database.commit_index
+
+        # Kontrola przepływu replikacji: maksymalnie max_inflight niepotwierdzonych AppendEntries na peera
+        self.max_inflight = 8
+        self.max_batch_entries = 256
+
+        # Learnerzy (nowe węzły) nadrabiają log w tle, w tempie co najwyżej learner_rate wpisów/s,
+        # i stają się głosującymi, gdy brakuje im najwyżej promote_lag wpisów
+        self.learners = []
+        self.learner_interval = 0.1
+        self.learner_rate = 20000
+        self.learner_budget = {}
+        self.promote_lag = 256
+        self.replication_timeout = 2.0
+        self.replication_lock = threading.RLock()
+
+        self.durable_index = self.database.last_index()
+        self.commit_timeout = 5.0
+        # Zapisy, na których zatwierdzenie czeka klient: indeks -> kadencja przy przyjęciu i wynik
+        self.pending_writes = {}
+        self.commit_cond = threading.Condition()
+
+        # Odczyty linearyzowalne: ReadIndex potwierdza przywództwo jedną rundą AppendEntries,
+        # dzierżawa lidera (lease_duration) pozwala tę rundę pominąć
+        self.lease_duration = lease_duration
+        if lease_duration and lease_duration >= self.election_timeout_range[0]:
+            logging.warning(f"Node {self.node_id}: Lease of {lease_duration}s is not shorter than the election timeout, reads may be stale")
+        self.read_timeout = 2.0
+        self.read_round = 0
+        # Rundy z taktu heartbeatu jadą z bieżącym ruchem; tylko runda rozpoczęta przez odczyt jest dosyłana od razu
+        self.eager_round = 0
+        self.round_sent = {}
+        self.acked_round = {}
+        self.confirmed_round = 0
+        self.lease_expires = 0
+        self.confirmed_at = None
+        self.read_cond = threading.Condition()
+
+        # Odczyty z replik z ograniczoną nieaktualnością: ostatni znany commit lidera
+        # i chwila, w której replika miała go już zastosowanego
+        self.leader_commit = -1
+        self.caught_up_at = None
+        self.stale_read_timeout = 1.0
+        self.apply_cond = threading.Condition()
+
+        for peer in self.peers:
+            self.init_peer_progress(peer)
+        logging.info(f"Node {self.node_id}: Ready in {time.perf_counter() - started:.3f}s "
+                     f"(term {self.current_term}, last index {self.database.last_index()}, commit {self.commit_index})")
+
+    def init_peer_progress(self, peer, next_index=0):
+        self.next_index[peer] = next_index
+        self.match_index[peer] = -1
+        self.inflight[peer] = deque()
+        self.outbox[peer] = deque()
+        self.send_locks[peer] = threading.Lock()
+        self.last_sent[peer] = 0
+        self.commit_sent[peer] = -1
+        self.acked_round[peer] = 0
 
-    def sync_data(self):
+    def drop_peer_progress(self, peer):
+        self.next_index.pop(peer, None)
+        self.match_index.pop(peer, None)
+        self.inflight.pop(peer, None)
+        self.outbox.pop(peer, None)
+        self.send_locks.pop(peer, None)
+        self.last_sent.pop(peer, None)
+        self.commit_sent.pop(peer, None)
+        self.peer_rtt.pop(peer, None)
+        self.acked_round.pop(peer, None)
+
+    def sync_data(self, heartbeat=False):
         if self.state != "leader":
             return
 
-        for peer in self.peers:
-            next_idx = self.next_index[peer]
-            
-            entries = self.database.log[next_idx:] if next_idx < len(self.database.log) else []
-            
-            append_entries_msg = {
-                "type": "append_entries",
+        for peer in list(self.peers):
+            self.replicate_to(peer, heartbeat)
+
+    def replicate_to(self, peer, heartbeat=False, max_entries=None):
+        # Zwraca liczbę wysłanych wpisów (snapshot liczy się jako wpisy, które zastępuje)
+        sent = 0
+        with self.replication_lock:
+            inflight = self.inflight.get(peer)
+            if inflight is None:
+                return sent
+
+            now = self.clock.time()
+            if inflight and now - inflight[0][0] > self.replication_timeout:
+                logging.warning(f"Node {self.node_id}: Replication to {peer} timed out, resending from {self.match_index[peer] + 1}")
+                inflight.clear()
+                self.next_index[peer] = self.match_index[peer] + 1
+
+            while len(inflight) < self.max_inflight:
+                next_idx = self.next_index[peer]
+                batch = self.max_batch_entries
+                if max_entries is not None:
+                    batch = min(batch, max_entries - sent)
+                    if batch <= 0:
+                        break
+
+                # Kompaktowanie logu (take_snapshot) nie może wejść między sprawdzenie snapshotu,
+                # odczyt prev_log_term i wycięcie wpisów, bo wpisy nie pasowałyby do prev_log_index
+                with self.database.lock:
+                    if next_idx <= self.database.snapshot_index:
+                        last_included_index = self.send_snapshot(peer)
+                        inflight.append((now, last_included_index))
+                        self.next_index[peer] = last_included_index + 1
+                        self.last_sent[peer] = now
+                        sent += last_included_index + 1 - next_idx
+                        break
+
+                    append_entries_msg = {
+                        "type": "append_entries",
+                        "term": self.current_term,
+                        "leader_id": self.node_id,
+                        "prev_log_index": next_idx - 1,
+                        "prev_log_term": self.database.term_at(next_idx - 1),
+                        "leader_commit": self.commit_index,
+                        "read_round": self.read_round
+                    }
+
+                    # Węzeł z WAL wysyła rekordy prosto z mmap segmentu, bez ponownego kodowania wpisów.
+                    # Rekordy są zapisane w bieżącej wersji kodeka, więc tylko peer z tą wersją je odczyta
+                    raw = None
+                    if self.database.wal and self.peer_codecs.get(peer) == CODEC_VERSION:
+                        raw = self.database.wal.read_raw(next_idx, batch)
+                    if raw is not None:
+                        append_entries_msg["raw_entries"], count = raw
+                    else:
+                        entries = self.database.entries_from(next_idx, batch)
+                        append_entries_msg["entries"] = entries
+                        count = len(entries)
+                if not count and not heartbeat:
+                    break
+
+                # Optymistycznie przesuwamy next_index, nie czekając na odpowiedź
+                inflight.append((now, next_idx + count - 1))
+                self.next_index[peer] = next_idx + count
+                self.last_sent[peer] = now
+                self.commit_sent[peer] = append_entries_msg["leader_commit"]
+                self.outbox[peer].append(append_entries_msg)
+                heartbeat = False
+                sent += count
+        self.flush_outbox(peer)
+        return sent
+
+    def flush_outbox(self, peer):
+        # Wysyła jeden wątek naraz, więc kolejność wiadomości do peera jest zachowana, a peer, który
+        # nie odbiera, zatrzymuje tylko wątek wysyłający do niego, nie replikację do pozostałych
+        outbox = self.outbox.get(peer)
+        send_lock = self.send_locks.get(peer)
+        if outbox is None or send_lock is None:
+            return
+        while outbox and send_lock.acquire(blocking=False):
+            try:
+                while outbox:
+                    self.send_message(outbox.popleft(), peer)
+            finally:
+                send_lock.release()
+
+    def handle_replication_response(self, message, peer):
+        self.confirm_read_round(peer, message.get("read_round"))
+        with self.replication_lock:
+            inflight = self.inflight.get(peer)
+            if inflight is None:
+                return
+
+            if message["success"]:
+                match_index = message["match_index"]
+                if match_index > self.match_index[peer]:
+                    self.match_index[peer] = match_index
+                sent_at = None
+                while inflight and inflight[0][1] <= match_index:
+                    sent_at = inflight.popleft()[0]
+                if sent_at is not None:
+                    # Wygładzony RTT peera, jak SRTT w TCP
+                    rtt = self.clock.time() - sent_at
+                    srtt = self.peer_rtt.get(peer)
+                    self.peer_rtt[peer] = rtt if srtt is None else srtt + (rtt - srtt) / 8
+                if self.next_index[peer] <= match_index:
+                    self.next_index[peer] = match_index + 1
+            else:
+                # Odpowiedzi na wiadomości wysłane przed cofnięciem next_index są nieaktualne
+                if message["prev_log_index"] >= self.next_index[peer]:
+                    return
+                inflight.clear()
+                next_idx = message.get("conflict_index", message["last_log_index"] + 1)
+                conflict_term = message.get("conflict_term")
+                if conflict_term is not None:
+                    last_of_term = self.database.last_index_of_term(conflict_term)
+                    if last_of_term is not None:
+                        next_idx = last_of_term + 1
+                self.next_index[peer] = max(
+                    self.match_index[peer] + 1,
+                    min(message["prev_log_index"], next_idx)
+                )
+
+        if peer in self.learners:
+            # Learner dostaje kolejne wpisy tylko w ramach przydziału z learner_tick
+            self.replicate_to_learner(peer)
+            return
+        # Peer nie potwierdził jeszcze rundy, na którą czeka odczyt, albo nie zna bieżącego commit_index,
+        # więc dostaje pusty AppendEntries zamiast czekać na heartbeat
+        self.replicate_to(peer, heartbeat=self.acked_round.get(peer, 0) < self.eager_round
+                          or self.commit_sent.get(peer, -1) < self.commit_index)
+        if peer == self.transfer_target:
+            self.send_timeout_now()
+
+    def start_read_round(self):
+        with self.read_cond:
+            self.read_round += 1
+            self.round_sent[self.read_round] = self.clock.monotonic()
+            self.update_confirmed_round()
+            return self.read_round
+
+    def confirm_read_round(self, peer, read_round):
+        if read_round is None:
+            return
+        with self.read_cond:
+            if peer not in self.acked_round or read_round <= self.acked_round[peer]:
+                return
+            self.acked_round[peer] = read_round
+            self.update_confirmed_round()
+
+    def update_confirmed_round(self):
+        # Runda potwierdzona przez większość (lider zawsze zna najnowszą rundę)
+        rounds = sorted([self.read_round] + [self.acked_round.get(peer, 0) for peer in self.peers], reverse=True)
+        confirmed = rounds[(len(self.peers) + 1) // 2]
+        if confirmed <= self.confirmed_round:
+            return
+        self.confirmed_round = confirmed
+        sent_at = self.round_sent.get(confirmed)
+        if sent_at is not None:
+            self.confirmed_at = sent_at
+        if sent_at is not None and self.lease_duration and sent_at >= self.lease_blocked_until:
+            # Dzierżawa liczona od wysłania rundy, nie od odebrania odpowiedzi
+            self.lease_expires = max(self.lease_expires, sent_at + self.lease_duration)
+        for read_round in [r for r in self.round_sent if r <= confirmed]:
+            del self.round_sent[read_round]
+        self.read_cond.notify_all()
+
+    def read_index(self):
+        if self.state != "leader":
+            return f"ERROR: Not the leader. Current leader is {self.leader}"
+        if self.transfer_target is not None:
+            # Cel przekazania może już być liderem nowej kadencji i zatwierdzać zapisy
+            return f"ERROR: Leadership transfer to {self.transfer_target[0]}:{self.transfer_target[1]} in progress."
+
+        # commit_index nowego lidera jest wiarygodny dopiero po zatwierdzeniu NOOP z jego kadencji
+        deadline = time.monotonic() + self.read_timeout
+        with self.commit_cond:
+            while self.database.term_at(self.commit_index) != self.current_term:
+                if self.state != "leader" or not self.running:
+                    return "ERROR: Leadership lost before the read was confirmed."
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return "ERROR: Leadership was not confirmed in time."
+                self.commit_cond.wait(min(remaining, 0.1))
+        read_index = self.commit_index
+
+        if self.lease_duration and self.clock.monotonic() < self.lease_expires:
+            return read_index
+
+        # Odczyt potrzebuje rundy rozpoczętej po jego przyjściu. Gdy runda jest w drodze,
+        # odczyty czekają na nią i następną rundę dzielą wszystkie, które zdążyły się zebrać
+        with self.read_cond:
+            read_round = self.read_round + 1
+        deadline = time.monotonic() + self.read_timeout
+        while True:
+            with self.read_cond:
+                if self.confirmed_round >= read_round:
+                    break
+                if self.state != "leader" or not self.running:
+                    return "ERROR: Leadership lost before the read was confirmed."
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return "ERROR: Leadership was not confirmed in time."
+                start = self.read_round < read_round and (self.confirmed_round >= self.read_round
+                                                          or self.eager_round < self.read_round)
+                if not start:
+                    self.read_cond.wait(min(remaining, 0.1))
+            if start:
+                self.eager_round = self.start_read_round()
+                self.sync_data(heartbeat=True)
+        # Lider stosuje wpisy do store w chwili przesunięcia commit_index, więc read_index jest już zastosowany
+        return read_index
+
+    def read_lag(self, unit):
+        if self.state == "leader":
+            if self.confirmed_at is None:
+                return None
+            age = self.clock.monotonic() - self.confirmed_at
+            if unit == "entries":
+                # Lider odcięty od większości nie wie, że go zastąpiono; zerowe opóźnienie tylko
+                # przy rundzie potwierdzonej w czasie krótszym niż timeout wyborów i commicie z tej kadencji
+                confirmed = (age < self.election_timeout_range[0]
+                             and self.database.term_at(self.commit_index) == self.current_term)
+                return 0 if confirmed else None
+            return age * 1000
+        if unit == "entries":
+            # Bez świeżego kontaktu z liderem leader_commit może być dowolnie nieaktualny
+            if not self.leader_is_alive():
+                return None
+            return max(0, self.leader_commit - self.database.commit_index)
+        return None if self.caught_up_at is None else (self.clock.monotonic() - self.caught_up_at) * 1000
+
+    def bounded_read(self, max_lag, unit):
+        deadline = time.monotonic() + self.stale_read_timeout
+        with self.apply_cond:
+            while True:
+                lag = self.read_lag(unit)
+                if lag is not None and lag <= max_lag:
+                    return self.database.commit_index
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.running:
+                    return f"ERROR: Replica lags more than {max_lag} {unit} behind the leader. Current leader is {self.leader}"
+                self.apply_cond.wait(min(remaining, 0.05))
+
+    def note_leader_commit(self, leader_commit, received_at):
+        with self.apply_cond:
+            self.leader_commit = max(self.leader_commit, leader_commit)
+            if self.database.commit_index >= leader_commit:
+                self.caught_up_at = received_at
+            self.apply_cond.notify_all()
+
+    def leader_is_alive(self):
+        if self.state == "leader":
+            return True
+        return self.leader is not None and self.clock.time() - self.last_heartbeat < self.election_timeout_range[0]
+
+    def send_snapshot(self, peer):
+        with self.database.lock:
+            install_snapshot_msg = {
+                "type": "install_snapshot",
                 "term": self.current_term,
                 "leader_id": self.node_id,
-                "prev_log_index": next_idx - 1,
-                "prev_log_term": self.database.log[next_idx - 1]["term"] if next_idx > 0 else 0,
-                "entries": entries,
+                "last_included_index": self.database.commit_index,
+                "last_included_term": self.database.term_at(self.database.commit_index),
+                "store": dict(self.database.store),
                 "leader_commit": self.commit_index
             }
-            
-            self.send_message(append_entries_msg, peer)
+        logging.info(f"Node {self.node_id}: Sending snapshot up to index {install_snapshot_msg['last_included_index']} to {peer}")
+        self.outbox[peer].append(install_snapshot_msg)
+        return install_snapshot_msg["last_included_index"]
 
     def generate_election_timeout(self):
-        return random.uniform(3, 6)
+        low, high = self.election_timeout_range
+        if self.adaptive_timeout and self.gap_mean is not None:
+            # Dolna granica to odstęp heartbeatów plus zmierzony odstęp wiadomości lidera z zapasem
+            # na jego wahania (jak RTO w TCP), ograniczona do skonfigurowanego zakresu
+            low = min(max(self.heartbeat_interval + max(self.gap_mean, self.heartbeat_interval)
+                          + 4 * self.gap_dev, low), high)
+            high = min(2 * low, high)
+        return random.uniform(low, high)
+
+    def note_leader_contact(self, leader_id):
+        now = self.clock.time()
+        if self.adaptive_timeout and leader_id == self.leader and self.leader_contact_at is not None:
+            gap = now - self.leader_contact_at
+            if self.gap_mean is None:
+                self.gap_mean = gap
+                self.gap_dev = gap / 2
+            else:
+                self.gap_dev += (abs(gap - self.gap_mean) - self.gap_dev) / 4
+                self.gap_mean += (gap - self.gap_mean) / 8
+            self.election_timeout = self.generate_election_timeout()
+        self.leader_contact_at = now
+        self.last_heartbeat = now
     
     def add_node(self):
         pass
 
+    def persist_state(self):
+        # Kadencja i głos trafiają na dysk przed wysłaniem wiadomości, która od nich zależy;
+        # commit_index zapisujemy przy okazji, najwyżej raz na state_save_interval
+        if not self.data_dir:
+            return
+        state = self.database.state
+        if state["term"] == self.current_term and state["voted_for"] == self.voted_for:
+            if state["commit_index"] == self.database.commit_index or \
+                    self.clock.monotonic() - self.state_saved_at < self.state_save_interval:
+                return
+        self.database.save_state(self.current_term, self.voted_for)
+        self.state_saved_at = self.clock.monotonic()
+
     def send_message(self, message, destination):
         try:
-            message_json = json.dumps(message)
-            self.raft_socket.sendto(message_json.encode(), destination)
+            self.persist_state()
+            self.metrics.inc("raft_messages_sent_total", (("type", message["type"]),))
+            message["sender"] = self.address
+            version = self.peer_codecs.get(tuple(destination))
+            if version is None and self.codec == "binary":
+                message = dict(message, codec_version=CODEC_VERSION)
+            self.transport.send(encode_message(message, version), destination)
         except Exception as e:
             logging.error(f"Error sending message to {destination}: {e}")
 
@@ -84,27 +506,81 @@ class Node:
             except Exception as e:
                 logging.error(f"Error broadcasting message to peer {peer}: {e}")
 
-    def start_election(self):
+    def log_position(self):
+        last_index = self.database.last_index()
+        return {"last_log_index": last_index, "last_log_term": self.database.term_at(last_index)}
+
+    def log_is_up_to_date(self, message):
+        # Głos tylko dla kandydata, którego log jest co najmniej tak aktualny jak własny
+        if message.get("last_log_index") is None:
+            return True
+        position = self.log_position()
+        return (message["last_log_term"], message["last_log_index"]) >= \
+            (position["last_log_term"], position["last_log_index"])
+
+    def start_pre_vote(self):
         with self.state_lock:
-            if self.state != "candidate":
-                logging.info(f"Node {self.node_id}: Starting election!")
-                self.state = "candidate"
-                self.current_term += 1
-                self.voted_for = self.node_id
-                self.votes_received = 1  # głosuje na siebie
-                
-                election_message = {
-                    "type": "request_vote",
-                    "candidate_id": self.node_id,
-                    "term": self.current_term
-                }
-                self.broadcast(election_message)
+            self.pre_vote_term = self.current_term + 1
+            self.pre_votes = {self.node_id}
+            logging.info(f"Node {self.node_id}: Starting pre-vote for term {self.pre_vote_term}")
+            self.last_heartbeat = self.clock.time()
+            self.election_timeout = self.generate_election_timeout()
+
+            pre_vote_message = {
+                "type": "pre_vote",
+                "candidate_id": self.node_id,
+                "term": self.pre_vote_term,
+                **self.log_position()
+            }
+            self.broadcast(pre_vote_message)
+        if len(self.pre_votes) > (len(self.peers) + 1) / 2:
+            self.start_election()
+
+    def start_election(self, transfer=False):
+        self.pre_vote_term = None
+        with self.state_lock:
+            logging.info(f"Node {self.node_id}: Starting election!")
+            self.state = "candidate"
+            self.current_term += 1
+            self.metrics.inc("raft_elections_started_total")
+            self.voted_for = self.node_id
+            self.votes_received = 1  # głosuje na siebie
+            # Przy remisie głosów kandydat ponawia wybory po nowym, losowym czasie
+            self.last_heartbeat = self.clock.time()
+            self.election_timeout = self.generate_election_timeout()
+
+            election_message = {
+                "type": "request_vote",
+                "candidate_id": self.node_id,
+                "term": self.current_term,
+                **self.log_position()
+            }
+            if transfer:
+                # Wybory zlecone przez lidera: głosujący nie czekają, aż lider przestanie być aktywny
+                election_message["transfer"] = True
+            self.broadcast(election_message)
+        if self.votes_received > (len(self.peers) + 1) / 2:
+            self.become_leader()
 
     def become_leader(self):
         with self.state_lock:
             if self.state == "candidate":
                 self.state = "leader"
                 self.leader = self.node_id
+                self.metrics.inc("raft_elections_won_total")
+                # Wpisy z poprzednich kadencji zatwierdza dopiero wpis z bieżącej (§5.4.2), więc lider
+                # od razu dopisuje NOOP; bez niego zapisy poprzednika czekałyby na pierwszy zapis klienta
+                self.database.append_entries([self.new_entry("NOOP", None)])
+                for peer in self.peers:
+                    self.init_peer_progress(peer, self.database.last_index())
+                self.durable_index = self.database.last_index()
+                self.commit_index = self.database.commit_index
+                self.transfer_target = None
+                with self.read_cond:
+                    self.round_sent.clear()
+                    self.confirmed_round = self.read_round
+                    self.confirmed_at = None
+                    self.lease_expires = 0
                 logging.info(f"*** Node {self.node_id} became leader for term {self.current_term}! ***")
                 
                 leader_message = {
@@ -113,149 +589,353 @@ class Node:
                     "term": self.current_term
                 }
                 self.broadcast(leader_message)
+        if self.state == "leader":
+            self.sync_data()
+            self.advance_commit_index()
 
-    def send_heartbeat(self):
-        while self.running:
-            try:
-                if self.state == "leader":
-                    heartbeat = {
-                        "type": "heartbeat",
-                        "leader_id": self.node_id,
-                        "term": self.current_term
-                    }
-                    self.broadcast(heartbeat)
-                    self.sync_data()
-                    logging.info(f"Node {self.node_id} (Leader): Sending heartbeat for term {self.current_term}")
-            except Exception as e:
-                logging.error(f"Error sending heartbeat: {e}")
-            time.sleep(1)
+    def run_timer(self, tick):
+        # Takt sam zwraca, za ile sekund ma zostać wywołany ponownie
+        delay = self.heartbeat_interval
+        try:
+            delay = tick()
+        except Exception as e:
+            logging.error(f"Node {self.node_id}: Error in {tick.__name__}: {e}")
+        if self.running:
+            self.scheduler.call_later(delay, self.run_timer, tick)
 
-    def check_leader(self):
-        while self.running:
-            try:
-                if self.state != "leader" and time.time() - self.last_heartbeat > self.election_timeout:
-                    logging.warning(f"Node {self.node_id}: Election timeout! [ALARM] Election starts")
-                    self.leader = None
-                    self.start_election()
-            except Exception as e:
-                logging.error(f"Error checking leader: {e}")
-            time.sleep(0.1)
+    def heartbeat_tick(self):
+        delay = self.heartbeat_interval
+        if self.transfer_target is not None and (self.state != "leader" or self.clock.time() > self.transfer_deadline):
+            if self.state == "leader":
+                logging.warning(f"Node {self.node_id}: Leadership transfer to {self.transfer_target} timed out")
+            self.transfer_target = None
+        if self.state == "leader":
+            self.start_read_round()
+            now = self.clock.time()
+            # Pusty AppendEntries dostaje tylko peer, do którego nic nie wysłano przez heartbeat_interval;
+            # pozostałym wystarcza bieżący ruch replikacji
+            for peer in list(self.peers):
+                idle = now - self.last_sent.get(peer, 0)
+                if idle >= self.heartbeat_interval:
+                    self.replicate_to(peer, heartbeat=True)
+                    idle = 0
+                else:
+                    self.replicate_to(peer)
+                delay = min(delay, self.heartbeat_interval - idle)
+            logging.debug(f"Node {self.node_id} (Leader): Heartbeat tick for term {self.current_term}")
+        self.database.maybe_snapshot()
+        return max(delay, 0.001)
+
+    def learner_tick(self):
+        if self.state != "leader":
+            return self.learner_interval
+        for learner in list(self.learners):
+            with self.replication_lock:
+                # Kubełek żetonów: przydział na takt, zapas najwyżej na sekundę
+                self.learner_budget[learner] = min(self.learner_budget.get(learner, 0)
+                                                   + self.learner_rate * self.learner_interval, self.learner_rate)
+            self.replicate_to_learner(learner)
+            match_index = self.match_index.get(learner, -1)
+            if match_index >= self.database.snapshot_index and \
+                    self.database.last_index() - match_index <= self.promote_lag:
+                self.promote_learner(learner)
+        return self.learner_interval
+
+    def replicate_to_learner(self, learner):
+        # Przydział jest rezerwowany pod blokadą, a wysyłanie odbywa się już bez niej
+        with self.replication_lock:
+            budget = int(self.learner_budget.get(learner, 0))
+            if budget < 1:
+                return
+            self.learner_budget[learner] -= budget
+            heartbeat = self.commit_sent.get(learner, -1) < self.commit_index
+        sent = self.replicate_to(learner, heartbeat, budget)
+        with self.replication_lock:
+            if learner in self.learner_budget:
+                self.learner_budget[learner] += budget - sent
+
+    def election_tick(self):
+        if self.state == "leader" or self.learner:
+            return self.election_timeout_range[0]
+        if self.clock.time() - self.last_heartbeat > self.election_timeout:
+            logging.warning(f"Node {self.node_id}: Election timeout! [ALARM] Election starts")
+            self.leader = None
+            if self.pre_vote:
+                self.start_pre_vote()
+            else:
+                self.start_election()
+        remaining = self.last_heartbeat + self.election_timeout - self.clock.time()
+        return min(max(remaining, 0.001), self.election_timeout_range[0])
 
 
     def handle_client_operation(self, operation, key, value=None):
+        return self.commit_entries([self.new_entry(operation, key, value)])[0]
+
+    def handle_client_batch(self, operation, pairs):
+        return self.commit_entries([self.new_batch_entry(operation, pairs)])[0]
+
+    def new_entry(self, operation, key, value=None):
+        return LogEntry(self.current_term, operation, key, value)
+
+    def new_batch_entry(self, operation, pairs):
+        return LogEntry(self.current_term, "BATCH", None, None, tuple((operation, key, value) for key, value in pairs))
+
+    def commit_entries(self, entries):
+        started = time.perf_counter()
+        first_index = self.submit_entries(entries, wait=True)
+        if isinstance(first_index, str):
+            return [first_index] * len(entries)
+        results = [self.wait_for_commit(first_index + i) for i in range(len(entries))]
+        self.metrics.observe("raft_commit_latency_seconds", time.perf_counter() - started)
+        return results
+
+    def submit_entries(self, entries, wait=False):
         if self.state != "leader":
             return f"ERROR: Not the leader. Current leader is {self.leader}"
+        if self.transfer_target is not None:
+            return f"ERROR: Leadership transfer to {self.transfer_target[0]}:{self.transfer_target[1]} in progress."
 
-        log_entry = {
-            "term": self.current_term,
-            "operation": operation,
-            "key": key,
-            "value": value
-        }
+        term = self.current_term
+        for entry in entries:
+            entry.term = term
 
-        log_index = self.database.append_log(log_entry)
-        
-        result = self.database.apply_log_entry(log_entry)
+        def register(first_index):
+            for index in range(first_index, first_index + len(entries)):
+                self.pending_writes[index] = {"term": term}
+
+        first_index = self.database.append_entries(entries, register if wait else None)
 
-        self.commit_index = log_index
-        self.database.commit_index = log_index
+        # append_entries wraca po fsync, więc wpisy są trwałe na liderze
+        self.durable_index = max(self.durable_index, first_index + len(entries) - 1)
         self.sync_data()
-        
-        return result
+        self.advance_commit_index()
+        return first_index
+
+    def wait_for_commit(self, log_index):
+        deadline = time.time() + self.commit_timeout
+        with self.commit_cond:
+            try:
+                waiter = self.pending_writes[log_index]
+                while "result" not in waiter:
+                    if self.database.commit_index >= log_index:
+                        # Indeks zatwierdził inny lider; wpis mógł zostać nadpisany wpisem z jego kadencji
+                        term = self.database.term_at(log_index)
+                        if term is not None and term != waiter["term"]:
+                            return "ERROR: Write was overwritten by a new leader."
+                        return "ERROR: Leadership lost before the write result was known."
+                    if self.state != "leader" or not self.running:
+                        return "ERROR: Leadership lost before the write was committed."
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return "ERROR: Write was not committed in time."
+                    self.commit_cond.wait(min(remaining, 0.1))
+                return waiter["result"]
+            finally:
+                # Także po przekroczeniu czasu, żeby późniejszy commit nie zostawił wyniku bez odbiorcy
+                self.pending_writes.pop(log_index, None)
+
+    def advance_commit_index(self):
+        if self.state != "leader":
+            return
+
+        with self.commit_cond:
+            # Indeks zreplikowany na większości (mediana match_index łącznie z liderem)
+            match_indexes = sorted(
+                [self.durable_index] + [self.match_index.get(peer, -1) for peer in self.peers],
+                reverse=True
+            )
+            majority_index = match_indexes[(len(self.peers) + 1) // 2]
+            if majority_index <= self.database.commit_index:
+                return
+            if self.database.term_at(majority_index) != self.current_term:
+                return
+
+            with self.database.lock:
+                while self.database.commit_index < majority_index:
+                    index = self.database.commit_index + 1
+                    result = self.database.commit_log_entries(index)
+                    # Wynik trafia do czekającego klienta, jeśli zatwierdzony wpis jest tym, który przyjął
+                    waiter = self.pending_writes.get(index)
+                    if waiter is not None:
+                        if self.database.term_at(index) == waiter["term"]:
+                            waiter["result"] = result
+                        else:
+                            waiter["result"] = "ERROR: Write was overwritten by a new leader."
+                self.commit_index = self.database.commit_index
+            self.commit_cond.notify_all()
+
+        # Bezczynni followerzy dowiadują się o nowym commit_index od razu, a nie przy kolejnym heartbeacie
+        for peer in list(self.peers):
+            if not self.inflight.get(peer, True):
+                self.replicate_to(peer, heartbeat=True)
 
     def handle_messages(self):
         while self.running:
             try:
-                data, addr = self.raft_socket.recvfrom(1024)
-                message = json.loads(data.decode())
-
-                if "term" in message and message["term"] > self.current_term:
-                    self.current_term = message["term"]
-                    with self.state_lock:
-                        self.state = "follower"
-                        self.voted_for = None
-                        self.votes_received = 0
-
-                if message["type"] == "heartbeat":
-                    if message["term"] >= self.current_term:
-                        self.last_heartbeat = time.time()
-                        self.leader = message["leader_id"]
-                        self.current_term = message["term"]
-                        with self.state_lock:
-                            self.state = "follower"
-                            self.voted_for = None
-                        logging.info(f"Node {self.node_id}: Received heartbeat from leader {self.leader}")
-
-                elif message["type"] == "request_vote":
-                    if message["term"] >= self.current_term and (self.voted_for is None or self.voted_for == message["candidate_id"]):
-                        self.current_term = message["term"]
-                        self.voted_for = message["candidate_id"]
-                        vote_response = {
-                            "type": "vote_response",
-                            "voter_id": self.node_id,
-                            "candidate_id": message["candidate_id"],
-                            "term": self.current_term,
-                            "granted": True
-                        }
-                        self.send_message(vote_response, addr)
-                        logging.info(f"Node {self.node_id}: Voted for {message['candidate_id']}")
-                    else:
-                        vote_response = {
-                            "type": "vote_response",
-                            "voter_id": self.node_id,
-                            "candidate_id": message["candidate_id"],
-                            "term": self.current_term,
-                            "granted": False
-                        }
-                        self.send_message(vote_response, addr)
-
-                elif message["type"] == "vote_response":
-                    if message["granted"] and message["term"] == self.current_term and self.state == "candidate":
-                        self.votes_received += 1
-                        logging.info(f"Node {self.node_id}: Received vote from {message['voter_id']} ({self.votes_received} votes)")
-                        if self.votes_received > (len(self.peers) + 1) / 2:
-                            self.become_leader()
-
-                elif message["type"] == "leader_announcement":
-                    if message["term"] >= self.current_term:
-                        logging.info(f"Node {self.node_id}: {message['leader_id']} is leader for term {message['term']}")
-                        self.leader = message["leader_id"]
-                        self.current_term = message["term"]
-                        with self.state_lock:
-                            self.state = "follower"
-                            self.voted_for = None
-                        self.last_heartbeat = time.time()
-
-                elif message["type"] == "append_entries":
-                    response = self.handle_append_entries(message, addr)
-                    if response:
-                        self.send_message(response, addr)
-
-                elif message["type"] == "append_entries_response":
-                    if message["term"] == self.current_term:
-                        sender_peer = (addr[0], addr[1])
-                        if sender_peer in self.peers:
-                            if message["success"]:
-                                new_last_index = message.get("next_index")
-                                if new_last_index >= 0:
-                                    self.next_index[sender_peer] = new_last_index
-
-
-                elif message["type"] == "remove_node":
-                    removed_node = message["removed_node"]
-                    if removed_node in self.peers:
-                        self.peers.remove(removed_node)
-                        self.next_index.pop(removed_node, None)
-                        logging.info(f"Node {self.node_id}: Node {removed_node} removed from cluster by leader.")
-                elif message["type"] == "stop_node":
-                    logging.info(f"Node {self.node_id}: Received stop signal. Stopping...")
-                    self.stop()
-
-            except json.JSONDecodeError as e:
+                data = self.transport.receive(timeout=0.5)
+                if data is None:
+                    continue
+                self.handle_message(data)
+            except ValueError as e:
                 logging.error(f"Error decoding message: {e}")
             except Exception as e:
                 logging.error(f"Error handling message: {e}")
 
+    def handle_message(self, data):
+        message, version = decode_message(data)
+        self.metrics.inc("raft_messages_received_total", (("type", message["type"]),))
+        addr = tuple(message["sender"])
+        self.update_peer_codec(addr, message, version)
+
+        if message["type"] in ("request_vote", "pre_vote") and not message.get("transfer") and self.leader_is_alive():
+            # Dopóki lider jest aktywny, głos nie jest oddawany – na tym opiera się dzierżawa lidera
+            vote_response = {
+                "type": "vote_response" if message["type"] == "request_vote" else "pre_vote_response",
+                "voter_id": self.node_id,
+                "candidate_id": message["candidate_id"],
+                "term": self.current_term,
+                "granted": False
+            }
+            if message["type"] == "pre_vote":
+                vote_response["pre_vote_term"] = message["term"]
+            self.send_message(vote_response, addr)
+            return
+
+        if message["type"] == "pre_vote":
+            # Kadencja z pre_vote jest tylko propozycją, więc nie zmienia stanu odbiorcy
+            granted = message["term"] > self.current_term and self.log_is_up_to_date(message)
+            pre_vote_response = {
+                "type": "pre_vote_response",
+                "voter_id": self.node_id,
+                "candidate_id": message["candidate_id"],
+                "term": self.current_term,
+                "pre_vote_term": message["term"],
+                "granted": granted
+            }
+            self.send_message(pre_vote_response, addr)
+            return
+
+        if "term" in message and message["term"] > self.current_term:
+            self.current_term = message["term"]
+            with self.state_lock:
+                self.state = "follower"
+                self.voted_for = None
+                self.votes_received = 0
+
+        if message["type"] == "heartbeat":
+            if message["term"] >= self.current_term:
+                self.note_leader_contact(message["leader_id"])
+                self.leader = message["leader_id"]
+                self.current_term = message["term"]
+                with self.state_lock:
+                    self.state = "follower"
+                    self.voted_for = None
+                logging.debug(f"Node {self.node_id}: Received heartbeat from leader {self.leader}")
+
+        elif message["type"] == "request_vote":
+            if message["term"] >= self.current_term and self.log_is_up_to_date(message) \
+                    and (self.voted_for is None or self.voted_for == message["candidate_id"]):
+                self.current_term = message["term"]
+                self.voted_for = message["candidate_id"]
+                # Oddany głos przesuwa limit elekcji, żeby nie przerywać wyborów, które właśnie wygrywa kandydat
+                self.last_heartbeat = self.clock.time()
+                vote_response = {
+                    "type": "vote_response",
+                    "voter_id": self.node_id,
+                    "candidate_id": message["candidate_id"],
+                    "term": self.current_term,
+                    "granted": True
+                }
+                self.send_message(vote_response, addr)
+                logging.info(f"Node {self.node_id}: Voted for {message['candidate_id']}")
+            else:
+                vote_response = {
+                    "type": "vote_response",
+                    "voter_id": self.node_id,
+                    "candidate_id": message["candidate_id"],
+                    "term": self.current_term,
+                    "granted": False
+                }
+                self.send_message(vote_response, addr)
+
+        elif message["type"] == "vote_response":
+            if message["granted"] and message["term"] == self.current_term and self.state == "candidate":
+                self.votes_received += 1
+                logging.info(f"Node {self.node_id}: Received vote from {message['voter_id']} ({self.votes_received} votes)")
+                if self.votes_received > (len(self.peers) + 1) / 2:
+                    self.become_leader()
+
+        elif message["type"] == "pre_vote_response":
+            if message["granted"] and message["pre_vote_term"] == self.pre_vote_term == self.current_term + 1 \
+                    and self.state != "leader":
+                self.pre_votes.add(message["voter_id"])
+                if len(self.pre_votes) > (len(self.peers) + 1) / 2:
+                    logging.info(f"Node {self.node_id}: Pre-vote won with {len(self.pre_votes)} votes")
+                    self.start_election()
+
+        elif message["type"] == "timeout_now":
+            if message["term"] == self.current_term and message["leader_id"] == self.leader and self.state == "follower":
+                logging.info(f"Node {self.node_id}: Leader {self.leader} hands over leadership")
+                self.leader = None
+                self.start_election(transfer=True)
+
+        elif message["type"] == "leader_announcement":
+            if message["term"] >= self.current_term:
+                logging.info(f"Node {self.node_id}: {message['leader_id']} is leader for term {message['term']}")
+                self.leader = message["leader_id"]
+                self.current_term = message["term"]
+                with self.state_lock:
+                    self.state = "follower"
+                    self.voted_for = None
+                self.note_leader_contact(message["leader_id"])
+
+        elif message["type"] == "append_entries":
+            response = self.handle_append_entries(message, addr)
+            if response:
+                self.send_message(response, addr)
+
+        elif message["type"] == "install_snapshot":
+            response = self.handle_install_snapshot(message)
+            if response:
+                self.send_message(response, addr)
+
+        elif message["type"] in ("append_entries_response", "install_snapshot_response"):
+            if message["term"] == self.current_term and self.state == "leader":
+                self.handle_replication_response(message, addr)
+                self.advance_commit_index()
+
+        elif message["type"] == "remove_node":
+            removed_node = tuple(message["removed_node"])
+            if removed_node in self.peers:
+                self.peers.remove(removed_node)
+                self.drop_peer_progress(removed_node)
+                logging.info(f"Node {self.node_id}: Node {removed_node} removed from cluster by leader.")
+        elif message["type"] == "add_node":
+            added_node = tuple(message["added_node"])
+            if added_node == self.address:
+                if self.learner:
+                    self.learner = False
+                    self.last_heartbeat = self.clock.time()
+                    logging.info(f"Node {self.node_id}: Promoted from learner to voter.")
+            elif added_node not in self.peers:
+                self.peers.append(added_node)
+                self.init_peer_progress(added_node)
+                logging.info(f"Node {self.node_id}: Node {added_node} added to cluster by leader.")
+        elif message["type"] == "stop_node":
+            logging.info(f"Node {self.node_id}: Received stop signal. Stopping...")
+            self.stop()
+
+    def update_peer_codec(self, peer, message, version):
+        if self.codec != "binary":
+            return
+        if version is None:
+            version = message.get("codec_version")
+            if version is not None:
+                version = min(version, CODEC_VERSION)
+        if self.peer_codecs.get(peer) != version:
+            logging.info(f"Node {self.node_id}: Using {'binary v' + str(version) if version else 'JSON'} codec for {peer}")
+            self.peer_codecs[peer] = version
+
     def handle_append_entries(self, message, sender_addr):
         response = {
             "type": "append_entries_response",
@@ -263,39 +943,96 @@ class Node:
             "success": False,
             "node_id": self.node_id,
             "node_peer": self.port,
-            "match_index": len(self.database.log)
+            "prev_log_index": message["prev_log_index"],
+            "last_log_index": self.database.last_index(),
+            "read_round": message.get("read_round")
         }
         if message["term"] < self.current_term:
             return response
 
-        self.last_heartbeat = time.time()
+        received_at = self.clock.monotonic()
+        self.note_leader_contact(message["leader_id"])
         self.leader = message["leader_id"]
+        if self.state == "candidate":
+            # Kandydat ustępuje liderowi z tej samej kadencji
+            with self.state_lock:
+                self.state = "follower"
 
         if message["term"] > self.current_term:
             self.current_term = message["term"]
             self.voted_for = None
 
         prev_log_index = message["prev_log_index"]
-        if prev_log_index >= len(self.database.log):
+        if prev_log_index > self.database.last_index():
+            response["conflict_term"] = None
+            response["conflict_index"] = self.database.last_index() + 1
             return response
-        
-        if prev_log_index >= 0 and self.database.log[prev_log_index]["term"] != message["prev_log_term"]:
+
+        prev_log_term = self.database.term_at(prev_log_index)
+        if prev_log_term is not None and prev_log_term != message["prev_log_term"]:
+            # Podpowiedź dla lidera: pomija całą kadencję w jednej wymianie
+            response["conflict_term"] = prev_log_term
+            response["conflict_index"] = self.database.first_index_of_term(prev_log_term)
             return response
 
-        for i, entry in enumerate(message["entries"]):
+        if "raw_entries" in message:
+            entries = [LogEntry.from_dict(entry) for _, entry, _ in iter_records(message["raw_entries"])]
+        else:
+            entries = [LogEntry.from_dict(entry) for entry in message["entries"]]
+        new_entries = []
+        for i, entry in enumerate(entries):
             log_index = prev_log_index + 1 + i
-            if log_index < len(self.database.log):
-                if self.database.log[log_index]["term"] != entry["term"]:
-                    self.database.log = self.database.log[:log_index]
-                    self.database.log.append(entry)
+            if log_index <= self.database.snapshot_index:
+                continue
+            if log_index <= self.database.last_index():
+                if self.database.term_at(log_index) != entry.term:
+                    self.database.truncate_log(log_index)
+                    new_entries.append(entry)
             else:
-                self.database.log.append(entry)
+                new_entries.append(entry)
+        if new_entries:
+            self.database.append_entries(new_entries)
 
+        match_index = prev_log_index + len(entries)
         if message["leader_commit"] > self.database.commit_index:
-            self.database.commit_log_entries(min(message["leader_commit"], len(self.database.log) - 1))
+            self.database.commit_log_entries(min(message["leader_commit"], match_index))
+        self.note_leader_commit(message["leader_commit"], received_at)
 
         response["success"] = True
-        response["next_index"] = len(self.database.log)
+        response["match_index"] = match_index
+        response["last_log_index"] = self.database.last_index()
+        return response
+
+    def handle_install_snapshot(self, message):
+        response = {
+            "type": "install_snapshot_response",
+            "term": self.current_term,
+            "success": False,
+            "node_id": self.node_id,
+            "prev_log_index": message["last_included_index"],
+            "last_log_index": self.database.last_index()
+        }
+        if message["term"] < self.current_term:
+            return response
+
+        received_at = self.clock.monotonic()
+        self.note_leader_contact(message["leader_id"])
+        self.leader = message["leader_id"]
+        if self.state == "candidate":
+            # Kandydat ustępuje liderowi z tej samej kadencji
+            with self.state_lock:
+                self.state = "follower"
+
+        self.database.install_snapshot(
+            message["last_included_index"], message["last_included_term"], message["store"]
+        )
+        if message["leader_commit"] > self.database.commit_index:
+            self.database.commit_log_entries(min(message["leader_commit"], self.database.last_index()))
+        self.note_leader_commit(message["leader_commit"], received_at)
+
+        response["success"] = True
+        response["match_index"] = message["last_included_index"]
+        response["last_log_index"] = self.database.last_index()
         return response
 
     def start_client_handler(self):
@@ -307,11 +1044,21 @@ class Node:
                 logging.error(f"Error handling client connection: {e}")
 
     def run(self):
+        # Czas odtwarzania stanu nie liczy się do limitu czasu elekcji
+        self.last_heartbeat = self.clock.time()
         try:
             threading.Thread(target=self.handle_messages, daemon=True).start()
-            threading.Thread(target=self.send_heartbeat, daemon=True).start()
-            threading.Thread(target=self.check_leader, daemon=True).start()
-            threading.Thread(target=self.start_client_handler, daemon=True).start()
+            self.scheduler = Scheduler(f"Node {self.node_id} timers")
+            self.scheduler.call_later(0, self.run_timer, self.heartbeat_tick)
+            self.scheduler.call_later(self.election_timeout, self.run_timer, self.election_tick)
+            self.scheduler.call_later(self.learner_interval, self.run_timer, self.learner_tick)
+            self.scheduler.start()
+            if self.async_client_server:
+                threading.Thread(target=self.async_client_server.run, daemon=True).start()
+            elif self.client_socket:
+                threading.Thread(target=self.start_client_handler, daemon=True).start()
+            if self.metrics_server:
+                threading.Thread(target=self.metrics_server.run, daemon=True).start()
         except Exception as e:
             logging.critical(f"Error starting node: {e}")
 
@@ -325,35 +1072,80 @@ class Node:
     def add_node(self, address):
         try:
             host, port = address.split(":")
-            port = int(port)
+            host, port = resolve_address(host, int(port))
         except ValueError:
             return "ERROR: Invalid address format. Use host:port."
 
-        if (host, port) not in self.peers:
+        if (host, port) not in self.peers and (host, port) not in self.learners:
             from main import start_new_node
-            start_new_node(f"Node_{len(self.peers) + 2}", host, port, [(self.host, self.port)] + self.peers)
+            # Identyfikator z adresu: licznik węzłów po REMOVE-NODE mógłby powtórzyć id działającego
+            # węzła, a z nim katalog danych i proces nadzorcy
+            node_id = f"Node_{host}_{port}"
+            data_dir = os.path.join(os.path.dirname(self.data_dir), node_id) if self.data_dir else None
+            if data_dir and os.path.exists(data_dir):
+                return f"ERROR: Data directory {data_dir} already exists, remove it before adding {address}."
+            start_new_node(node_id, host, port, [self.address] + self.peers, data_dir, learner=True,
+                           options=self.node_options())
 
-            self.peers.append((host, port))
-            self.next_index[(host, port)] = 0
-            logging.info(f"Node {self.node_id}: Added node {address} to cluster.")
-            return f"SUCCESS: Node {address} added to cluster."
+            self.add_learner((host, port))
+            return f"SUCCESS: Node {address} added to cluster as learner."
         return f"ERROR: Node {address} already exists in cluster."
     
+    def node_options(self):
+        # Transport, kodek i czasy protokołu muszą być takie jak w klastrze, do którego dołącza nowy węzeł
+        return {"transport": getattr(self.transport, "name", "tcp"), "codec": self.codec,
+                "client_server": self.client_server, "lease_duration": self.lease_duration,
+                "heartbeat_interval": self.heartbeat_interval, "election_timeout": self.election_timeout_range,
+                "adaptive_timeout": self.adaptive_timeout}
+
+    def add_learner(self, address):
+        # Nowy węzeł nie wchodzi do większości, dopóki nie nadrobi logu
+        with self.replication_lock:
+            self.learners.append(address)
+            self.init_peer_progress(address)
+            self.learner_budget[address] = 0
+        logging.info(f"Node {self.node_id}: Added node {address} to cluster as learner.")
+
+    def promote_learner(self, learner):
+        with self.replication_lock:
+            if learner not in self.learners:
+                return
+            self.learners.remove(learner)
+            self.learner_budget.pop(learner, None)
+            self.peers.append(learner)
+        logging.info(f"Node {self.node_id}: Learner {learner} caught up (match index {self.match_index[learner]}), "
+                     f"promoted to voter.")
+        add_message = {
+            "type": "add_node",
+            "added_node": learner
+        }
+        self.broadcast(add_message)
+        self.sync_data()
+
     def remove_node(self, address):
         try:
             host, port = address.split(":")
-            port = int(port)
+            host, port = resolve_address(host, int(port))
         except ValueError:
             return "ERROR: Invalid address format. Use host:port."
 
-        if address == f"{self.host}:{self.port}":
+        if (host, port) == self.address:
             logging.warning(f"Node {self.node_id}: Attempting to remove the leader (self).")
             
-            self.broadcast_remove_node(address)
+            self.broadcast_remove_node((host, port))
             self.stop()
             logging.info(f"Node {self.node_id}: Stopping self as leader.")
             return "SUCCESS: Leader removed. Triggering new election."
 
+        if (host, port) in self.learners:
+            self.send_message({"type": "stop_node"}, (host, port))
+            with self.replication_lock:
+                self.learners.remove((host, port))
+                self.learner_budget.pop((host, port), None)
+                self.drop_peer_progress((host, port))
+            logging.info(f"Node {self.node_id}: Removed learner {address} from cluster.")
+            return f"SUCCESS: Node {address} removed from cluster."
+
         if (host, port) in self.peers:
             stop_message = {
                 "type": "stop_node"
@@ -361,26 +1153,103 @@ class Node:
             self.send_message(stop_message, (host, port))
 
             self.peers.remove((host, port))
-            self.next_index.pop((host, port), None)
+            self.drop_peer_progress((host, port))
 
-            self.broadcast_remove_node(address)
+            self.broadcast_remove_node((host, port))
 
             logging.info(f"Node {self.node_id}: Removed node {address} from cluster.")
             return f"SUCCESS: Node {address} removed from cluster."
 
         return f"ERROR: Node {address} does not exist in cluster."
 
+    def transfer_leader(self, address, wait=True):
+        try:
+            host, port = address.split(":")
+            target = resolve_address(host, int(port))
+        except ValueError:
+            return "ERROR: Invalid address format. Use host:port."
+
+        if self.state != "leader":
+            return f"ERROR: Not the leader. Current leader is {self.leader}"
+        if target == self.address:
+            return f"SUCCESS: Node {address} is already the leader."
+        if target not in self.peers:
+            return f"ERROR: Node {address} does not exist in cluster."
+
+        # Lider wstrzymuje zapisy, doprowadza log celu do swojego i zleca mu natychmiastowe wybory
+        with self.replication_lock:
+            self.transfer_target = target
+            self.transfer_sent = False
+            self.transfer_deadline = self.clock.time() + self.election_timeout_range[0]
+        with self.read_cond:
+            self.lease_expires = 0
+            self.lease_blocked_until = self.clock.monotonic() + self.election_timeout_range[0]
+        logging.info(f"Node {self.node_id}: Transferring leadership to {address}")
+        self.replicate_to(target)
+        self.send_timeout_now()
+        if not wait:
+            return None
+
+        deadline = time.monotonic() + self.election_timeout_range[0]
+        while self.state == "leader" and self.running and time.monotonic() < deadline:
+            time.sleep(0.005)
+        if self.state != "leader":
+            return f"SUCCESS: Leadership transferred to {address}."
+        self.transfer_target = None
+        return f"ERROR: Leadership transfer to {address} did not finish in time."
+
+    def send_timeout_now(self):
+        with self.replication_lock:
+            target = self.transfer_target
+            if target is None or self.transfer_sent or self.match_index.get(target) != self.database.last_index():
+                return
+            self.transfer_sent = True
+        timeout_now = {
+            "type": "timeout_now",
+            "term": self.current_term,
+            "leader_id": self.node_id
+        }
+        self.send_message(timeout_now, target)
+
+    def collect_gauges(self):
+        last_index = self.database.last_index()
+        gauges = [
+            ("raft_term", (), self.current_term),
+            ("raft_is_leader", (), int(self.state == "leader")),
+            ("raft_last_log_index", (), last_index),
+            ("raft_commit_index", (), max(self.commit_index, self.leader_commit, self.database.commit_index)),
+            ("raft_applied_index", (), self.database.commit_index),
+            ("raft_snapshot_index", (), self.database.snapshot_index),
+            ("raft_client_connections", (), self.client_handler.connections + (
+                self.async_client_server.connections if self.async_client_server else 0)),
+        ]
+        if self.state == "leader":
+            with self.replication_lock:
+                for peer in self.peers + self.learners:
+                    labels = (("peer", f"{peer[0]}:{peer[1]}"),)
+                    gauges.append(("raft_peer_next_index_lag", labels, last_index + 1 - self.next_index.get(peer, 0)))
+                    gauges.append(("raft_peer_match_index_lag", labels, last_index - self.match_index.get(peer, -1)))
+                    gauges.append(("raft_peer_inflight", labels, len(self.inflight.get(peer, ()))))
+                    if peer in self.peer_rtt:
+                        gauges.append(("raft_peer_rtt_seconds", labels, self.peer_rtt[peer]))
+        return gauges
+
+    def metrics_lines(self):
+        return self.metrics.render(self.collect_gauges())
+
     def get_cluster_status(self):
         leader = self.leader if self.leader else "Unknown"
         active_nodes = [f"{self.host}:{self.port}"] + [f"{peer[0]}:{peer[1]}" for peer in self.peers]
-        sync_status = f"All nodes in sync. Logs number in every node: {len(self.database.log)}" if all(
-            self.next_index.get(peer) == len(self.database.log) for peer in self.peers
+        log_length = self.database.last_index() + 1
+        sync_status = f"All nodes in sync. Logs number in every node: {log_length}" if all(
+            self.match_index.get(peer) == log_length - 1 for peer in self.peers
         ) else f"Nodes out of sync." 
 
         status = (
             f"Cluster Status:\n"
             f"Leader: {leader}\n"
             f"Active Nodes: {active_nodes}\n"
+            f"Learners: {[f'{learner[0]}:{learner[1]}' for learner in self.learners]}\n"
             f"Sync Status: {sync_status}"
         )
         return status
@@ -388,9 +1257,17 @@ class Node:
     def stop(self):
         self.running = False
         try:
-            self.raft_socket.close()
-            self.client_socket.close()
+            if self.scheduler:
+                self.scheduler.stop()
+            self.transport.close()
+            if self.async_client_server:
+                self.async_client_server.stop()
+            elif self.client_socket:
+                self.client_socket.close()
             self.client_socket = None
+            if self.metrics_server:
+                self.metrics_server.stop()
+            self.database.close()
         except Exception as e:
             logging.error(f"Node {self.node_id}: Error while closing sockets: {e}")
         logging.info(f"Node {self.node_id} has been stopped.")
\ No newline at end of file
@@ -0,0 +1,142 @@
+import heapq
+import random
+import logging
+from clock import ManualClock
+from node import Node
+
+
+
+class SimTransport:
+    # Wiadomości nie są odbierane z kolejki: sieć sama wywołuje handle_message węzła w chwili dostarczenia
+    def __init__(self, network, address):
+        self.network = network
+        self.address = address
+
+    def send(self, data, destination):
+        self.network.send(self.address, tuple(destination), data)
+
+    def receive(self, timeout=None):
+        return None
+
+    def close(self):
+        self.network.down.add(self.address)
+
+
+class SimNetwork:
+    # Jednowątkowa symulacja z czasem wirtualnym: zdarzenia (dostarczenia wiadomości i takty węzłów)
+    # są wykonywane w kolejności czasu, więc przy tym samym seedzie przebieg jest powtarzalny
+    def __init__(self, seed=0, latency=(0.001, 0.005), loss=0.0):
+        self.clock = ManualClock()
+        self.random = random.Random(seed)
+        self.latency = latency
+        self.loss = loss
+        self.events = []
+        self.sequence = 0
+        self.nodes = {}
+        self.down = set()
+        self.cut = set()
+        self.delivered = 0
+        self.dropped = 0
+        # Jak w TcpTransport: wiadomości między parą węzłów docierają w kolejności wysłania
+        self.link_free_at = {}
+
+    def schedule(self, delay, callback, *args):
+        self.sequence += 1
+        heapq.heappush(self.events, (self.clock.now + delay, self.sequence, callback, args))
+
+    def send(self, source, destination, data):
+        if (source, destination) in self.cut or destination in self.down or source in self.down \
+                or self.random.random() < self.loss:
+            self.dropped += 1
+            return
+        link = (source, destination)
+        at = max(self.clock.now + self.random.uniform(*self.latency), self.link_free_at.get(link, 0))
+        self.link_free_at[link] = at
+        self.schedule(at - self.clock.now, self.deliver, destination, data)
+
+    def deliver(self, destination, data):
+        node = self.nodes.get(destination)
+        if node is None or destination in self.down:
+            self.dropped += 1
+            return
+        self.delivered += 1
+        try:
+            node.handle_message(data)
+        except Exception as e:
+            logging.error(f"Error handling message: {e}")
+
+    def add_node(self, node_id, port, peers, **options):
+        address = ("127.0.0.1", port)
+        node = Node(node_id, *address, peers, transport=SimTransport(self, address), client_server=None,
+                    clock=self.clock, **options)
+        self.nodes[address] = node
+        # Takty węzłów przesunięte losowo, żeby węzły nie działały w tej samej chwili
+        self.schedule(self.random.uniform(0, node.heartbeat_interval), self.tick, address, "heartbeat_tick")
+        self.schedule(self.random.uniform(0, node.election_timeout), self.tick, address, "election_tick")
+        self.schedule(self.random.uniform(0, node.learner_interval), self.tick, address, "learner_tick")
+        return node
+
+    def tick(self, address, method):
+        # Jak Scheduler węzła: takt zwraca opóźnienie do następnego wywołania
+        node = self.nodes.get(address)
+        if node is None:
+            return
+        delay = node.heartbeat_interval
+        if address not in self.down:
+            try:
+                delay = getattr(node, method)()
+            except Exception as e:
+                logging.error(f"Node {node.node_id}: Error in {method}: {e}")
+        self.schedule(delay, self.tick, address, method)
+
+    def crash(self, address):
+        self.down.add(tuple(address))
+
+    def restore(self, address):
+        # Węzeł wraca z tym samym stanem w pamięci, jak po długiej przerwie
+        address = tuple(address)
+        self.down.discard(address)
+        self.nodes[address].last_heartbeat = self.clock.time()
+
+    def partition(self, *groups):
+        groups = [{tuple(address) for address in group} for group in groups]
+        for group in groups:
+            for other in groups:
+                if other is not group:
+                    self.cut.update((a, b) for a in group for b in other)
+
+    def heal(self):
+        self.cut.clear()
+
+    def run_for(self, duration):
+        self.run_until(lambda: False, duration)
+
+    def run_until(self, condition, timeout):
+        # Zwraca True, gdy warunek został spełniony przed upływem timeout sekund czasu wirtualnego
+        deadline = self.clock.now + timeout
+        while self.events and self.events[0][0] <= deadline:
+            at, _, callback, args = heapq.heappop(self.events)
+            self.clock.advance_to(at)
+            callback(*args)
+            if condition():
+                return True
+        self.clock.advance_to(deadline)
+        return condition()
+
+    def leaders(self):
+        return [node for address, node in self.nodes.items() if address not in self.down and node.state == "leader"]
+
+    def stop(self):
+        for node in self.nodes.values():
+            node.stop()
+
+
+def create_cluster(size, seed=0, base_port=20000, latency=(0.001, 0.005), loss=0.0, **node_options):
+    # Seed dotyczy też modułu random, z którego węzły losują limity czasu elekcji;
+    # pozostałe opcje (np. heartbeat_interval, election_timeout) trafiają do konstruktora Node
+    random.seed(seed)
+    network = SimNetwork(seed, latency, loss)
+    addresses = [("127.0.0.1", base_port + i) for i in range(size)]
+    for i, address in enumerate(addresses):
+        network.add_node(f"Node_{i + 1}", address[1], addresses[:i] + addresses[i + 1:], **node_options)
+    return network
@@ -0,0 +1,184 @@
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import threading
+import subprocess
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+READY_TIMEOUT = 30
+STOP_TIMEOUT = 5
+
+# Supervisor albo ControlPipe bieżącego procesu węzła; ADD-NODE uruchamia przez niego nowy proces zamiast wątku
+current = None
+
+
+class NodeProcess:
+    # Węzeł w osobnym procesie (python main.py --ports ... --node i); stdout i stderr trafiają do pliku logu
+    def __init__(self, node_id, host, port, arguments, log_path, control_fd=None):
+        self.node_id = node_id
+        self.host = host
+        self.port = port
+        self.arguments = arguments
+        self.log_path = log_path
+        self.control_fd = control_fd
+        self.process = None
+
+    def start(self):
+        arguments = self.arguments
+        pass_fds = ()
+        if self.control_fd is not None:
+            arguments = arguments + ["--control-fd", str(self.control_fd)]
+            pass_fds = (self.control_fd,)
+        with open(self.log_path, "ab") as log:
+            self.process = subprocess.Popen([sys.executable, "-u", MAIN] + arguments, stdin=subprocess.DEVNULL,
+                                            stdout=log, stderr=subprocess.STDOUT, pass_fds=pass_fds)
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def is_ready(self):
+        # Gotowy = port klienta przyjmuje połączenia i odsyła baner
+        try:
+            with socket.create_connection((self.host, self.port + 100), timeout=0.5) as sock:
+                return bool(sock.makefile("rb").readline())
+        except OSError:
+            return False
+
+    def wait_ready(self, timeout=READY_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.running:
+                raise RuntimeError(f"{self.node_id} exited with code {self.process.returncode}, see {self.log_path}")
+            if self.is_ready():
+                return
+            time.sleep(0.05)
+        raise TimeoutError(f"{self.node_id} did not open its client port in time, see {self.log_path}")
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        if not self.running:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            logging.warning(f"{self.node_id} did not stop in {timeout} s, killing it")
+            self.process.kill()
+            self.process.wait()
+
+
+class ControlPipe:
+    # Strona węzła: ADD-NODE prosi nadzorcę najwyższego poziomu o nowy proces, więc to on jest jego
+    # właścicielem (sprawdza go, restartuje i zatrzymuje), nawet gdy węzeł, który go dodał, padnie
+    def __init__(self, fd):
+        self.fd = fd
+        self.lock = threading.Lock()
+
+    def spawn(self, node_id, host, port, peers, data_dir=None, learner=False):
+        request = {"node_id": node_id, "host": host, "port": port,
+                   "peers": [f"{peer_host}:{peer_port}" for peer_host, peer_port in peers],
+                   "data_dir": data_dir, "learner": learner}
+        # Zapis krótszy niż PIPE_BUF jest atomowy, więc linie z kilku procesów się nie przeplatają
+        with self.lock:
+            os.write(self.fd, json.dumps(request).encode() + b"\n")
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        # Procesy dodanych węzłów zatrzymuje nadzorca
+        pass
+
+
+class Supervisor:
+    # Uruchamia węzły klastra jako procesy, sprawdza ich gotowość i zatrzymuje je (SIGTERM, potem SIGKILL).
+    # Procesy węzłów dostają koniec zapisu wspólnego potoku sterującego, którym zlecają uruchomienie
+    # węzłów dodanych przez ADD-NODE
+    def __init__(self, ports, options, log_dir, restart=False):
+        self.ports = ports
+        self.options = options
+        self.log_dir = log_dir
+        self.restart = restart
+        self.processes = {}
+        self.lock = threading.Lock()
+        self.stopped = False
+        os.makedirs(log_dir, exist_ok=True)
+        control_read, self.control_fd = os.pipe()
+        threading.Thread(target=self.read_control, args=(control_read,), daemon=True).start()
+
+    def start(self, metrics_port=None):
+        ports = [str(port) for port in self.ports]
+        for i, port in enumerate(self.ports):
+            arguments = ["--ports", *ports, "--node", str(i)] + self.options
+            if metrics_port:
+                arguments += ["--metrics-port", str(metrics_port + i)]
+            self.launch(f"Node_{i + 1}", "127.0.0.1", port, arguments)
+
+    def launch(self, node_id, host, port, arguments):
+        process = NodeProcess(node_id, host, port, arguments, os.path.join(self.log_dir, f"{node_id}.log"),
+                              self.control_fd)
+        with self.lock:
+            if self.stopped:
+                return None
+            if node_id in self.processes and self.processes[node_id].running:
+                logging.error(f"{node_id} is already running (pid {self.processes[node_id].process.pid}), not starting it again")
+                return None
+            process.start()
+            self.processes[node_id] = process
+        logging.info(f"Started {node_id} (pid {process.process.pid}), log: {process.log_path}")
+        return process
+
+    def spawn(self, node_id, host, port, peers, data_dir=None, learner=False):
+        # Węzeł z ADD-NODE działa na tej maszynie pod adresem host:port; peery dostaje pełnymi adresami
+        arguments = ["--ports", str(port), "--node", "0", "--node-id", node_id, "--host", host,
+                     "--peers", *[peer if isinstance(peer, str) else f"{peer[0]}:{peer[1]}" for peer in peers]]
+        arguments += self.options
+        if data_dir:
+            arguments += ["--data-dir", os.path.dirname(data_dir)]
+        if learner:
+            arguments.append("--learner")
+        return self.launch(node_id, host, port, arguments)
+
+    def read_control(self, control_read):
+        # Linie JSON od procesów węzłów; EOF, gdy nadzorca i wszystkie procesy zamkną koniec zapisu
+        with os.fdopen(control_read, "rb") as pipe:
+            for line in pipe:
+                try:
+                    request = json.loads(line)
+                    logging.info(f"Spawning {request['node_id']} at {request['host']}:{request['port']} on request")
+                    self.spawn(request["node_id"], request["host"], request["port"], request["peers"],
+                               request.get("data_dir"), request.get("learner", False))
+                except Exception as e:
+                    logging.error(f"Invalid control request {line!r}: {e}")
+
+    def wait_ready(self, timeout=READY_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        for process in self.snapshot():
+            process.wait_ready(max(deadline - time.monotonic(), 0))
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.processes.values())
+
+    def check(self):
+        # Zwraca procesy, które zakończyły się same; z restart=True uruchamia je ponownie
+        exited = [process for process in self.snapshot() if not process.running]
+        for process in exited:
+            logging.warning(f"{process.node_id} exited with code {process.process.returncode}, see {process.log_path}")
+            if self.restart and not self.stopped:
+                process.start()
+                logging.info(f"Restarted {process.node_id} (pid {process.process.pid})")
+        return exited
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        with self.lock:
+            self.stopped = True
+        processes = self.snapshot()
+        for process in processes:
+            if process.running:
+                process.process.terminate()
+        for process in processes:
+            process.stop(timeout)
+        if self.control_fd is not None:
+            os.close(self.control_fd)
+            self.control_fd = None
@@ -0,0 +1,144 @@
+import socket
+import threading
+import pytest
+import client
+from node import Node
+from conftest import LoopbackTransport, free_port
+
+
+@pytest.fixture
+def leader():
+    port = free_port()
+    node = Node("Node_1", "127.0.0.1", port, [], transport=LoopbackTransport({}, ("127.0.0.1", port)))
+    node.current_term = 1
+    node.state = "candidate"
+    node.become_leader()
+    yield node
+    node.stop()
+
+
+def read_lines(sock, count):
+    reader = sock.makefile("rb")
+    return [reader.readline().decode().rstrip("\n") for _ in range(count)]
+
+
+def test_pipelined_writes_share_one_append(leader):
+    appends = []
+    original = leader.database.append_entries
+    leader.database.append_entries = lambda entries, *args: appends.append(len(entries)) or original(entries, *args)
+
+    responses = leader.client_handler.execute_pipeline(["PUT a 1", "PUT b 2", "UPDATE a 3", "GET a"])
+
+    assert responses == [
+        "SUCCESS: a -> 1 added.\n",
+        "SUCCESS: b -> 2 added.\n",
+        "SUCCESS: a updated to 3.\n",
+        "a -> 3\n",
+    ]
+    assert appends == [3]
+
+
+def test_request_ids_are_echoed(leader):
+    responses = leader.client_handler.execute_pipeline(["#1 MPUT a 1 b 2", "#x2 GET a", "#3 PUT a"])
+
+    assert responses == [
+        "#1-SUCCESS: a -> 1 added.\n#1 SUCCESS: b -> 2 added.\n",
+        "#x2 a -> 1\n",
+        "#3 ERROR: Invalid command format.\n",
+    ]
+
+
+def test_commands_are_framed_by_newlines(leader):
+    server, client = socket.socketpair()
+    threading.Thread(target=leader.client_handler.handle_client, args=(server, "test"), daemon=True).start()
+    try:
+        read_lines(client, 2)
+
+        client.sendall(b"#1 PUT key1 val1\n#2 PUT key2 val2\n#3 GE")
+        client.sendall(b"T key1\n#4 GET " + b"k" * 5000 + b"\n")
+
+        assert read_lines(client, 4) == [
+            "#1 SUCCESS: key1 -> val1 added.",
+            "#2 SUCCESS: key2 -> val2 added.",
+            "#3 key1 -> val1",
+            "#4 ERROR: Key not found.",
+        ]
+    finally:
+        client.close()
+
+
+def test_asyncio_front_end_serves_pipelined_commands():
+    port = free_port()
+    node = Node("Node_1", "127.0.0.1", port, [], transport=LoopbackTransport({}, ("127.0.0.1", port)),
+                client_server="asyncio")
+    node.current_term = 1
+    node.state = "candidate"
+    node.become_leader()
+    threading.Thread(target=node.async_client_server.run, daemon=True).start()
+    try:
+        clients = [socket.create_connection(("127.0.0.1", port + 100)) for _ in range(20)]
+        for n, client in enumerate(clients):
+            client.sendall(f"#a PUT key{n} {n}\n#b GET key{n}\n".encode())
+        for n, client in enumerate(clients):
+            assert read_lines(client, 4)[2:] == [f"#a SUCCESS: key{n} -> {n} added.", f"#b key{n} -> {n}"]
+            client.close()
+        # NOOP lidera i 20 zapisów
+        assert len(node.database.log) == 21
+    finally:
+        node.stop()
+
+
+def test_scan_and_prefix_commands(leader):
+    leader.client_handler.execute_pipeline(["MPUT a 1 b 2 c 3 ab 4"])
+
+    assert leader.client_handler.execute_pipeline(["SCAN - - LIMIT 2", "SCAN x CURSOR b LIMIT 2", "PREFIX a"]) == [
+        "a -> 1\nab -> 4\nCURSOR b\n",
+        "ERROR: Invalid command format.\n",
+        "a -> 1\nab -> 4\nEND\n",
+    ]
+    assert leader.client_handler.execute_pipeline(["#s SCAN b - CURSOR c LIMIT 2"]) == ["#s-c -> 3\n#s END\n"]
+    assert leader.client_handler.execute_pipeline(["PREFIX a LIMIT 0"]) == ["ERROR: Invalid command format.\n"]
+
+
+def test_logs_and_status_are_streamed_in_chunks(leader, monkeypatch):
+    monkeypatch.setattr(client, "RESPONSE_CHUNK_SIZE", 64)
+    leader.client_handler.execute_pipeline([f"PUT key{n} {n}" for n in range(20)])
+
+    responses = leader.client_handler.execute_pipeline(["#l LOGS 19", "STATUS LIMIT 2", "GET key1"])
+    chunks = list(leader.client_handler.iter_chunks(responses))
+
+    assert len(chunks) > 1
+    assert b"".join(chunks).decode().split("\n")[:-1] == [
+        "#l-Database logs:",
+        "#l-Index: 19, Term: 1, Operation: SET, Key: key18, Value: 18",
+        "#l Index: 20, Term: 1, Operation: SET, Key: key19, Value: 19",
+        "Database keys: 20",
+        "key0, key1",
+        "CURSOR key10",
+        "key1 -> 1",
+    ]
+
+
+def test_transfer_leader_command(leader):
+    assert leader.client_handler.execute_pipeline(["TRANSFER-LEADER 127.0.0.1:1", "TRANSFER-LEADER x"]) == [
+        "ERROR: Node 127.0.0.1:1 does not exist in cluster.\n",
+        "ERROR: Invalid address format. Use host:port.\n",
+    ]
+    address = f"{leader.address[0]}:{leader.address[1]}"
+    assert leader.client_handler.execute_pipeline([f"TRANSFER-LEADER {address}"]) == [
+        f"SUCCESS: Node {address} is already the leader.\n"
+    ]
+
+
+def test_pipeline_steps_group_writes_between_other_commands(leader):
+    steps = leader.client_handler.pipeline_steps(["PUT a 1", "#2 PUT b 2", "", "GET a", "#4 DELETE b"], {})
+
+    kind, args = next(steps)
+    assert kind == "write" and [entry.key for entry in args[0]] == ["a", "b"]
+    kind, args = steps.send(["SUCCESS: a", "SUCCESS: b"])
+    assert kind == "command" and args[0] == ["GET", "a"]
+    kind, args = steps.send("a -> 1")
+    assert kind == "write" and len(args[0]) == 1
+    with pytest.raises(StopIteration) as done:
+        steps.send(["SUCCESS: deleted"])
+    assert done.value.value == ["SUCCESS: a\n", "#2 SUCCESS: b\n", "a -> 1\n", "#4 SUCCESS: deleted\n"]
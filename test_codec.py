@@ -0,0 +1,104 @@
+import pytest
+from codec import (CODEC_VERSION, ENTRY_COLUMNS_VERSION, INTERNED_LIMITS, SUPPORTED_VERSIONS, TAG_ENTRY_COLUMNS,
+                   TAG_ENTRY_LIST, encode_message, decode_message)
+from logentry import LogEntry
+
+
+MESSAGES = [
+    {"type": "heartbeat", "leader_id": "Node_1", "term": 3, "sender": ["127.0.0.1", 9000]},
+    {"type": "request_vote", "candidate_id": "Node_2", "term": 4},
+    {"type": "vote_response", "voter_id": "Node_3", "candidate_id": "Node_2", "term": 4, "granted": False},
+    {
+        "type": "append_entries",
+        "term": 5,
+        "leader_id": "Node_1",
+        "prev_log_index": -1,
+        "prev_log_term": 0,
+        "entries": [
+            {"term": 5, "operation": "SET", "key": "a", "value": "1"},
+            {"term": 5, "operation": "DELETE", "key": "zażółć", "value": None},
+        ],
+        "leader_commit": -1,
+    },
+    {"type": "append_entries_response", "term": 5, "success": True, "next_index": 2 ** 40},
+    {"type": "install_snapshot", "term": 5, "store": {"custom key": "x", "type": "y"}, "last_included_index": 10},
+    {"type": "stop_node"},
+    {"type": "custom", "unknown_field": [1.5, -7, None, {"nested": ["list"]}], "raw": b"\x00\x01"},
+]
+
+
+@pytest.mark.parametrize("message", MESSAGES)
+def test_binary_round_trip(message):
+    data = encode_message(message, CODEC_VERSION)
+
+    decoded, version = decode_message(data)
+
+    assert version == CODEC_VERSION
+    assert decoded == message
+
+
+@pytest.mark.parametrize("message", MESSAGES[:-1])
+def test_json_fallback_round_trip(message):
+    decoded, version = decode_message(encode_message(message))
+
+    assert version is None
+    assert decoded == message
+
+
+def test_binary_is_smaller_than_json():
+    message = MESSAGES[3]
+    assert len(encode_message(message, CODEC_VERSION)) < len(encode_message(message)) / 2
+
+
+def test_unsupported_version_is_rejected():
+    data = bytearray(encode_message(MESSAGES[0], CODEC_VERSION))
+    data[1] = 99
+
+    with pytest.raises(ValueError):
+        decode_message(bytes(data))
+
+
+def test_names_added_in_later_versions_are_sent_as_strings_to_older_peers():
+    message = {"type": "append_entries", "read_round": 4, "entries": [{"term": 1, "operation": "NOOP",
+                                                                        "key": None, "value": None}]}
+    old = encode_message(message, 1)
+
+    assert b"read_round" in old and b"NOOP" in old
+    assert b"read_round" not in encode_message(message, CODEC_VERSION)
+    assert decode_message(old) == (message, 1)
+
+
+def test_interned_table_only_grows():
+    limits = [INTERNED_LIMITS[version] for version in SUPPORTED_VERSIONS]
+    assert limits == sorted(limits)
+    assert limits[-1] <= 256
+
+
+def make_entries():
+    entries = []
+    for i in range(300):
+        operation = ("SET", "UPDATE", "DELETE")[i % 3]
+        value = None if operation == "DELETE" else ("ż" if i % 7 == 0 else "v") * (i % 50 or 300)
+        entries.append(LogEntry(1 + i // 100, operation, f"key:{i}", value))
+    return entries
+
+
+def test_long_entry_lists_are_sent_in_columns():
+    entries = make_entries()
+    data = encode_message(entries, CODEC_VERSION)
+
+    decoded, _ = decode_message(data)
+
+    assert data[2] == TAG_ENTRY_COLUMNS
+    assert [entry.to_dict() for entry in decoded] == [entry.to_dict() for entry in entries]
+
+
+def test_peers_before_the_column_version_get_entries_one_by_one():
+    entries = make_entries()
+    data = encode_message(entries, ENTRY_COLUMNS_VERSION - 1)
+
+    decoded, version = decode_message(data)
+
+    assert data[2] == TAG_ENTRY_LIST
+    assert version == ENTRY_COLUMNS_VERSION - 1
+    assert [entry.to_dict() for entry in decoded] == [entry.to_dict() for entry in entries]
@@ -0,0 +1,105 @@
+from database import Database
+
+
+def batch(term, op, pairs):
+    return {"term": term, "operation": "BATCH", "key": None, "value": None,
+            "ops": [[op, key, value] for key, value in pairs]}
+
+
+def test_batch_entry_is_one_log_entry_with_per_key_results():
+    database = Database()
+    database.append_log({"term": 1, "operation": "SET", "key": "b", "value": "old"})
+    index = database.append_log(batch(1, "SET", [("a", "1"), ("b", "2"), ("c", "3")]))
+
+    result = database.commit_log_entries(index)
+
+    assert index == 1
+    assert result.split("\n") == [
+        "SUCCESS: a -> 1 added.",
+        "ERROR: Key already exists.",
+        "SUCCESS: c -> 3 added.",
+    ]
+    assert database.store == {"a": "1", "b": "old", "c": "3"}
+
+
+def test_batch_delete():
+    database = Database()
+    database.commit_log_entries(database.append_log(batch(1, "SET", [("a", "1"), ("b", "2")])))
+
+    result = database.commit_log_entries(database.append_log(batch(1, "DELETE", [("a", None), ("x", None)])))
+
+    assert result.split("\n") == ["SUCCESS: a removed.", "ERROR: Key not found."]
+    assert database.store == {"b": "2"}
+
+
+def test_mget_returns_value_per_key_in_order():
+    database = Database()
+    database.store.update({"a": "1", "c": "3"})
+
+    assert database.mget(["c", "b", "a"]).split("\n") == ["c -> 3", "ERROR: Key not found.", "a -> 1"]
+
+
+def test_show_logs_lists_batch_keys():
+    database = Database()
+    database.append_log(batch(2, "SET", [("a", "1"), ("b", "2")]))
+
+    assert "Operation: BATCH, Key: a,b, Value: 1,2" in database.show_logs()
+
+
+def put_all(database, keys):
+    database.commit_log_entries(database.append_log(batch(1, "SET", [(key, key.upper()) for key in keys])))
+
+
+def test_scan_pages_with_cursor():
+    database = Database()
+    put_all(database, ["d", "a", "c", "b", "e"])
+
+    assert database.scan("b", "e", 2) == "b -> B\nc -> C\nCURSOR d"
+    assert database.scan("d", "e", 2) == "d -> D\nEND"
+    assert database.scan(None, None, 10).split("\n")[-1] == "END"
+
+
+def test_prefix_stops_at_end_of_prefix():
+    database = Database()
+    put_all(database, ["user:1", "user:2", "user:3", "usera", "item:1"])
+    database.commit_log_entries(database.append_log(batch(1, "DELETE", [("user:2", None)])))
+
+    assert database.prefix("user:", 1) == "user:1 -> USER:1\nCURSOR user:3"
+    assert database.prefix("user:", 1, "user:3") == "user:3 -> USER:3\nEND"
+    assert database.prefix("none", 5) == "END"
+
+
+def test_index_is_rebuilt_from_installed_snapshot():
+    database = Database()
+    put_all(database, ["a"])
+
+    database.install_snapshot(5, 2, {"y": "1", "x": "2"})
+
+    assert database.scan(None, None, 10) == "x -> 2\ny -> 1\nEND"
+
+
+def test_logs_are_streamed_from_a_given_index():
+    database = Database()
+    for key in "abcde":
+        database.append_log({"term": 1, "operation": "SET", "key": key, "value": "1"})
+
+    lines = database.iter_logs(3, 10, chunk_size=1)
+    database.append_log({"term": 1, "operation": "SET", "key": "f", "value": "1"})
+
+    assert list(lines) == [
+        "Database logs:",
+        "Index: 3, Term: 1, Operation: SET, Key: d, Value: 1",
+        "Index: 4, Term: 1, Operation: SET, Key: e, Value: 1",
+    ]
+    assert len(list(database.iter_logs(1, 2))) == 3
+
+
+def test_status_pages_keys_in_order():
+    database = Database()
+    put_all(database, ["c", "a", "d", "b", "e"])
+
+    assert list(database.status_lines(keys_per_line=2)) == ["Database keys: 5", "a, b", "c, d", "e"]
+    assert list(database.status_lines(3, keys_per_line=2)) == ["Database keys: 5", "a, b", "c", "CURSOR d"]
+    assert list(database.status_lines(3, "d")) == ["Database keys: 5", "d, e", "END"]
+    assert database.status() == "Database keys: 5\na, b, c, d, e"
+    assert Database().status() == "Database is empty."
@@ -0,0 +1,31 @@
+import random
+from keyindex import KeyIndex
+
+
+def test_index_matches_sorted_set_under_random_updates():
+    rng = random.Random(14)
+    index = KeyIndex(load=4)
+    reference = set()
+    for _ in range(5000):
+        key = f"k{rng.randint(0, 300)}"
+        if rng.random() < 0.6:
+            index.add(key)
+            reference.add(key)
+        else:
+            index.remove(key)
+            reference.discard(key)
+
+    assert len(index) == len(reference)
+    assert list(index.irange()) == sorted(reference)
+    for _ in range(100):
+        start, end = sorted(f"k{rng.randint(0, 400)}" for _ in range(2))
+        assert list(index.irange(start, end)) == [key for key in sorted(reference) if start <= key < end]
+        assert (start in index) == (start in reference)
+
+
+def test_bulk_build_and_open_bounds():
+    index = KeyIndex(["c", "a", "e", "b", "d"], load=2)
+
+    assert list(index.irange(end="c")) == ["a", "b"]
+    assert list(index.irange("c")) == ["c", "d", "e"]
+    assert list(index.irange("f")) == []
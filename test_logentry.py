@@ -0,0 +1,40 @@
+from codec import CODEC_VERSION, encode_message, decode_message
+from database import Database
+from logentry import LogEntry
+
+
+def test_entry_has_no_instance_dict():
+    entry = LogEntry(1, "SET", "a", "1")
+
+    assert not hasattr(entry, "__dict__")
+    assert entry == {"term": 1, "operation": "SET", "key": "a", "value": "1"}
+    assert LogEntry.from_dict(entry.to_dict()) == entry
+
+
+def test_batch_entry_round_trips_through_dict():
+    entry = LogEntry(2, "BATCH", None, None, (("SET", "a", "1"), ("DELETE", "b", None)))
+
+    assert entry.to_dict()["ops"] == [["SET", "a", "1"], ["DELETE", "b", None]]
+    assert LogEntry.from_dict(entry.to_dict()) == entry
+
+
+def test_codecs_carry_log_entries():
+    entries = [LogEntry(3, "SET", "a", "1"), LogEntry(3, "BATCH", None, None, (("UPDATE", "a", "2"),))]
+    message = {"type": "append_entries", "entries": entries}
+
+    for version in (None, CODEC_VERSION):
+        decoded, _ = decode_message(encode_message(message, version))
+        assert [LogEntry.from_dict(entry) for entry in decoded["entries"]] == entries
+    assert type(decode_message(encode_message({"entries": entries[:1]}, CODEC_VERSION))[0]["entries"][0]) is LogEntry
+
+
+def test_wal_replay_restores_log_entries(tmp_path):
+    database = Database(str(tmp_path))
+    database.append_entries([{"term": 1, "operation": "SET", "key": "a", "value": "1"}])
+    database.close()
+
+    restarted = Database(str(tmp_path))
+
+    assert type(restarted.entry_at(0)) is LogEntry
+    assert restarted.entry_at(0) == LogEntry(1, "SET", "a", "1")
+    restarted.close()
@@ -0,0 +1,81 @@
+import urllib.request
+from metrics import Histogram, Metrics
+from node import Node
+from conftest import LoopbackTransport, free_port, make_entries, pump, elect, call_pumping
+
+
+def samples(lines):
+    return dict(line.rstrip("\n").rsplit(" ", 1) for line in lines if not line.startswith("#"))
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.01, 0.05, 0.5, 3.0):
+        histogram.observe(value)
+
+    lines = samples(histogram.lines("latency"))
+    assert lines['latency_bucket{le="0.01"}'] == "2"
+    assert lines['latency_bucket{le="0.1"}'] == "3"
+    assert lines['latency_bucket{le="1.0"}'] == "4"
+    assert lines['latency_bucket{le="+Inf"}'] == "5"
+    assert lines["latency_count"] == "5"
+
+
+def test_render_groups_samples_by_family():
+    metrics = Metrics()
+    metrics.inc("raft_messages_sent_total", (("type", "heartbeat"),))
+    metrics.inc("raft_messages_sent_total", (("type", "heartbeat"),))
+    metrics.inc("raft_messages_sent_total", (("type", "append_entries"),))
+
+    lines = list(metrics.render([("raft_term", (), 3)]))
+    assert lines == [
+        "# HELP raft_messages_sent_total Raft messages sent by type.",
+        "# TYPE raft_messages_sent_total counter",
+        'raft_messages_sent_total{type="append_entries"} 1',
+        'raft_messages_sent_total{type="heartbeat"} 2',
+        "# HELP raft_term Current term.",
+        "# TYPE raft_term gauge",
+        "raft_term 3",
+    ]
+
+
+def test_leader_reports_indexes_peer_lag_and_commit_latency(cluster):
+    network, leader, follower = cluster
+    follower.database.append_entries(make_entries(1, 0, 10))
+    leader.database.append_entries(make_entries(1, 0, 10))
+    elect(leader, 2)
+
+    lines = samples(leader.metrics_lines())
+    assert lines['raft_peer_next_index_lag{peer="%s:%d"}' % follower.address] == "0"
+    # 10 wpisów i NOOP nowego lidera
+    assert lines['raft_peer_match_index_lag{peer="%s:%d"}' % follower.address] == "11"
+
+    leader.sync_data(heartbeat=True)
+    pump(network, [leader, follower])
+    assert call_pumping(network, [leader, follower], leader.client_handler.execute_pipeline, ["PUT a 1"]) == [
+        "SUCCESS: a -> 1 added.\n"
+    ]
+    pump(network, [leader, follower])
+
+    lines = samples(leader.client_handler.execute_pipeline(["METRICS"])[0])
+    assert lines["raft_is_leader"] == "1"
+    assert lines["raft_last_log_index"] == "11"
+    assert lines["raft_commit_index"] == lines["raft_applied_index"] == "11"
+    assert lines['raft_peer_match_index_lag{peer="%s:%d"}' % follower.address] == "0"
+    assert int(lines['raft_messages_sent_total{type="append_entries"}']) >= 1
+    assert lines["raft_commit_latency_seconds_count"] == "1"
+    assert samples(follower.metrics_lines())["raft_applied_index"] == "11"
+
+
+def test_metrics_are_served_over_http():
+    port, metrics_port = free_port(), free_port()
+    node = Node("Node_1", "127.0.0.1", port, [], transport=LoopbackTransport({}, ("127.0.0.1", port)),
+                metrics_port=metrics_port)
+    node.run()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=5) as response:
+            body = response.read().decode()
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert "# TYPE raft_term gauge" in body
+    finally:
+        node.stop()
@@ -0,0 +1,149 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import pytest
+from clock import ManualClock
+from multiraft import BALANCE_INTERVAL, MultiRaftNode, ShardedClientHandler, group_of
+from conftest import elect, free_port
+from transport import MultiplexTransport, TcpTransport
+
+
+def wait_for(condition, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def key_in_group(group, groups):
+    return next(f"key{i}" for i in range(1000) if group_of(f"key{i}", groups) == group)
+
+
+def test_group_of_is_stable_and_spreads_keys():
+    assert group_of("user:1", 4) == group_of("user:1", 4)
+    counts = [0] * 4
+    for i in range(4000):
+        counts[group_of(f"user:{i}", 4)] += 1
+    assert min(counts) > 800
+
+
+def test_multiplexed_channels_deliver_to_their_group():
+    a = MultiplexTransport(TcpTransport("localhost", 0))
+    b = MultiplexTransport(TcpTransport("localhost", 0))
+    try:
+        a_channels = [a.channel(0), a.channel(1)]
+        b_channels = [b.channel(0), b.channel(1)]
+        a_channels[1].send(b"for group 1", b.address)
+        a_channels[0].send(b"for group 0", b.address)
+        assert b_channels[0].receive(timeout=2) == b"for group 0"
+        assert b_channels[1].receive(timeout=2) == b"for group 1"
+        assert b_channels[0].receive(timeout=0.1) is None
+    finally:
+        a.close()
+        b.close()
+
+
+def test_routing_by_key_and_group_prefix():
+    handler = ShardedClientHandler(SimpleNamespace(groups=[None] * 3, groups_status=lambda: "Groups: 3"))
+    first, second = key_in_group(0, 3), key_in_group(1, 3)
+    assert handler.route(None, ["PUT", second, "v"], f"PUT {second} v") == (1, f"PUT {second} v", None)
+    assert handler.route(None, ["STALE", "5", "GET", first], f"STALE 5 GET {first}")[0] == 0
+    assert handler.route(7, ["GROUP", "2", "SCAN", "-", "-"], "#7 GROUP 2 SCAN - -") == (2, "#7 SCAN - -", None)
+    assert handler.route(None, ["GROUPS"], "GROUPS") == (None, "GROUPS", "Groups: 3")
+    assert handler.route(None, ["GROUP", "3", "SCAN"], "GROUP 3 SCAN")[2].startswith("ERROR: Invalid group")
+    assert "different groups" in handler.route(None, ["MGET", first, second], f"MGET {first} {second}")[2]
+    assert "not supported" in handler.route(None, ["GROUP", "0", "ADD-NODE", "x"], "GROUP 0 ADD-NODE x")[2]
+    assert "needs a group" in handler.route(None, ["SCAN", "-", "-"], "SCAN - -")[2]
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.calls = []
+
+    def execute_pipeline(self, lines, session=None):
+        self.calls.append((lines, session))
+        return [f"{line}\n" for line in lines]
+
+
+def test_read_mode_stays_in_the_connection_session():
+    groups = [SimpleNamespace(client_handler=RecordingHandler()) for _ in range(2)]
+    executor = ThreadPoolExecutor(max_workers=2)
+    handler = ShardedClientHandler(SimpleNamespace(groups=groups, executor=executor))
+    first, second = key_in_group(0, 2), key_in_group(1, 2)
+    session = {}
+    try:
+        responses = handler.execute_pipeline(["READ-MODE STALE 5", f"GET {first}", f"#1 GET {second}",
+                                              "READ-MODE LINEARIZABLE", f"GET {second}", f"PUT {first} v"], session)
+    finally:
+        executor.shutdown()
+
+    assert responses == ["SUCCESS: Read mode set to STALE 5.\n", f"STALE 5 GET {first}\n",
+                         f"#1 STALE 5 GET {second}\n", "SUCCESS: Read mode set to LINEARIZABLE.\n",
+                         f"GET {second}\n", f"PUT {first} v\n"]
+    assert groups[1].client_handler.calls[0][0] == [f"#1 STALE 5 GET {second}", f"GET {second}"]
+    # Grupy nie dzielą sesji ani między sobą, ani z połączeniem
+    sessions = [group.client_handler.calls[0][1] for group in groups]
+    assert sessions == [{}, {}] and sessions[0] is not sessions[1] and session is not sessions[0]
+    assert session == {"read_mode": None}
+
+
+@pytest.fixture
+def multiraft_cluster():
+    ports = [free_port() for _ in range(3)]
+    members = {f"Node_{i + 1}": ("127.0.0.1", port) for i, port in enumerate(ports)}
+    nodes = [MultiRaftNode(node_id, "127.0.0.1", port, members, 2, heartbeat_interval=0.05,
+                           election_timeout=(0.3, 0.6))
+             for node_id, (_, port) in members.items()]
+    for node in nodes:
+        node.run()
+    yield nodes
+    for node in nodes:
+        node.stop()
+
+
+def test_groups_have_leaders_on_their_preferred_nodes(multiraft_cluster):
+    nodes = multiraft_cluster
+    assert wait_for(lambda: all(nodes[group].groups[group].state == "leader" for group in range(2)))
+    first, second = key_in_group(0, 2), key_in_group(1, 2)
+    assert nodes[0].client_handler.execute_pipeline([f"PUT {first} a"])[0].startswith("SUCCESS")
+    assert nodes[1].client_handler.execute_pipeline([f"PUT {second} b"])[0].startswith("SUCCESS")
+    # Węzeł 1 nie prowadzi grupy 1, więc zapis tam odsyła do lidera
+    assert nodes[0].client_handler.execute_pipeline([f"PUT {second} c"])[0].startswith("ERROR")
+    assert nodes[1].client_handler.execute_pipeline([f"GET {second}"])[0].strip().endswith("b")
+    status = nodes[2].client_handler.execute_pipeline(["GROUPS"])[0]
+    assert f"Group 1: leader Node_2/g1 127.0.0.1:{nodes[1].port + 100}" in status
+
+
+def test_balancer_backs_off_after_failed_transfers():
+    ports = [free_port(), free_port()]
+    members = {f"Node_{i + 1}": ("127.0.0.1", port) for i, port in enumerate(ports)}
+    clock = ManualClock(1000.0)
+    node = MultiRaftNode("Node_1", "127.0.0.1", ports[0], members, 2, clock=clock, heartbeat_interval=0.05,
+                         election_timeout=(0.3, 0.6))
+    try:
+        # Grupa 1 powinna mieć lidera na Node_2, który ma pełny log, ale nie wygrywa wyborów
+        group, target = node.groups[1], members["Node_2"]
+        elect(group, 1)
+        transfers = []
+        transfer_leader = group.transfer_leader
+        group.transfer_leader = lambda *args, **kwargs: transfers.append(clock.now) or transfer_leader(*args, **kwargs)
+        blocked = 0
+        steps = int(20 / group.heartbeat_interval)
+        for step in range(1, steps + 1):
+            clock.advance_to(1000.0 + step * group.heartbeat_interval)
+            group.match_index[target] = group.database.last_index()
+            group.acked_round[target] = group.read_round
+            group.heartbeat_tick()
+            if step % int(BALANCE_INTERVAL / group.heartbeat_interval) == 0:
+                node.balance_tick()
+            blocked += group.transfer_target is not None
+
+        assert 2 <= len(transfers) <= 5
+        assert transfers[-1] - transfers[-2] >= 4 * BALANCE_INTERVAL
+        # Zapisy są wstrzymane tylko na czas samych prób
+        assert blocked / steps < 0.1
+        assert group.state == "leader" and not isinstance(group.submit_entries([group.new_entry("SET", "a", "1")]), str)
+    finally:
+        node.stop()
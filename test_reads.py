@@ -0,0 +1,176 @@
+import time
+from conftest import pump, elect, call_pumping
+
+
+def test_follower_read_is_redirected(three_nodes):
+    network, nodes = three_nodes
+    leader, follower = nodes[0], nodes[1]
+    elect(leader, 1)
+    pump(network, nodes)
+
+    assert follower.read_index() == "ERROR: Not the leader. Current leader is Node_1"
+
+
+def test_new_leader_commits_noop_before_first_read(three_nodes):
+    network, nodes = three_nodes
+    leader = nodes[0]
+    leader.database.append_entries([{"term": 1, "operation": "SET", "key": "a", "value": "1"}])
+    elect(leader, 2)
+
+    read_index = call_pumping(network, nodes, leader.read_index)
+
+    assert read_index == 1
+    assert leader.database.entry_at(1).operation == "NOOP"
+    assert leader.database.get("a") == "a -> 1"
+
+
+def test_read_waits_for_majority_round(three_nodes):
+    network, nodes = three_nodes
+    leader = nodes[0]
+    elect(leader, 1)
+    call_pumping(network, nodes, leader.commit_entries, [leader.new_entry("SET", "a", "1")])
+
+    sent = []
+    original_send = leader.send_message
+    leader.send_message = lambda message, destination: sent.append(message) or original_send(message, destination)
+    assert call_pumping(network, nodes, leader.read_index) == 1
+    assert any(message["type"] == "append_entries" and message["read_round"] == leader.read_round for message in sent)
+    assert leader.confirmed_round == leader.read_round
+
+
+def test_deposed_leader_cannot_serve_reads(three_nodes):
+    network, nodes = three_nodes
+    leader = nodes[0]
+    elect(leader, 1)
+    call_pumping(network, nodes, leader.commit_entries, [leader.new_entry("SET", "a", "1")])
+
+    # Lider odcięty od reszty klastra: wiadomości do followerów giną
+    leader.transport.send = lambda data, destination: None
+    leader.read_timeout = 0.2
+
+    assert leader.read_index() == "ERROR: Leadership was not confirmed in time."
+
+
+def test_lease_serves_reads_without_round_trip(three_nodes):
+    network, nodes = three_nodes
+    leader = nodes[0]
+    leader.lease_duration = 2.0
+    elect(leader, 1)
+    call_pumping(network, nodes, leader.commit_entries, [leader.new_entry("SET", "a", "1")])
+    call_pumping(network, nodes, leader.read_index)
+    assert leader.lease_expires > time.monotonic()
+
+    rounds = leader.read_round
+    assert leader.read_index() == 1
+    assert leader.read_round == rounds
+    assert all(not inbox for inbox in network.values())
+
+
+def test_vote_is_refused_while_leader_is_alive(three_nodes):
+    network, nodes = three_nodes
+    leader, follower, candidate = nodes
+    elect(leader, 1)
+    pump(network, nodes)
+
+    candidate.leader = None
+    candidate.state = "follower"
+    candidate.start_election()
+    pump(network, nodes)
+
+    assert leader.state == "leader"
+    assert follower.current_term == 1
+    assert candidate.state == "candidate"
+
+
+def test_follower_serves_reads_within_entry_lag(three_nodes):
+    network, nodes = three_nodes
+    leader, follower = nodes[0], nodes[1]
+    elect(leader, 1)
+    call_pumping(network, nodes, leader.commit_entries, [leader.new_entry("SET", "a", "1")])
+    pump(network, nodes)
+
+    assert follower.bounded_read(0, "entries") == 1
+    assert follower.client_handler.execute_pipeline(["STALE 0 GET a"]) == ["a -> 1\n"]
+    assert follower.client_handler.execute_pipeline(["GET a"]) == ["ERROR: Not the leader. Current leader is Node_1\n"]
+
+
+def test_lagging_follower_waits_then_redirects(three_nodes):
+    network, nodes = three_nodes
+    leader, follower, isolated = nodes
+    elect(leader, 1)
+    pump(network, nodes)
+    network[isolated.address].clear()
+    isolated.transport.receive = lambda timeout=None: None
+    call_pumping(network, nodes, leader.commit_entries, [leader.new_entry("SET", "a", "1")])
+    call_pumping(network, nodes, leader.commit_entries, [leader.new_entry("SET", "b", "2")])
+
+    # Replika odcięta od lidera zna tylko commit sprzed odcięcia
+    isolated.note_leader_commit(2, time.monotonic())
+    isolated.stale_read_timeout = 0.1
+    assert isolated.bounded_read(2, "entries") == 0
+    assert isolated.bounded_read(1, "entries") == (
+        "ERROR: Replica lags more than 1 entries behind the leader. Current leader is Node_1"
+    )
+
+
+def test_follower_without_leader_contact_rejects_entry_bounded_reads(three_nodes):
+    network, nodes = three_nodes
+    leader, follower = nodes[0], nodes[1]
+    elect(leader, 1)
+    call_pumping(network, nodes, leader.commit_entries, [leader.new_entry("SET", "a", "1")])
+    pump(network, nodes)
+    follower.stale_read_timeout = 0.05
+    assert follower.bounded_read(0, "entries") == 1
+
+    # Ostatni znany commit lidera jest zgodny z repliką, ale lider milczy dłużej niż timeout wyborów
+    follower.last_heartbeat -= follower.election_timeout_range[0]
+    assert follower.bounded_read(5, "entries").startswith("ERROR: Replica lags more than 5 entries")
+
+
+def test_deposed_leader_reports_unknown_entry_lag(three_nodes):
+    network, nodes = three_nodes
+    leader = nodes[0]
+    elect(leader, 1)
+    call_pumping(network, nodes, leader.commit_entries, [leader.new_entry("SET", "a", "1")])
+    leader.stale_read_timeout = 0.05
+    assert leader.read_lag("entries") is None
+    call_pumping(network, nodes, leader.read_index)
+    assert leader.bounded_read(0, "entries") == 1
+
+    # Odcięty lider nie potwierdza kolejnych rund, więc nie może twierdzić, że jest aktualny
+    leader.transport.send = lambda data, destination: None
+    leader.confirmed_at -= leader.election_timeout_range[0]
+    assert leader.read_lag("entries") is None
+    assert leader.bounded_read(0, "entries").startswith("ERROR: Replica lags more than 0 entries")
+
+
+def test_follower_read_bounded_in_milliseconds(three_nodes):
+    network, nodes = three_nodes
+    leader, follower = nodes[0], nodes[1]
+    elect(leader, 1)
+    call_pumping(network, nodes, leader.commit_entries, [leader.new_entry("SET", "a", "1")])
+    pump(network, nodes)
+    follower.stale_read_timeout = 0.05
+
+    assert follower.bounded_read(1000, "ms") == 1
+    time.sleep(0.1)
+    assert follower.bounded_read(50, "ms").startswith("ERROR: Replica lags more than 50 ms")
+
+
+def test_read_mode_is_kept_per_connection(three_nodes):
+    network, nodes = three_nodes
+    leader, follower = nodes[0], nodes[1]
+    elect(leader, 1)
+    call_pumping(network, nodes, leader.commit_entries, [leader.new_entry("SET", "a", "1")])
+    pump(network, nodes)
+    handler = follower.client_handler
+
+    session = {}
+    assert handler.execute_pipeline(["READ-MODE STALE 500ms", "MGET a b"], session) == [
+        "SUCCESS: Read mode set to STALE 500MS.\n", "a -> 1\nERROR: Key not found.\n"
+    ]
+    assert handler.execute_pipeline(["GET a"], session) == ["a -> 1\n"]
+    assert handler.execute_pipeline(["GET a"], {}) == ["ERROR: Not the leader. Current leader is Node_1\n"]
+    assert handler.execute_pipeline(["READ-MODE STALE soon"], session) == [
+        "ERROR: Invalid read mode. Use LINEARIZABLE, STALE [entries] or STALE [milliseconds]ms.\n"
+    ]
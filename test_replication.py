@@ -0,0 +1,302 @@
+import threading
+import time
+import pytest
+from clock import ManualClock
+from codec import decode_message
+from logentry import LogEntry
+from node import Node
+from conftest import LoopbackTransport, free_port, make_entries, pump, elect
+
+
+def test_diverged_follower_reconciles_in_few_round_trips(cluster):
+    network, leader, follower = cluster
+    leader.database.append_entries(make_entries(1, 0, 1000) + make_entries(3, 1000, 2000))
+    follower.database.append_entries(make_entries(1, 0, 1000) + make_entries(2, 1000, 3000))
+    follower.current_term = 2
+    elect(leader, 3)
+
+    leader.sync_data(heartbeat=True)
+    rejections = pump(network, [leader, follower])
+
+    assert rejections <= 2
+    assert follower.database.last_index() == leader.database.last_index() == 3000
+    assert follower.database.log == leader.database.log
+    assert leader.match_index[follower.address] == 3000
+    assert leader.database.commit_index == 3000
+    assert follower.database.commit_index == 3000
+    assert "key_2_1500" not in follower.database.store
+    assert follower.database.store["key_3_2999"] == "value2999"
+
+
+def test_lagging_follower_catches_up_from_its_log_end(cluster):
+    network, leader, follower = cluster
+    leader.database.append_entries(make_entries(1, 0, 5000))
+    follower.database.append_entries(make_entries(1, 0, 100))
+    elect(leader, 2)
+    leader.database.append_log({"term": 2, "operation": "SET", "key": "last", "value": "1"})
+    leader.durable_index = leader.database.last_index()
+
+    # Pierwszą próbą jest NOOP wysłany przez nowego lidera
+    rejections = pump(network, [leader, follower])
+
+    assert rejections == 1
+    assert follower.database.log == leader.database.log
+    assert follower.database.store["last"] == "1"
+
+
+def test_compaction_during_replication_does_not_shift_entries(cluster):
+    network, leader, follower = cluster
+    leader.database.append_entries(make_entries(1, 0, 3000))
+    elect(leader, 2)
+    network[follower.address].clear()
+    leader.database.commit_log_entries(2000)
+    log = list(leader.database.log)
+    leader.inflight[follower.address].clear()
+    leader.next_index[follower.address] = 500
+
+    # Snapshot z innego wątku próbuje wejść między odczyt prev_log_term a wycięcie wpisów
+    snapshot = threading.Thread(target=leader.database.take_snapshot)
+    term_at = leader.database.term_at
+
+    def term_at_during_snapshot(index):
+        if not snapshot.is_alive() and snapshot.ident is None:
+            snapshot.start()
+            snapshot.join(0.2)
+        return term_at(index)
+
+    leader.database.term_at = term_at_during_snapshot
+    leader.replicate_to(follower.address)
+    snapshot.join()
+
+    message, _ = decode_message(network[follower.address][0])
+    assert message["prev_log_index"] == 499
+    assert LogEntry.from_dict(message["entries"][0]).key == log[500].key
+    assert leader.database.snapshot_index == 2000
+    with pytest.raises(IndexError):
+        leader.database.entries_from(2000)
+
+
+def fill_window(network, leader, follower):
+    leader.database.append_entries(make_entries(1, 0, 1))
+    follower.database.append_entries(make_entries(1, 0, 1))
+    elect(leader, 2)
+    pump(network, [leader, follower])
+    leader.database.append_entries(make_entries(2, 2, 5000))
+    leader.durable_index = leader.database.last_index()
+    leader.sync_data()
+
+
+def test_inflight_window_limits_unacknowledged_messages(cluster):
+    network, leader, follower = cluster
+    fill_window(network, leader, follower)
+
+    inbox = network[follower.address]
+    assert len(inbox) == leader.max_inflight
+    assert leader.next_index[follower.address] == 2 + leader.max_inflight * leader.max_batch_entries
+
+    # Potwierdzenie jednej wiadomości zwalnia miejsce w oknie na kolejną
+    follower.handle_message(inbox.popleft())
+    leader.handle_message(network[leader.address].popleft())
+    assert len(inbox) == leader.max_inflight
+    assert leader.match_index[follower.address] == 1 + leader.max_batch_entries
+
+
+def test_unacknowledged_messages_are_resent_after_timeout(cluster):
+    network, leader, follower = cluster
+    leader.clock = ManualClock(time.time())
+    fill_window(network, leader, follower)
+    network[follower.address].clear()
+
+    leader.replicate_to(follower.address)
+    assert not network[follower.address]
+
+    leader.clock.advance_to(leader.clock.now + leader.replication_timeout + 0.1)
+    leader.replicate_to(follower.address)
+    message, _ = decode_message(network[follower.address][0])
+    assert message["prev_log_index"] == leader.match_index[follower.address] == 1
+    pump(network, [leader, follower])
+    assert follower.database.log == leader.database.log
+
+
+def test_peer_that_stops_reading_does_not_block_replication_to_others(cluster):
+    network, leader, follower = cluster
+    elect(leader, 2)
+    pump(network, [leader, follower])
+    stuck = ("127.0.0.1", free_port())
+    release = threading.Event()
+    original_send = leader.transport.send
+    leader.transport.send = lambda data, destination: (release.wait() if tuple(destination) == stuck
+                                                       else original_send(data, destination))
+    leader.peers.append(stuck)
+    leader.init_peer_progress(stuck, leader.database.last_index())
+
+    blocked = threading.Thread(target=leader.replicate_to, args=(stuck, True), daemon=True)
+    blocked.start()
+    try:
+        leader.database.append_entries(make_entries(2, 1, 10))
+        healthy = threading.Thread(target=leader.replicate_to, args=(follower.address,), daemon=True)
+        healthy.start()
+        healthy.join(2)
+        assert not healthy.is_alive()
+        pump(network, [leader, follower])
+        assert follower.database.last_index() == leader.database.last_index()
+    finally:
+        release.set()
+
+
+def commit_in_thread(leader, key):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(leader.commit_entries([leader.new_entry("SET", key, "1")])))
+    thread.start()
+    while not leader.pending_writes:
+        time.sleep(0.001)
+    return thread, results
+
+
+def test_write_overwritten_by_new_leader_is_not_acknowledged(cluster):
+    network, leader, follower = cluster
+    elect(leader, 2)
+    pump(network, [leader, follower])
+    thread, results = commit_in_thread(leader, "lost")
+    index = leader.database.last_index()
+
+    # Wpis nie dotarł do followera; lider następnej kadencji zapisał pod tym indeksem inny wpis,
+    # a ten węzeł został potem liderem kadencji 4 z jego logiem
+    network[follower.address].clear()
+    leader.database.truncate_log(index)
+    leader.database.append_entries(make_entries(3, 0, 1))
+    leader.current_term = 4
+    leader.database.append_entries([{"term": 4, "operation": "NOOP", "key": None, "value": None}])
+    leader.durable_index = leader.database.last_index()
+    leader.sync_data(heartbeat=True)
+    while thread.is_alive():
+        pump(network, [leader, follower])
+        time.sleep(0.001)
+
+    assert results == [["ERROR: Write was overwritten by a new leader."]]
+    assert leader.database.commit_index > index
+    assert leader.pending_writes == {}
+
+
+def test_timed_out_write_leaves_no_pending_result(cluster):
+    network, leader, follower = cluster
+    elect(leader, 2)
+    pump(network, [leader, follower])
+    leader.commit_timeout = 0.1
+    thread, results = commit_in_thread(leader, "late")
+    thread.join()
+    assert results == [["ERROR: Write was not committed in time."]]
+
+    pump(network, [leader, follower])
+    assert leader.database.get("late") == "late -> 1"
+    assert leader.pending_writes == {}
+
+
+def test_disk_backed_leader_replicates_raw_segment_records(tmp_path):
+    network = {}
+    leader_port, follower_port = free_port(), free_port()
+    leader_address = ("127.0.0.1", leader_port)
+    follower_address = ("127.0.0.1", follower_port)
+    leader = Node("Leader", "127.0.0.1", leader_port, [follower_address], data_dir=str(tmp_path / "leader"),
+                  transport=LoopbackTransport(network, leader_address))
+    follower = Node("Follower", "127.0.0.1", follower_port, [leader_address], data_dir=str(tmp_path / "follower"),
+                    transport=LoopbackTransport(network, follower_address))
+    try:
+        leader.database.append_entries(make_entries(1, 0, 1000) + make_entries(3, 1000, 3000))
+        follower.database.append_entries(make_entries(1, 0, 1000) + make_entries(2, 1000, 2000))
+        follower.current_term = 2
+        elect(leader, 3)
+
+        sent = []
+        send = leader.transport.send
+        leader.transport.send = lambda data, destination: (sent.append(decode_message(data)[0]), send(data, destination))
+        leader.sync_data(heartbeat=True)
+        pump(network, [leader, follower])
+
+        assert any("raw_entries" in message for message in sent)
+        assert follower.database.log == leader.database.log
+        assert follower.database.store["key_3_2999"] == "value2999"
+
+        # Peer ze starszym kodekiem nie odczyta rekordów WAL zapisanych w bieżącej wersji i dostaje zwykłe wpisy
+        for version in (5, 6, 7):
+            leader.peer_codecs[follower_address] = version
+            sent.clear()
+            leader.database.append_entries(make_entries(3, 4000 + version * 10, 10))
+            leader.sync_data()
+            assert sent and not any("raw_entries" in message for message in sent)
+            pump(network, [leader, follower])
+            assert follower.database.log == leader.database.log
+    finally:
+        leader.stop()
+        follower.stop()
+
+
+def test_restarted_node_keeps_term_vote_and_store(tmp_path):
+    network = {}
+    port, peer_port = free_port(), free_port()
+    address, peer_address = ("127.0.0.1", port), ("127.0.0.1", peer_port)
+    data_dir = str(tmp_path / "node")
+
+    node = Node("Node", "127.0.0.1", port, [peer_address], data_dir=data_dir,
+                transport=LoopbackTransport(network, address))
+    LoopbackTransport(network, peer_address)
+    node.database.append_entries(make_entries(4, 0, 20))
+    node.database.commit_log_entries(14)
+    node.current_term = 5
+    node.voted_for = "Other"
+    node.send_message({"type": "vote_response", "voter_id": "Node", "candidate_id": "Other",
+                       "term": 5, "granted": True}, peer_address)
+    node.stop()
+
+    restarted = Node("Node", "127.0.0.1", port, [peer_address], data_dir=data_dir,
+                     transport=LoopbackTransport(network, address))
+    try:
+        assert restarted.state == "follower"
+        assert (restarted.current_term, restarted.voted_for) == (5, "Other")
+        assert restarted.commit_index == 14
+        assert len(restarted.database.store) == 15
+        assert restarted.database.last_index() == 19
+    finally:
+        restarted.stop()
+
+
+def test_added_node_gets_an_unused_id_and_data_dir(tmp_path, monkeypatch):
+    import main
+    started = []
+    monkeypatch.setattr(main, "start_new_node", lambda *args, **kwargs: started.append(args + (kwargs,)))
+    port = free_port()
+    node = Node("Node_1", "127.0.0.1", port, [("127.0.0.1", free_port()), ("127.0.0.1", free_port())],
+                data_dir=str(tmp_path / "Node_1"), transport=LoopbackTransport({}, ("127.0.0.1", port)))
+    try:
+        # Po usunięciu Node_2 licznik węzłów dałby id "Node_3", czyli id działającego węzła
+        node.remove_node(f"127.0.0.1:{node.peers[0][1]}")
+        new_port = free_port()
+        assert node.add_node(f"127.0.0.1:{new_port}").startswith("SUCCESS")
+        node_id, _, _, _, data_dir = started[0][:5]
+        assert node_id == f"Node_127.0.0.1_{new_port}"
+        assert data_dir == str(tmp_path / node_id)
+
+        node.remove_node(f"127.0.0.1:{new_port}")
+        (tmp_path / node_id).mkdir()
+        assert node.add_node(f"127.0.0.1:{new_port}").startswith("ERROR: Data directory")
+        assert len(started) == 1
+    finally:
+        node.stop()
+
+
+def test_added_node_uses_the_options_of_the_cluster():
+    import main
+    from transport import UdpTransport
+    port, new_port = free_port(), free_port()
+    node = Node("Node_1", "127.0.0.1", port, [], transport=UdpTransport("127.0.0.1", port), codec="json",
+                client_server=None, heartbeat_interval=0.05, election_timeout=(0.1, 1), adaptive_timeout=True)
+    new_node = main.start_new_node("Node_2", "127.0.0.1", new_port, [node.address], learner=True,
+                                   options=node.node_options())
+    try:
+        assert new_node.transport.name == "udp"
+        assert new_node.codec == "json" and new_node.client_server is None
+        assert new_node.heartbeat_interval == 0.05 and new_node.election_timeout_range == (0.1, 1)
+        assert new_node.adaptive_timeout and new_node.learner
+    finally:
+        new_node.stop()
+        node.stop()
@@ -0,0 +1,313 @@
+import pytest
+from logentry import LogEntry
+from simulation import create_cluster
+
+
+@pytest.fixture(autouse=True)
+def quiet(caplog):
+    caplog.set_level("ERROR")
+
+
+def submit(leader, count, prefix="key"):
+    return leader.submit_entries([LogEntry(0, "SET", f"{prefix}{i}", f"value{i}") for i in range(count)])
+
+
+def converged(network, nodes=None):
+    nodes = nodes or [node for address, node in network.nodes.items() if address not in network.down]
+    last_index = max(node.database.last_index() for node in nodes)
+    return all(node.database.commit_index == last_index for node in nodes)
+
+
+def test_at_most_one_leader_per_term_across_seeds():
+    for seed in range(200):
+        network = create_cluster(5, seed=seed, latency=(0.001, 0.05), loss=0.05)
+        leaders = {}
+
+        def check():
+            for node in network.leaders():
+                assert leaders.setdefault(node.current_term, node.node_id) == node.node_id
+            return False
+
+        network.run_until(check, 20)
+        assert network.leaders(), f"no leader with seed {seed}"
+        network.stop()
+
+
+def test_same_seed_gives_same_run():
+    runs = []
+    for _ in range(2):
+        network = create_cluster(7, seed=42, latency=(0.001, 0.02))
+        network.run_until(lambda: bool(network.leaders()), 30)
+        runs.append((network.leaders()[0].node_id, network.clock.now, network.delivered))
+        network.stop()
+    assert runs[0] == runs[1]
+
+
+def test_single_node_elects_itself():
+    network = create_cluster(1)
+    assert network.run_until(lambda: bool(network.leaders()), 10)
+    network.stop()
+
+
+def test_minority_leader_cannot_commit_and_steps_down_after_heal():
+    network = create_cluster(5, seed=3)
+    network.run_until(lambda: bool(network.leaders()), 30)
+    old_leader = network.leaders()[0]
+    submit(old_leader, 10)
+    assert network.run_until(lambda: converged(network), 5)
+    committed = old_leader.database.commit_index
+
+    others = [address for address in network.nodes if address != old_leader.address]
+    network.partition([old_leader.address, others[0]], others[1:])
+    submit(old_leader, 5, prefix="lost")
+    assert network.run_until(lambda: any(node.state == "leader" for node in network.nodes.values()
+                                         if node is not old_leader), 30)
+    new_leader = next(node for node in network.nodes.values() if node.state == "leader" and node is not old_leader)
+    submit(new_leader, 5, prefix="kept")
+    network.run_for(5)
+    assert old_leader.database.commit_index == committed
+
+    network.heal()
+    assert network.run_until(lambda: old_leader.state == "follower" and converged(network), 30)
+    assert "lost0" not in old_leader.database.store
+    assert old_leader.database.store["kept4"] == "value4"
+    network.stop()
+
+
+def test_new_leader_commits_previous_term_entries_without_client_writes():
+    network = create_cluster(3, seed=31)
+    network.run_until(lambda: bool(network.leaders()), 30)
+    leader = network.leaders()[0]
+    followers = [node for node in network.nodes.values() if node is not leader]
+    submit(leader, 5)
+    last_index = leader.database.last_index()
+    assert network.run_until(lambda: all(node.database.last_index() == last_index for node in followers), 5)
+    # Lider pada, zanim followerzy dowiedzą się, że wpisy są zatwierdzone
+    network.crash(leader.address)
+    assert all(node.database.commit_index < last_index for node in followers)
+
+    assert network.run_until(lambda: all(node.database.commit_index > last_index for node in followers), 30)
+    assert len(followers[0].database.store) == 5
+    network.stop()
+
+
+def test_replication_survives_message_loss():
+    network = create_cluster(5, seed=7, loss=0.2)
+    network.run_until(lambda: bool(network.leaders()), 60)
+    leader = network.leaders()[0]
+    for batch in range(10):
+        submit(leader, 20, prefix=f"b{batch}_")
+    assert network.run_until(lambda: converged(network), 60)
+    assert all(len(node.database.store) == 200 for node in network.nodes.values())
+    network.stop()
+
+
+def test_crashed_leader_is_replaced_and_restored_node_catches_up():
+    network = create_cluster(3, seed=11)
+    network.run_until(lambda: bool(network.leaders()), 30)
+    old_leader = network.leaders()[0]
+    network.crash(old_leader.address)
+    assert network.run_until(lambda: bool(network.leaders()), 30)
+    new_leader = network.leaders()[0]
+    submit(new_leader, 50)
+
+    network.restore(old_leader.address)
+    assert network.run_until(lambda: old_leader.state == "follower" and converged(network), 30)
+    assert len(old_leader.database.store) == 50
+    network.stop()
+
+
+def test_idle_leader_sends_one_heartbeat_per_interval():
+    network = create_cluster(3, seed=5, heartbeat_interval=0.1, election_timeout=(0.3, 0.6))
+    network.run_until(lambda: bool(network.leaders()), 10)
+    leader = network.leaders()[0]
+    network.run_for(1)
+    before = leader.metrics.counters[("raft_messages_sent_total", (("type", "append_entries"),))]
+    network.run_for(2)
+    after = leader.metrics.counters[("raft_messages_sent_total", (("type", "append_entries"),))]
+    # Dwóch followerów, po jednym pustym AppendEntries co 0.1 s
+    assert 38 <= after - before <= 42
+    assert network.leaders() == [leader]
+    network.stop()
+
+
+def test_replication_traffic_suppresses_heartbeats():
+    network = create_cluster(3, seed=5, heartbeat_interval=0.1, election_timeout=(0.3, 0.6))
+    network.run_until(lambda: bool(network.leaders()), 10)
+    leader = network.leaders()[0]
+    network.run_for(1)
+    before = leader.metrics.counters[("raft_messages_sent_total", (("type", "append_entries"),))]
+    # Wpisy co 0.05 s: każdy AppendEntries niesie dane, osobne heartbeaty nie są potrzebne
+    for batch in range(40):
+        submit(leader, 1, prefix=f"b{batch}_")
+        network.run_for(0.05)
+    after = leader.metrics.counters[("raft_messages_sent_total", (("type", "append_entries"),))]
+    assert converged(network)
+    # Na wpis: AppendEntries z danymi i pusty z nowym commit_index, do każdego z dwóch followerów
+    assert after - before <= 2 * 40 * 2
+    network.stop()
+
+
+def test_fast_timeouts_fail_over_within_half_a_second():
+    for seed in range(20):
+        network = create_cluster(5, seed=seed, heartbeat_interval=0.05, election_timeout=(0.15, 0.3))
+        network.run_until(lambda: bool(network.leaders()), 10)
+        network.run_for(1)
+        network.crash(network.leaders()[0].address)
+        crashed_at = network.clock.now
+        assert network.run_until(lambda: bool(network.leaders()), 10)
+        assert network.clock.now - crashed_at < 0.5, f"slow failover with seed {seed}"
+        network.stop()
+
+
+def test_adaptive_timeout_follows_leader_message_gaps():
+    network = create_cluster(3, seed=9, heartbeat_interval=0.05, election_timeout=(0.1, 5), adaptive_timeout=True)
+    network.run_until(lambda: bool(network.leaders()), 30)
+    network.run_for(2)
+    followers = [node for node in network.nodes.values() if node.state == "follower"]
+    for node in followers:
+        assert abs(node.gap_mean - 0.05) < 0.01
+        assert 0.1 <= node.election_timeout <= 0.4
+    network.stop()
+
+
+def test_rejoining_node_does_not_disrupt_leader():
+    network = create_cluster(5, seed=13)
+    network.run_until(lambda: bool(network.leaders()), 30)
+    leader = network.leaders()[0]
+    term = leader.current_term
+    isolated = next(node for node in network.nodes.values() if node is not leader)
+    network.partition([isolated.address], [address for address in network.nodes if address != isolated.address])
+    network.run_for(30)
+    # Bez większości PreVote nie przechodzi, więc kadencja odizolowanego węzła się nie zmienia
+    assert isolated.current_term == term
+    assert isolated.metrics.counters.get(("raft_elections_started_total", ()), 0) == 0
+
+    network.heal()
+    submit(leader, 10)
+    assert network.run_until(lambda: converged(network), 10)
+    assert network.leaders() == [leader]
+    assert leader.current_term == term
+    network.stop()
+
+
+def test_node_with_stale_log_cannot_win_election():
+    network = create_cluster(3, seed=17)
+    network.run_until(lambda: bool(network.leaders()), 30)
+    leader = network.leaders()[0]
+    stale, current = [node for node in network.nodes.values() if node is not leader]
+    network.crash(stale.address)
+    submit(leader, 10)
+    assert network.run_until(lambda: current.database.commit_index == leader.database.last_index(), 10)
+
+    network.crash(leader.address)
+    network.restore(stale.address)
+    assert network.run_until(lambda: bool(network.leaders()), 30)
+    assert network.leaders() == [current]
+    assert network.run_until(lambda: len(stale.database.store) == 10, 10)
+    network.stop()
+
+
+def test_transfer_leader_to_lagging_follower():
+    network = create_cluster(3, seed=19)
+    network.run_until(lambda: bool(network.leaders()), 30)
+    leader = network.leaders()[0]
+    target = next(node for node in network.nodes.values() if node is not leader)
+    network.crash(target.address)
+    submit(leader, 20)
+    network.run_for(1)
+    network.restore(target.address)
+
+    assert leader.transfer_leader(f"{target.address[0]}:{target.address[1]}", wait=False) is None
+    # W trakcie przekazania lider nie przyjmuje zapisów
+    assert leader.submit_entries([LogEntry(0, "SET", "late", "value")]).startswith("ERROR: Leadership transfer")
+    assert network.run_until(lambda: target.state == "leader", 5)
+    assert target.current_term == leader.current_term
+    assert len(target.database.store) == 20
+    submit(target, 1, prefix="after")
+    assert network.run_until(lambda: converged(network) and leader.state == "follower", 5)
+    network.stop()
+
+
+def test_old_leader_does_not_serve_stale_reads_during_transfer():
+    network = create_cluster(3, seed=19, lease_duration=2.0)
+    network.run_until(lambda: bool(network.leaders()), 30)
+    leader = network.leaders()[0]
+    target, other = [node for node in network.nodes.values() if node is not leader]
+    leader.submit_entries([LogEntry(0, "SET", "x", "old")])
+    assert network.run_until(lambda: converged(network) and leader.clock.monotonic() < leader.lease_expires, 5)
+
+    # Lider nie słyszy celu, więc nie dowie się od niego o nowej kadencji
+    network.cut.add((target.address, leader.address))
+    leader.transfer_leader(f"{target.address[0]}:{target.address[1]}", wait=False)
+    assert network.run_until(lambda: target.state == "leader", 5)
+    target.submit_entries([LogEntry(0, "UPDATE", "x", "new")])
+    assert network.run_until(lambda: other.database.store.get("x") == "new", 5)
+    assert leader.state == "leader"
+    assert leader.read_index().startswith("ERROR: Leadership transfer")
+    assert leader.lease_expires == 0
+    network.stop()
+
+
+def test_transfer_leader_rejects_unknown_node():
+    network = create_cluster(3, seed=19)
+    network.run_until(lambda: bool(network.leaders()), 30)
+    leader = network.leaders()[0]
+    assert leader.transfer_leader("127.0.0.1:1") == "ERROR: Node 127.0.0.1:1 does not exist in cluster."
+    assert leader.transfer_leader("nowhere") == "ERROR: Invalid address format. Use host:port."
+    assert leader.transfer_target is None
+    network.stop()
+
+
+def add_learner(network, leader, port=20100):
+    address = ("127.0.0.1", port)
+    learner = network.add_node("Node_new", port, list(network.nodes), learner=True)
+    leader.add_learner(address)
+    return learner
+
+
+def test_learner_catches_up_from_snapshot_and_is_promoted():
+    network = create_cluster(3, seed=23)
+    network.run_until(lambda: bool(network.leaders()), 30)
+    leader = network.leaders()[0]
+    for batch in range(5):
+        submit(leader, 500, prefix=f"b{batch}_")
+    assert network.run_until(lambda: converged(network) and leader.database.snapshot_index >= 0, 10)
+
+    learner = add_learner(network, leader)
+    assert learner.address not in leader.peers
+    assert network.run_until(lambda: not learner.learner, 10)
+    assert learner.address in leader.peers
+    assert network.run_until(lambda: converged(network) and all(
+        learner.address in node.peers for node in network.nodes.values() if node is not learner), 5)
+    assert learner.database.store == leader.database.store
+
+    # Awansowany węzeł głosuje: po awarii lidera trzy z czterech węzłów wybierają nowego
+    network.crash(leader.address)
+    assert network.run_until(lambda: bool(network.leaders()), 30)
+    network.stop()
+
+
+def test_learner_is_throttled_and_does_not_block_commits():
+    network = create_cluster(3, seed=29)
+    network.run_until(lambda: bool(network.leaders()), 30)
+    leader = network.leaders()[0]
+    leader.database.snapshot_threshold = 10 ** 9
+    submit(leader, 5000)
+    assert network.run_until(lambda: converged(network), 10)
+    leader.learner_rate = 1000
+
+    # Jeden głosujący niedostępny: większość to nadal lider i drugi follower, learner się nie liczy
+    follower = next(node for node in network.nodes.values() if node is not leader)
+    network.crash(follower.address)
+    learner = add_learner(network, leader)
+    network.run_for(1)
+    assert learner.learner
+    assert learner.database.last_index() <= 1000 + leader.max_batch_entries
+    submit(leader, 10, prefix="during")
+    network.run_for(0.5)
+    assert leader.commit_index == leader.database.last_index()
+    assert network.run_until(lambda: not learner.learner, 10)
+    assert leader.database.last_index() - learner.database.last_index() <= leader.promote_lag
+    assert network.run_until(lambda: learner.database.commit_index == leader.commit_index, 5)
+    network.stop()
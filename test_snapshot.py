@@ -0,0 +1,137 @@
+import os
+import threading
+from database import Database
+
+
+def make_entry(i, term=1):
+    return {"term": term, "operation": "SET", "key": f"key{i}", "value": f"value{i}"}
+
+
+def fill(database, count):
+    for i in range(count):
+        database.append_log(make_entry(i))
+    database.commit_log_entries(database.last_index())
+
+
+def test_snapshot_truncates_log_prefix():
+    database = Database(snapshot_threshold=10)
+    fill(database, 25)
+    database.maybe_snapshot()
+
+    assert database.snapshot_index == 24
+    assert database.log == []
+    assert database.last_index() == 24
+    assert database.term_at(24) == 1
+    assert database.term_at(3) is None
+    assert database.store["key3"] == "value3"
+
+    index = database.append_log(make_entry(25))
+    assert index == 25
+    assert database.entry_at(25) == make_entry(25)
+
+
+def test_below_threshold_keeps_log():
+    database = Database(snapshot_threshold=100)
+    fill(database, 25)
+    database.maybe_snapshot()
+
+    assert database.snapshot_index == -1
+    assert len(database.log) == 25
+
+
+def test_snapshot_interval_grows_with_store_size():
+    database = Database(snapshot_threshold=10)
+    fill(database, 50)
+    database.take_snapshot()
+    for i in range(30):
+        database.append_log({"term": 1, "operation": "UPDATE", "key": f"key{i}", "value": "new"})
+    database.commit_log_entries(database.last_index())
+
+    # 30 wpisów to ponad próg, ale mniej niż 50 kluczy w store
+    database.maybe_snapshot()
+    assert database.snapshot_index == 49
+
+
+def test_snapshot_is_written_without_holding_the_lock(tmp_path):
+    database = Database(str(tmp_path / "node"), snapshot_threshold=10)
+    fill(database, 20)
+    writing, release = threading.Event(), threading.Event()
+    save_snapshot = database.save_snapshot
+
+    def slow_save(*args):
+        writing.set()
+        release.wait(5)
+        save_snapshot(*args)
+
+    database.save_snapshot = slow_save
+    thread = database.maybe_snapshot()
+    assert writing.wait(5)
+    # Zapis do logu i odczyt działają, gdy snapshot jest serializowany
+    assert database.append_log(make_entry(20)) == 20
+    assert database.mget(["key1"]) == "key1 -> value1"
+    assert database.snapshot_index == -1
+    release.set()
+    thread.join()
+
+    assert database.snapshot_index == 19
+    assert database.entries_from(20) == [make_entry(20)]
+    database.close()
+
+
+def test_snapshot_and_wal_tail_survive_restart(tmp_path):
+    data_dir = str(tmp_path / "node")
+    database = Database(data_dir, snapshot_threshold=10)
+    fill(database, 20)
+    database.take_snapshot()
+    for i in range(20, 23):
+        database.append_log(make_entry(i))
+    database.close()
+
+    restarted = Database(data_dir)
+    assert restarted.snapshot_index == 19
+    assert restarted.commit_index == 19
+    assert restarted.store["key19"] == "value19"
+    assert restarted.entries_from(20) == [make_entry(i) for i in range(20, 23)]
+    restarted.close()
+
+
+def test_compaction_removes_old_segments(tmp_path):
+    data_dir = str(tmp_path / "node")
+    database = Database(data_dir)
+    database.wal.segment_size = 256
+    fill(database, 50)
+    segments_before = len(database.wal.segments)
+    database.take_snapshot()
+
+    assert len(database.wal.segments) < segments_before
+    assert len(os.listdir(os.path.join(data_dir, "wal"))) == len(database.wal.segments)
+
+
+def test_install_snapshot_replaces_diverged_log(tmp_path):
+    database = Database(str(tmp_path / "node"))
+    for i in range(5):
+        database.append_log(make_entry(i, term=1))
+
+    database.install_snapshot(40, 3, {"a": "1", "b": "2"})
+
+    assert database.log == []
+    assert database.store == {"a": "1", "b": "2"}
+    assert database.commit_index == 40
+    assert database.last_index() == 40
+    database.append_log(make_entry(41, term=3))
+    database.close()
+
+    restarted = Database(str(tmp_path / "node"))
+    assert restarted.store == {"a": "1", "b": "2"}
+    assert restarted.entries_from(41) == [make_entry(41, term=3)]
+
+
+def test_install_snapshot_keeps_matching_suffix():
+    database = Database()
+    for i in range(10):
+        database.append_log(make_entry(i, term=2))
+
+    database.install_snapshot(5, 2, {"key": "value"})
+
+    assert database.last_index() == 9
+    assert database.entries_from(6) == [make_entry(i, term=2) for i in range(6, 10)]
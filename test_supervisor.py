@@ -0,0 +1,101 @@
+import time
+import socket
+import pytest
+from supervisor import Supervisor
+from conftest import free_port
+
+OPTIONS = ["--heartbeat-interval", "0.05", "--election-timeout", "0.3", "0.6"]
+
+
+def request(port, *commands):
+    with socket.create_connection(("127.0.0.1", port + 100), timeout=5) as sock:
+        reader = sock.makefile("rb")
+        leader = reader.readline().startswith(b"Control")
+        if leader:
+            reader.readline()
+        sock.sendall("".join(f"{command}\n" for command in commands).encode())
+        return leader, [reader.readline().decode().strip() for _ in commands]
+
+
+def request_succeeds(port):
+    try:
+        request(port, "STATUS")
+        return True
+    except OSError:
+        return False
+
+
+def find_leader(ports, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for port in ports:
+            if request(port, "STATUS")[0]:
+                return port
+        time.sleep(0.1)
+    raise TimeoutError("No leader elected")
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    ports = [free_port() for _ in range(3)]
+    supervisor = Supervisor(ports, OPTIONS + ["--log-dir", str(tmp_path)], str(tmp_path))
+    supervisor.start()
+    yield supervisor, ports, tmp_path
+    supervisor.stop()
+
+
+def test_nodes_run_as_separate_processes(cluster):
+    supervisor, ports, log_dir = cluster
+    supervisor.wait_ready()
+    assert len({process.process.pid for process in supervisor.processes.values()}) == 3
+    leader = find_leader(ports)
+    assert request(leader, "PUT key value")[1] == ["SUCCESS: key -> value added."]
+    assert sorted(path.name for path in log_dir.iterdir()) == ["Node_1.log", "Node_2.log", "Node_3.log"]
+
+    supervisor.stop()
+    assert not any(process.running for process in supervisor.processes.values())
+    assert "has been stopped" in (log_dir / "Node_1.log").read_text()
+
+
+def test_add_node_starts_a_process(cluster):
+    supervisor, ports, log_dir = cluster
+    supervisor.wait_ready()
+    leader = find_leader(ports)
+    port = free_port()
+    assert request(leader, f"ADD-NODE 127.0.0.1:{port}")[1][0].startswith("SUCCESS")
+    deadline = time.monotonic() + 15
+    node_id = f"Node_127.0.0.1_{port}"
+    while not (log_dir / f"{node_id}.log").exists() or not request_succeeds(port):
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+
+    # Nowym procesem zarządza nadzorca, a nie węzeł, który go dodał: przeżywa jego awarię
+    assert supervisor.processes[node_id].running
+    assert supervisor.processes[node_id].arguments[supervisor.processes[node_id].arguments.index("--peers") + 1] \
+        .startswith("127.0.0.1:")
+    leader_process = next(process for process in supervisor.processes.values() if process.port == leader)
+    leader_process.process.kill()
+    leader_process.process.wait()
+    assert supervisor.check() == [leader_process]
+    assert request_succeeds(port)
+
+    supervisor.stop()
+    assert not request_succeeds(port)
+    assert not supervisor.processes[node_id].running
+
+
+def test_exited_process_is_reported_and_restarted(cluster):
+    supervisor, ports, _ = cluster
+    supervisor.wait_ready()
+    supervisor.restart = True
+    process = supervisor.processes["Node_2"]
+    process.process.kill()
+    process.process.wait()
+    assert supervisor.check() == [process]
+    process.wait_ready()
+
+
+def test_running_node_is_not_started_twice(cluster):
+    supervisor, ports, _ = cluster
+    assert supervisor.launch("Node_1", "127.0.0.1", ports[0], []) is None
+    assert supervisor.processes["Node_1"].running
@@ -0,0 +1,36 @@
+import time
+import threading
+from timers import Scheduler
+
+
+def test_timers_run_in_deadline_order():
+    scheduler = Scheduler("test timers")
+    calls = []
+    done = threading.Event()
+    scheduler.call_later(0.05, calls.append, "late")
+    scheduler.call_later(0.01, calls.append, "early")
+    scheduler.call_later(0.08, done.set)
+    scheduler.start()
+    assert done.wait(2)
+    assert calls == ["early", "late"]
+    scheduler.stop()
+
+
+def test_failing_timer_does_not_stop_scheduler():
+    scheduler = Scheduler("test timers")
+    done = threading.Event()
+    scheduler.call_later(0, lambda: 1 / 0)
+    scheduler.call_later(0.01, done.set)
+    scheduler.start()
+    assert done.wait(2)
+    scheduler.stop()
+
+
+def test_stopped_scheduler_drops_pending_timers():
+    scheduler = Scheduler("test timers")
+    calls = []
+    scheduler.start()
+    scheduler.call_later(0.05, calls.append, "never")
+    scheduler.stop()
+    time.sleep(0.1)
+    assert calls == []
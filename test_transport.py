@@ -0,0 +1,104 @@
+import time
+import socket
+import pytest
+from transport import TcpTransport, UdpTransport
+
+
+@pytest.fixture
+def transports():
+    a = TcpTransport("localhost", 0)
+    b = TcpTransport("localhost", 0)
+    yield a, b
+    a.close()
+    b.close()
+
+
+def test_large_message_arrives_whole(transports):
+    a, b = transports
+    payload = b"x" * (4 * 1024 * 1024)
+
+    a.send(payload, b.address)
+
+    assert b.receive(timeout=5) == payload
+
+
+def test_messages_keep_order_over_one_connection(transports):
+    a, b = transports
+    for i in range(200):
+        a.send(f"message {i}".encode(), b.address)
+
+    received = [b.receive(timeout=5) for _ in range(200)]
+
+    assert received == [f"message {i}".encode() for i in range(200)]
+    assert len(a.connections) == 1
+
+
+def test_reconnects_after_peer_restart(transports):
+    a, b = transports
+    a.send(b"before", b.address)
+    assert b.receive(timeout=5) == b"before"
+
+    port = b.address[1]
+    b.close()
+    restarted = TcpTransport("localhost", port)
+    try:
+        received = None
+        for _ in range(20):
+            a.connections[b.address].retry_at = 0
+            try:
+                a.send(b"after", restarted.address)
+            except OSError:
+                continue
+            received = restarted.receive(timeout=0.2)
+            if received:
+                break
+        assert received == b"after"
+    finally:
+        restarted.close()
+
+
+def test_send_to_unreachable_peer_raises(transports):
+    a, b = transports
+    port = b.address[1]
+    b.close()
+
+    with pytest.raises(OSError):
+        a.send(b"lost", ("127.0.0.1", port))
+
+
+def test_send_to_peer_that_stops_reading_times_out():
+    a = TcpTransport("localhost", 0, send_timeout=0.2, reconnect_delay=5)
+    server = socket.create_server(("127.0.0.1", 0))
+    try:
+        payload = b"z" * (4 * 1024 * 1024)
+        with pytest.raises(socket.timeout):
+            for _ in range(100):
+                started = time.monotonic()
+                try:
+                    a.send(payload, server.getsockname())
+                finally:
+                    assert time.monotonic() - started < 2
+        # Do czasu ponownego połączenia wysyłki kończą się od razu
+        started = time.monotonic()
+        with pytest.raises(ConnectionError):
+            a.send(b"next", server.getsockname())
+        assert time.monotonic() - started < 0.1
+    finally:
+        server.close()
+        a.close()
+
+
+def test_receive_timeout_returns_none(transports):
+    _, b = transports
+    assert b.receive(timeout=0.05) is None
+
+
+def test_udp_transport_round_trip():
+    a = UdpTransport("localhost", 0)
+    b = UdpTransport("localhost", 0)
+    try:
+        a.send(b"y" * 4000, b.address)
+        assert b.receive(timeout=5) == b"y" * 4000
+    finally:
+        a.close()
+        b.close()
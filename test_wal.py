@@ -0,0 +1,157 @@
+import os
+import threading
+import pytest
+from database import Database
+from wal import WriteAheadLog, iter_records
+
+
+def make_entry(i, term=1):
+    return {"term": term, "operation": "SET", "key": f"key{i}", "value": f"value{i}"}
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    return str(tmp_path / "node")
+
+
+def test_log_survives_restart(data_dir):
+    database = Database(data_dir)
+    for i in range(10):
+        database.append_log(make_entry(i))
+    database.close()
+
+    restarted = Database(data_dir)
+    assert restarted.log == [make_entry(i) for i in range(10)]
+    restarted.close()
+
+
+def test_truncated_entries_are_replaced_on_replay(data_dir):
+    database = Database(data_dir)
+    database.append_entries([make_entry(i) for i in range(5)])
+    database.truncate_log(3)
+    database.append_entries([make_entry(i, term=2) for i in range(3, 6)])
+    database.close()
+
+    restarted = Database(data_dir)
+    assert restarted.log == [make_entry(i) for i in range(3)] + [make_entry(i, term=2) for i in range(3, 6)]
+    restarted.close()
+
+
+def test_torn_tail_is_discarded(data_dir):
+    database = Database(data_dir)
+    for i in range(3):
+        database.append_log(make_entry(i))
+    database.close()
+
+    wal_dir = os.path.join(data_dir, "wal")
+    segment = os.path.join(wal_dir, sorted(os.listdir(wal_dir))[-1])
+    with open(segment, "ab") as f:
+        f.write(b"\x00\x00\x01\x00garbage")
+
+    restarted = Database(data_dir)
+    assert len(restarted.log) == 3
+    restarted.append_log(make_entry(3))
+    restarted.close()
+
+    assert len(Database(data_dir).log) == 4
+
+
+def test_segments_roll_over(tmp_path):
+    wal = WriteAheadLog(str(tmp_path), segment_size=256)
+    for i in range(50):
+        wal.append(i, make_entry(i))
+    wal.sync()
+    wal.close()
+
+    assert len(wal.list_segments()) > 1
+    replayed = list(WriteAheadLog(str(tmp_path)).read_entries())
+    assert [index for index, _ in replayed] == list(range(50))
+
+
+def test_group_commit_batches_fsyncs(data_dir):
+    database = Database(data_dir)
+
+    def writer(n):
+        for i in range(50):
+            database.append_log(make_entry(f"{n}_{i}"))
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(database.log) == 400
+    assert database.wal.fsync_count < 400
+    database.close()
+    assert len(Database(data_dir).log) == 400
+
+
+def test_read_raw_returns_encoded_records(tmp_path):
+    wal = WriteAheadLog(str(tmp_path), segment_size=256)
+    for i in range(50):
+        wal.append(i, make_entry(i))
+    assert wal.read_raw(0, 10) is None
+    wal.sync()
+
+    index = 0
+    while index < 50:
+        view, count = wal.read_raw(index, 10)
+        assert 0 < count <= 10
+        records = list(iter_records(view))
+        assert [record_index for record_index, _, _ in records] == list(range(index, index + count))
+        assert [entry for _, entry, _ in records] == [make_entry(i) for i in range(index, index + count)]
+        index += count
+    assert wal.read_raw(50, 10) is None
+    wal.close()
+
+
+def test_read_raw_skips_truncated_tail(tmp_path):
+    wal = WriteAheadLog(str(tmp_path))
+    for i in range(10):
+        wal.append(i, make_entry(i))
+    wal.truncate(6)
+    for i in range(6, 8):
+        wal.append(i, make_entry(i, term=2))
+    wal.sync()
+
+    view, count = wal.read_raw(3, 100)
+    assert count == 3
+    view, count = wal.read_raw(6, 100)
+    assert [entry for _, entry, _ in iter_records(view)] == [make_entry(i, term=2) for i in range(6, 8)]
+    wal.close()
+
+    replayed = dict(WriteAheadLog(str(tmp_path)).read_entries())
+    assert [replayed[i] for i in range(8)] == [make_entry(i) for i in range(6)] + [make_entry(i, term=2) for i in range(6, 8)]
+
+
+def test_committed_tail_is_applied_on_restart(data_dir):
+    database = Database(data_dir, snapshot_threshold=5)
+    database.append_entries([make_entry(i) for i in range(12)])
+    database.commit_log_entries(6)
+    database.take_snapshot()
+    database.commit_log_entries(9)
+    database.close()
+
+    restarted = Database(data_dir)
+    assert restarted.snapshot_index == 6
+    assert restarted.commit_index == 9
+    assert restarted.last_index() == 11
+    assert sorted(restarted.store) == sorted(f"key{i}" for i in range(10))
+    assert list(restarted.index.irange()) == sorted(restarted.store)
+    assert set(restarted.recovery_timings) == {"snapshot", "wal", "apply"}
+    restarted.close()
+
+
+def test_snapshot_starts_new_segment_and_replay_skips_old_ones(data_dir):
+    database = Database(data_dir, snapshot_threshold=100)
+    for start in range(0, 20, 10):
+        database.append_entries([make_entry(i) for i in range(start, start + 10)])
+        database.commit_log_entries(start + 9)
+        database.take_snapshot()
+    database.append_entries([make_entry(i) for i in range(20, 30)])
+    database.close()
+
+    wal = WriteAheadLog(os.path.join(data_dir, "wal"))
+    assert wal.list_segments() == [10, 20]
+    assert [index for index, _ in wal.read_entries(19)] == list(range(20, 30))
@@ -0,0 +1,43 @@
+import heapq
+import logging
+import threading
+import time
+
+
+class Scheduler:
+    # Jeden wątek wykonuje zadania w kolejności terminów i śpi do najbliższego z nich zamiast odpytywać stan
+    def __init__(self, name):
+        self.name = name
+        self.cond = threading.Condition()
+        self.timers = []
+        self.sequence = 0
+        self.running = False
+
+    def call_later(self, delay, callback, *args):
+        with self.cond:
+            self.sequence += 1
+            heapq.heappush(self.timers, (time.monotonic() + delay, self.sequence, callback, args))
+            self.cond.notify()
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.run, name=self.name, daemon=True).start()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while self.running and (not self.timers or self.timers[0][0] > time.monotonic()):
+                    self.cond.wait(self.timers[0][0] - time.monotonic() if self.timers else None)
+                if not self.running:
+                    return
+                _, _, callback, args = heapq.heappop(self.timers)
+            try:
+                callback(*args)
+            except Exception as e:
+                logging.error(f"{self.name}: Error in timer {getattr(callback, '__name__', callback)}: {e}")
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.timers.clear()
+            self.cond.notify()
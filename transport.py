@@ -0,0 +1,260 @@
+import queue
+import socket
+import struct
+import logging
+import threading
+import time
+
+# Ramka: 4 bajty długości (big-endian) + dane
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+
+def resolve_address(host, port):
+    try:
+        return (socket.gethostbyname(host), int(port))
+    except socket.gaierror:
+        return (host, int(port))
+
+
+def recv_exactly(sock, size):
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class PeerConnection:
+    def __init__(self, address, connect_timeout, reconnect_delay, send_timeout):
+        self.address = address
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.send_timeout = send_timeout
+        self.sock = None
+        self.lock = threading.Lock()
+        self.retry_at = 0
+
+    def connect(self):
+        sock = socket.create_connection(self.address, timeout=self.connect_timeout)
+        # Peer, który przestał czytać, nie może blokować nadawcy w nieskończoność
+        sock.settimeout(self.send_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+
+    def send(self, frame):
+        with self.lock:
+            for attempt in range(2):
+                if self.sock is None:
+                    if time.time() < self.retry_at:
+                        raise ConnectionError(f"peer {self.address} unavailable, reconnect pending")
+                    try:
+                        self.connect()
+                    except OSError:
+                        self.retry_at = time.time() + self.reconnect_delay
+                        raise
+                try:
+                    self.sock.sendall(frame)
+                    return
+                except socket.timeout:
+                    # Ramka mogła wyjść częściowo, więc połączenie jest do wyrzucenia;
+                    # kolejne wysyłki do tego peera od razu zgłaszają błąd aż do ponownego połączenia
+                    self.close()
+                    self.retry_at = time.time() + self.reconnect_delay
+                    raise
+                except OSError:
+                    self.close()
+                    if attempt == 1:
+                        raise
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+
+class TcpTransport:
+    name = "tcp"
+
+    def __init__(self, host, port, connect_timeout=0.5, reconnect_delay=0.5, send_timeout=2.0):
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.send_timeout = send_timeout
+        self.inbox = queue.Queue()
+        self.connections = {}
+        self.connections_lock = threading.Lock()
+        self.inbound = set()
+        self.running = True
+
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((host, port))
+        self.server_socket.listen(128)
+        self.address = resolve_address(host, self.server_socket.getsockname()[1])
+        threading.Thread(target=self.accept_connections, daemon=True).start()
+
+    def accept_connections(self):
+        while self.running:
+            try:
+                conn, _ = self.server_socket.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.connections_lock:
+                self.inbound.add(conn)
+            threading.Thread(target=self.read_frames, args=(conn,), daemon=True).start()
+
+    def read_frames(self, conn):
+        try:
+            with conn:
+                while self.running:
+                    header = recv_exactly(conn, FRAME_HEADER.size)
+                    if header is None:
+                        return
+                    (length,) = FRAME_HEADER.unpack(header)
+                    if length > MAX_FRAME_SIZE:
+                        logging.error(f"Transport {self.address}: Frame of {length} bytes exceeds limit, dropping connection")
+                        return
+                    data = recv_exactly(conn, length)
+                    if data is None:
+                        return
+                    self.inbox.put(data)
+        except OSError:
+            pass
+        finally:
+            with self.connections_lock:
+                self.inbound.discard(conn)
+
+    def get_connection(self, destination):
+        with self.connections_lock:
+            connection = self.connections.get(destination)
+            if connection is None:
+                connection = PeerConnection(destination, self.connect_timeout, self.reconnect_delay,
+                                            self.send_timeout)
+                self.connections[destination] = connection
+            return connection
+
+    def send(self, data, destination):
+        frame = FRAME_HEADER.pack(len(data)) + data
+        self.get_connection(tuple(destination)).send(frame)
+
+    def receive(self, timeout=None):
+        try:
+            return self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.running = False
+        try:
+            self.server_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server_socket.close()
+        with self.connections_lock:
+            for connection in self.connections.values():
+                with connection.lock:
+                    connection.close()
+            self.connections.clear()
+            for conn in list(self.inbound):
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self.inbound.clear()
+
+
+class UdpTransport:
+    name = "udp"
+
+    def __init__(self, host, port):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.address = resolve_address(host, self.sock.getsockname()[1])
+
+    def send(self, data, destination):
+        self.sock.sendto(data, tuple(destination))
+
+    def receive(self, timeout=None):
+        self.sock.settimeout(timeout)
+        try:
+            data, _ = self.sock.recvfrom(65535)
+            return data
+        except socket.timeout:
+            return None
+
+    def close(self):
+        self.sock.close()
+
+
+# Nagłówek kanału: numer grupy Raft przed właściwą wiadomością
+CHANNEL_HEADER = struct.Struct(">H")
+
+
+class MultiplexTransport:
+    # Grupy Raft jednego procesu dzielą gniazdo i połączenia do peerów; jeden wątek rozdziela
+    # odebrane wiadomości do kolejek grup według nagłówka kanału
+    def __init__(self, transport):
+        self.transport = transport
+        self.address = transport.address
+        self.inboxes = {}
+        self.running = True
+        threading.Thread(target=self.dispatch, daemon=True).start()
+
+    def channel(self, number):
+        self.inboxes[number] = queue.Queue()
+        return TransportChannel(self, number)
+
+    def dispatch(self):
+        while self.running:
+            data = self.transport.receive(timeout=0.5)
+            if data is None:
+                continue
+            (number,) = CHANNEL_HEADER.unpack_from(data)
+            inbox = self.inboxes.get(number)
+            if inbox is None:
+                logging.error(f"Transport {self.address}: Message for unknown group {number}")
+                continue
+            inbox.put(data[CHANNEL_HEADER.size:])
+
+    def close(self):
+        self.running = False
+        self.transport.close()
+
+
+class TransportChannel:
+    def __init__(self, multiplex, number):
+        self.multiplex = multiplex
+        self.number = number
+        self.address = multiplex.address
+        self.header = CHANNEL_HEADER.pack(number)
+        self.inbox = multiplex.inboxes[number]
+
+    def send(self, data, destination):
+        self.multiplex.transport.send(self.header + data, destination)
+
+    def receive(self, timeout=None):
+        try:
+            return self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        # Współdzielony transport zamyka MultiplexTransport
+        pass
+
+
+TRANSPORTS = {
+    "tcp": TcpTransport,
+    "udp": UdpTransport,
+}
+
+
+def make_transport(name, host, port):
+    return TRANSPORTS[name](host, port)
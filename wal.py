@@ -0,0 +1,255 @@
+import os
+import mmap
+import bisect
+import struct
+import logging
+import threading
+import zlib
+from array import array
+from codec import CODEC_VERSION, encode_message, decode_message
+
+# Nagłówek rekordu: długość danych + crc32. Dane w formacie kodeka (starsze segmenty: JSON)
+RECORD_HEADER = struct.Struct(">II")
+SEGMENT_SUFFIX = ".wal"
+
+
+def encode_record(index, entry):
+    payload = encode_message({"index": index, "entry": entry}, CODEC_VERSION)
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def iter_records(data):
+    # Zwraca (indeks, wpis, koniec rekordu); zatrzymuje się na pierwszym niepełnym lub uszkodzonym rekordzie
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        record, _ = decode_message(payload)
+        offset = start + length
+        yield record["index"], record["entry"], offset
+
+
+class WriteAheadLog:
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, group_commit=True):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.group_commit = group_commit
+
+        self.lock = threading.Lock()
+        self.sync_cond = threading.Condition(self.lock)
+        self.written_seq = 0
+        self.synced_seq = 0
+        self.syncing = False
+        self.fsync_count = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.segments = self.list_segments()
+        self.file = None
+        self.file_size = 0
+        self.next_segment = None
+
+        # Tablica offsetów segmentu: granice kolejnych rekordów (o jeden element dłuższa niż liczba rekordów),
+        # None gdy indeksy w segmencie nie są kolejne. Pozwala wyciąć zakres wpisów z mmap bez dekodowania.
+        self.offsets = {}
+        self.maps = {}
+        self.last_index = -1
+        self.flushed_index = -1
+
+    def list_segments(self):
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SEGMENT_SUFFIX):
+                segments.append(int(name[:-len(SEGMENT_SUFFIX)]))
+        return sorted(segments)
+
+    def segment_path(self, first_index):
+        return os.path.join(self.directory, f"{first_index:020d}{SEGMENT_SUFFIX}")
+
+    def read_entries(self, after=-1):
+        # Segmenty w całości objęte snapshotem (do indeksu after) są pomijane bez czytania
+        for position, first_index in enumerate(list(self.segments)):
+            if position + 1 < len(self.segments) and self.segments[position + 1] <= after + 1:
+                continue
+            path = self.segment_path(first_index)
+            with open(path, "rb") as f:
+                data = f.read()
+            offsets = array("Q", [0])
+            contiguous = True
+            offset = 0
+            for index, entry, offset in iter_records(data):
+                if index != first_index + len(offsets) - 1:
+                    contiguous = False
+                offsets.append(offset)
+                self.last_index = index
+                yield index, entry
+            self.offsets[first_index] = offsets if contiguous else None
+            self.flushed_index = self.last_index
+            if offset < len(data):
+                logging.warning(f"WAL: Truncating torn tail of {path} at offset {offset}")
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+
+    def open_segment(self, first_index):
+        if self.file is not None:
+            self.wait_for_sync()
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+        if first_index not in self.segments:
+            self.segments.append(first_index)
+        path = self.segment_path(first_index)
+        self.file = open(path, "ab")
+        self.file_size = self.file.tell()
+        if first_index not in self.offsets:
+            self.offsets[first_index] = array("Q", [0]) if self.file_size == 0 else None
+
+    def wait_for_sync(self):
+        while self.syncing:
+            self.sync_cond.wait()
+
+    def append(self, index, entry):
+        record = encode_record(index, entry)
+        with self.lock:
+            if self.file is None:
+                if self.next_segment is not None:
+                    self.open_segment(self.next_segment)
+                    self.next_segment = None
+                else:
+                    self.open_segment(self.segments[-1] if self.segments else index)
+            elif self.file_size >= self.segment_size:
+                self.open_segment(index)
+            first_index = self.segments[-1]
+            offsets = self.offsets.get(first_index)
+            if offsets is not None and index != first_index + len(offsets) - 1:
+                offsets = self.offsets[first_index] = None
+            self.file.write(record)
+            self.file_size += len(record)
+            if offsets is not None:
+                offsets.append(self.file_size)
+            self.last_index = index
+            self.written_seq += 1
+            if not self.group_commit:
+                self.file.flush()
+                self.flushed_index = index
+                os.fsync(self.file.fileno())
+                self.fsync_count += 1
+                self.synced_seq = self.written_seq
+
+    def sync(self):
+        with self.lock:
+            target = self.written_seq
+            while self.synced_seq < target:
+                if self.syncing:
+                    self.sync_cond.wait()
+                    continue
+
+                # Ten wątek wykonuje fsync za wszystkie rekordy zapisane do tej pory
+                self.syncing = True
+                batch_end = self.written_seq
+                self.file.flush()
+                self.flushed_index = self.last_index
+                fd = self.file.fileno()
+                self.lock.release()
+                try:
+                    os.fsync(fd)
+                finally:
+                    self.lock.acquire()
+                    self.syncing = False
+                    self.sync_cond.notify_all()
+                self.fsync_count += 1
+                self.synced_seq = max(self.synced_seq, batch_end)
+
+    def truncate(self, index):
+        # Usuwa wpisy od index. Plików nie skracamy (mogą być zmapowane); kolejne rekordy trafiają
+        # do nowego segmentu, który przy odtwarzaniu nadpisuje stary ogon
+        with self.lock:
+            if index > self.last_index:
+                return
+            if self.file is not None:
+                self.wait_for_sync()
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+            for first_index in [first for first in self.segments if first >= index]:
+                self.remove_segment(first_index)
+            if self.segments:
+                first_index = self.segments[-1]
+                offsets = self.offsets.get(first_index)
+                if offsets is not None:
+                    del offsets[index - first_index + 1:]
+            self.next_segment = index
+            self.last_index = index - 1
+            self.flushed_index = min(self.flushed_index, index - 1)
+
+    def read_raw(self, start, max_count):
+        # Surowe rekordy od indeksu start (najwyżej max_count, w obrębie jednego segmentu) jako widok na mmap
+        with self.lock:
+            if start > self.flushed_index:
+                return None
+            position = bisect.bisect_right(self.segments, start) - 1
+            if position < 0:
+                return None
+            first_index = self.segments[position]
+            offsets = self.offsets.get(first_index)
+            if offsets is None or start - first_index + 1 >= len(offsets):
+                return None
+            end_index = min(start + max_count, first_index + len(offsets) - 1, self.flushed_index + 1)
+            if position + 1 < len(self.segments):
+                end_index = min(end_index, self.segments[position + 1])
+            begin, end = offsets[start - first_index], offsets[end_index - first_index]
+            segment_map = self.maps.get(first_index)
+            if segment_map is None or len(segment_map) < end:
+                with open(self.segment_path(first_index), "rb") as f:
+                    segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.maps[first_index] = segment_map
+        return memoryview(segment_map)[begin:end], end_index - start
+
+    def remove_segment(self, first_index):
+        # Mapowanie zostanie zamknięte, gdy znikną ostatnie widoki na nie
+        self.maps.pop(first_index, None)
+        self.offsets.pop(first_index, None)
+        os.remove(self.segment_path(first_index))
+        self.segments.remove(first_index)
+
+    def compact(self, snapshot_index):
+        with self.lock:
+            # Kolejne wpisy trafiają do nowego segmentu, więc po następnym snapshocie obecny da się usunąć w całości
+            if self.file is not None and self.last_index >= 0:
+                self.wait_for_sync()
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+                self.next_segment = self.last_index + 1
+            removable = []
+            for i, first_index in enumerate(self.segments[:-1]):
+                if self.segments[i + 1] <= snapshot_index + 1:
+                    removable.append(first_index)
+            for first_index in removable:
+                self.remove_segment(first_index)
+
+    def reset(self, next_index):
+        with self.lock:
+            if self.file is not None:
+                self.wait_for_sync()
+                self.file.close()
+                self.file = None
+            for first_index in list(self.segments):
+                self.remove_segment(first_index)
+            self.next_segment = None
+            self.last_index = self.flushed_index = next_index - 1
+            self.open_segment(next_index)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.wait_for_sync()
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+            self.maps.clear()